@@ -4,96 +4,425 @@ import sqlite3
 import numpy as np
 import subprocess
 import sys
-import pandas as pd
+import time
+import atexit
 from datetime import datetime
 
-# Add these global variables
-session_start_time = None
-session_active = False
-
 # CRITICAL: Apply monkey patching for eventlet FIRST.
 import eventlet
 eventlet.monkey_patch()
+from eventlet import tpool
 
 # IMPORTANT: These environment variables must be set BEFORE importing tensorflow
+# (only the 'keras' and 'tflite' model backends import it, lazily)
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
-from tensorflow.keras.models import load_model
+
+from inference import BatchInferenceEngine, RISK_LEVELS, predicted_classes
+from model_backend import BACKENDS, MODEL_PATH, load_backend, load_features
+from prediction_cache import ChangeGate, PredictionCache
+from reorder import DROPPED, Reorderer
+from inference_pool import (INFERENCE_MODES, InferencePool, InferenceUnavailable,
+                            InlineExecutor, ProcessExecutor, ThreadExecutor)
+from window_store import sliding_windows
+from features import RAW_FEATURES, FeatureExtractor, parse_windows
+from decimate import Decimator
+import wire
+from broadcast import DashboardBroadcaster
+from db_writer import DrivingLogWriter
+from cluster import QueuePubSubManager, RemoteLogWriter, shard_for
+from metrics import NULL_CLOCK, Histogram, StageClock, prometheus_text
+import history
+import schema
+from session_stats import SessionStats
+from sessions import SessionRegistry
+from telemetry_archive import LiveArchive
+
+# --- Cluster mode ---
+# Set by `python cluster.py`: this process is worker CLUSTER_SHARD of CLUSTER_SHARDS, relaying
+# Socket.IO events and driving_log rows through the coordinator at CLUSTER_ADDRESS.
+CLUSTER_ADDRESS = os.environ.get('CLUSTER_ADDRESS')
+CLUSTER_AUTHKEY = os.environ.get('CLUSTER_AUTHKEY', 'driving-behavior-cluster')
+CLUSTER_SHARD = int(os.environ.get('CLUSTER_SHARD', 0))
+CLUSTER_SHARDS = int(os.environ.get('CLUSTER_SHARDS', 1))
+misrouted_vehicles = 0
 
 # --- Flask and SocketIO Initialization ---
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_super_secret_and_unique_key_here_for_security'
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins="*")
+if CLUSTER_ADDRESS:
+    socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins="*",
+                        client_manager=QueuePubSubManager(CLUSTER_ADDRESS, CLUSTER_AUTHKEY))
+else:
+    socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins="*")
 
 # --- Global variables ---
 simulator_process = None
-active_session = False
-session_start_time = None
-session_start_time = None
-session_active = False
-
 
 # --- Database Configuration ---
-DATABASE = 'instance/driving_behavior.db'
+DATABASE = os.environ.get('DATABASE', 'instance/driving_behavior.db')
+
+# Rows are written by one background connection in batches instead of per event; each batch's
+# insert and commit run on eventlet's native thread pool so they never block the hub.
+DB_BATCH_SIZE = int(os.environ.get('DB_BATCH_SIZE', 500))
+DB_FLUSH_INTERVAL_MS = float(os.environ.get('DB_FLUSH_INTERVAL_MS', 250))
+DB_MAX_QUEUE = int(os.environ.get('DB_MAX_QUEUE', 20000))
+DB_OVERFLOW_POLICY = os.environ.get('DB_OVERFLOW_POLICY', 'block')
+
+if CLUSTER_ADDRESS:
+    # The coordinator owns the only driving_log writer; workers ship it batches
+    log_writer = RemoteLogWriter(
+        CLUSTER_ADDRESS,
+        CLUSTER_AUTHKEY,
+        batch_size=DB_BATCH_SIZE,
+        flush_interval=DB_FLUSH_INTERVAL_MS / 1000,
+        max_queue=DB_MAX_QUEUE,
+        spawn=socketio.start_background_task
+    )
+else:
+    log_writer = DrivingLogWriter(
+        DATABASE,
+        batch_size=DB_BATCH_SIZE,
+        flush_interval=DB_FLUSH_INTERVAL_MS / 1000,
+        max_queue=DB_MAX_QUEUE,
+        overflow=DB_OVERFLOW_POLICY,
+        offload=tpool.execute
+    )
+atexit.register(log_writer.close)
+
+# --- Latency instrumentation ---
+# Per-stage histograms behind /metrics; each 'update' also echoes its stage times to the client.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+STAGES = ('receive', 'validate', 'buffer', 'inference', 'db_write', 'emit')
+stage_latency = {stage: Histogram() for stage in STAGES}
+handler_latency = Histogram()
+db_commit_latency = Histogram()
+log_writer.commit_latency = db_commit_latency if METRICS_ENABLED else None
+
+def stage_clock():
+    return StageClock(stage_latency) if METRICS_ENABLED else NULL_CLOCK
+
+def record_transit(clock, client_timestamp):
+    """Records the 'receive' stage: from the client's Timestamp (epoch ms) to now."""
+    if METRICS_ENABLED and isinstance(client_timestamp, (int, float)):
+        transit_ms = time.time() * 1000 - client_timestamp
+        if 0 <= transit_ms < 60000:  # skip replayed or skewed timestamps
+            clock.record('receive', transit_ms / 1000)
+
+# Running report aggregates per session, checkpointed to session_stats periodically.
+# A vehicle's session ends once it has sent nothing for SESSION_IDLE_TIMEOUT_S.
+STATS_CHECKPOINT_INTERVAL_S = float(os.environ.get('STATS_CHECKPOINT_INTERVAL_S', 5))
+SESSION_IDLE_TIMEOUT_S = float(os.environ.get('SESSION_IDLE_TIMEOUT_S', 300))
+session_maintenance_running = False
+
+# Session history API: telemetry is bucketed in SQL to about HISTORY_POINTS points unless a
+# resolution is requested; no response holds more than HISTORY_MAX_POINTS buckets.
+HISTORY_POINTS = int(os.environ.get('HISTORY_POINTS', 2000))
+HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', 20000))
+HISTORY_MAX_SESSIONS = int(os.environ.get('HISTORY_MAX_SESSIONS', 500))
 
 def init_db():
     try:
-        os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS driving_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp REAL,
-                acc_x REAL,
-                acc_y REAL,
-                acc_z REAL,
-                gyro_x REAL,
-                gyro_y REAL,
-                gyro_z REAL,
-                speed REAL,
-                predicted_class INTEGER,
-                risk_level TEXT
-            )
-        ''')
-            
-        conn.commit()
-        conn.close()
-        print(f"INFO: Database '{DATABASE}' initialized or already exists.")
+        version = schema.init_db(DATABASE)
+        print(f"INFO: Database '{DATABASE}' initialized at schema version {version}.")
     except Exception as e:
         print(f"ERROR: Failed to initialize database: {e}")
 
-def clear_driving_logs():
-    """Clears all records from the driving_log table for a new session."""
-    try:
+def start_driver_session(sid, vehicle_id, driver_name=None):
+    """Opens a sessions row for a vehicle and registers its live state."""
+    if CLUSTER_ADDRESS:
+        session_id = log_writer.start_session(vehicle_id, driver_name)
+    else:
         conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM driving_log')
-        conn.commit()
+        try:
+            session_id = schema.start_session(conn, vehicle_id, driver_name)
+        finally:
+            conn.close()
+    print(f"INFO: Started driving session {session_id} for vehicle {vehicle_id}.")
+    return sessions.add(sid, vehicle_id, session_id)
+
+def session_for(sid, vehicle_id):
+    """Returns the vehicle's open session, starting one on its first sample.
+
+    Starting a session waits for the cluster coordinator, if any; samples of the same vehicle arriving
+    meanwhile wait for that session instead of starting their own.
+    """
+    global misrouted_vehicles
+    session = sessions.touch(sid, vehicle_id)
+    if session is not None:
+        return session
+    starting = sessions_starting.get(vehicle_id)
+    if starting is not None:
+        starting.wait(10)
+        session = sessions.touch(sid, vehicle_id)
+        if session is not None:
+            return session
+    if CLUSTER_SHARDS > 1 and vehicle_id != sid and shard_for(vehicle_id, CLUSTER_SHARDS) != CLUSTER_SHARD:
+        # Still served, but its window and session now live apart from its shard's
+        misrouted_vehicles += 1
+        print(f"WARNING: Vehicle {vehicle_id} belongs to shard {shard_for(vehicle_id, CLUSTER_SHARDS)}, "
+              f"not {CLUSTER_SHARD}.")
+    sessions_starting[vehicle_id] = started = threading.Event()
+    try:
+        return start_driver_session(sid, vehicle_id)
+    finally:
+        if sessions_starting.get(vehicle_id) is started:
+            del sessions_starting[vehicle_id]
+        started.set()
+
+def end_driver_sessions(ended):
+    """Closes sessions and checkpoints their final aggregates; earlier sessions stay in driving_log."""
+    if not ended:
+        return
+    # Samples still held back for reordering are classified, and rows still queued for these sessions
+    # written, before they are closed
+    for session in ended:
+        if session.reorder:
+            classify_released(session, reorderer.flush(session.reorder))
+    while inference_engine.pending():
+        inference_engine.run_once()
+    log_writer.flush()
+    try:
+        write_sessions([session.session_id for session in ended], [session.stats for session in ended])
+    except Exception as e:
+        print(f"ERROR: Failed to end driving sessions: {e}")
+    for session in ended:
+        sessions.remove(session)
+        reorderer.discard(session.reorder)
+        feature_stage.release(session.vehicle_id)
+        decimator.release(session.vehicle_id)
+        if raw_archive:
+            raw_archive.close_session(session.archive_name)
+        broadcaster.forget(session.vehicle_id)
+
+def restart_stream(session):
+    """Starts a vehicle's window and streaming features afresh, e.g. after a gap in its samples."""
+    session.window.clear()
+    feature_stage.release(session.vehicle_id)
+    decimator.restart(session.vehicle_id)
+
+def reset_driver_session(sid, vehicle_id=None):
+    """Ends the session a request refers to and starts a fresh one for the same vehicle."""
+    session = sessions.find(sid, vehicle_id)
+    if session is None:
+        return None
+    owner = session.sid
+    end_driver_sessions([session])
+    return start_driver_session(owner, session.vehicle_id)
+
+def get_session_stats(session_id):
+    """Returns the running aggregates for a session, restoring closed ones from SQLite."""
+    session = sessions.by_session_id(session_id)
+    if session is not None:
+        return session.stats
+    log_writer.flush()
+    conn = sqlite3.connect(DATABASE)
+    try:
+        return SessionStats.load(conn, session_id)
+    finally:
         conn.close()
-        print("INFO: Previous driving logs cleared for new session.")
+
+def write_sessions(ended, stats):
+    """Closes the `ended` session ids and checkpoints `stats`; in a cluster the coordinator writes them."""
+    if not CLUSTER_ADDRESS:
+        conn = sqlite3.connect(DATABASE)
+        try:
+            for session_id in ended:
+                schema.end_session(conn, session_id)
+            with conn:
+                for s in stats:
+                    s.checkpoint(conn)
+        finally:
+            conn.close()
+        return
+    # Samples classified while waiting for the coordinator mark their session dirty again
+    rows = [s.checkpoint_row() for s in stats]
+    for s in stats:
+        s.dirty = False
+    try:
+        log_writer.write_sessions(ended, rows)
+    except Exception:
+        for s in stats:
+            s.dirty = True
+        raise
+
+def checkpoint_session_stats():
+    """Writes every session whose aggregates changed since the last checkpoint."""
+    dirty = [session.stats for session in sessions if session.stats.dirty]
+    if not dirty:
+        return
+    try:
+        write_sessions([], dirty)
     except Exception as e:
-        print(f"ERROR: Failed to clear database: {e}")
+        print(f"ERROR: Failed to checkpoint session statistics: {e}")
+
+def run_session_maintenance():
+    while session_maintenance_running:
+        socketio.sleep(STATS_CHECKPOINT_INTERVAL_S)
+        end_driver_sessions(sessions.idle())
+        checkpoint_session_stats()
+        if raw_archive:
+            raw_archive.flush_idle()
+
+def run_reorder_expiry():
+    """Releases samples held back for vehicles that stopped sending before their watermark moved on."""
+    while session_maintenance_running:
+        socketio.sleep(REORDER_LATENESS_MS / 2000)
+        for session in sessions:
+            if session.reorder:
+                classify_released(session, reorderer.expire(session.reorder))
+
+def start_session_maintenance():
+    global session_maintenance_running
+    if not session_maintenance_running:
+        session_maintenance_running = True
+        socketio.start_background_task(run_session_maintenance)
+        if REORDER_LATENESS_MS > 0:
+            socketio.start_background_task(run_reorder_expiry)
 
 # --- TensorFlow Model Loading ---
+# MODEL_BACKEND: 'numpy' (default, no TensorFlow), 'tflite' or 'keras'
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'numpy')
 lstm_model = None
 try:
-    if os.path.exists("models/lstm_model.h5"):
-        lstm_model = load_model("models/lstm_model.h5")
-        print("INFO: LSTM model loaded successfully.")
+    if MODEL_BACKEND not in BACKENDS:
+        print(f"WARNING: Unknown MODEL_BACKEND '{MODEL_BACKEND}', using 'numpy'.")
+        MODEL_BACKEND = 'numpy'
+    if os.path.exists(MODEL_PATH):
+        lstm_model = load_backend(MODEL_BACKEND, MODEL_PATH)
+        print(f"INFO: LSTM model loaded successfully ({MODEL_BACKEND} backend).")
     else:
-        print("INFO: 'models/lstm_model.h5' not found. Running without predictions.")
+        print(f"INFO: '{MODEL_PATH}' not found. Running without predictions.")
 except Exception as e:
     print(f"CRITICAL ERROR: Failed to load LSTM model: {e}")
     print("The application will run, but predictions will NOT be available.")
 
-# --- In-memory buffer for Time Series (LSTM input) ---
-sequence_buffer = []
-SEQUENCE_LENGTH = 5
-NUM_FEATURES = 6
+# --- Streaming features ---
+# Rolling statistics per vehicle over FEATURE_WINDOWS samples (see features.py); the model
+# reads the MODEL_FEATURES columns of each feature vector. Both default to what `train.py --promote`
+# recorded next to the model, else the raw sensor axes. A model reading raw axes only takes them
+# straight from the samples and the stage is skipped.
+trained_features = load_features(MODEL_PATH)
+FEATURE_WINDOWS = parse_windows(os.environ.get(
+    'FEATURE_WINDOWS', ','.join(map(str, trained_features[1] if trained_features else (10, 50)))))
+MODEL_FEATURES = [name for name in os.environ.get(
+    'MODEL_FEATURES', ','.join(trained_features[0] if trained_features else RAW_FEATURES)).split(',') if name]
+if trained_features and MODEL_FEATURES != trained_features[0]:
+    print(f"WARNING: MODEL_FEATURES differs from the features '{MODEL_PATH}' was trained on: "
+          f"{','.join(trained_features[0])}.")
+feature_stage = FeatureExtractor(FEATURE_WINDOWS)
+model_columns = feature_stage.columns(MODEL_FEATURES)
+raw_model_features = all(name in RAW_FEATURES for name in MODEL_FEATURES)
+
+# --- Sample rate ---
+# Vehicles sampling faster than MODEL_SAMPLE_RATE_HZ (phone IMUs: 50-200 Hz) are low-pass filtered and
+# decimated to it before the feature stage (see decimate.py), up to DECIMATION_MAX_FACTOR times. Only
+# the samples that reach the model are stored in driving_log; the others are answered with the result
+# of the latest one before them. MODEL_SAMPLE_RATE_HZ=0 sends every sample to the model.
+MODEL_SAMPLE_RATE_HZ = float(os.environ.get('MODEL_SAMPLE_RATE_HZ', 10))
+DECIMATION_MAX_FACTOR = int(os.environ.get('DECIMATION_MAX_FACTOR', 20))
+decimator = Decimator(MODEL_SAMPLE_RATE_HZ, DECIMATION_MAX_FACTOR)
+
+# Every raw sample, at the rate it arrived, is also appended to RAW_ARCHIVE_ROOT/session_<id>_<start time>
+# in the columnar format of telemetry_archive.py, in chunks of up to RAW_ARCHIVE_CHUNK_ROWS rows written at
+# least every RAW_ARCHIVE_FLUSH_S. Until then a vehicle's rows are held in memory: at 200 Hz and the
+# defaults 12,000 rows, about 0.4 MB from sensor_batch frames and a few MB from sensor_data events.
+# Once the archive exceeds RAW_ARCHIVE_MAX_GB, the oldest closed sessions are deleted (0 keeps all);
+# the archive is measured once at startup and then tracked as it is written. An empty
+# RAW_ARCHIVE_ROOT disables the raw archive.
+RAW_ARCHIVE_ROOT = os.environ.get('RAW_ARCHIVE_ROOT', os.path.join('archive', 'raw'))
+RAW_ARCHIVE_CHUNK_ROWS = int(os.environ.get('RAW_ARCHIVE_CHUNK_ROWS', 100000))
+RAW_ARCHIVE_FLUSH_S = float(os.environ.get('RAW_ARCHIVE_FLUSH_S', 60))
+RAW_ARCHIVE_MAX_GB = float(os.environ.get('RAW_ARCHIVE_MAX_GB', 10))
+raw_archive = LiveArchive(RAW_ARCHIVE_ROOT, RAW_ARCHIVE_CHUNK_ROWS, RAW_ARCHIVE_FLUSH_S,
+                          max_bytes=int(RAW_ARCHIVE_MAX_GB * 1e9)) if RAW_ARCHIVE_ROOT else None
+if raw_archive:
+    atexit.register(raw_archive.close)
+
+# --- Per-vehicle sessions and their Time Series (LSTM input) windows ---
+# One preallocated ring per vehicle so concurrent streams never share a window, of the
+# length the model was promoted with (5 samples without a features file).
+SEQUENCE_LENGTH = trained_features[2] if trained_features else 5
+NUM_FEATURES = len(MODEL_FEATURES)
+sessions = SessionRegistry(SEQUENCE_LENGTH, NUM_FEATURES, SESSION_IDLE_TIMEOUT_S)
+sessions_starting = {}  # vehicle_id -> Event set once the session being opened for it is registered
+
+# --- Sample ordering ---
+# Each vehicle's sensor_data samples reach its window in Timestamp order (see reorder.py): a sample waits
+# until the vehicle's newest timestamp is REORDER_LATENESS_MS past it, so one arriving up to that late
+# still takes its place. The default 200 ms is two intervals at 10 Hz (40 samples at 200 Hz, within
+# REORDER_MAX_PENDING) and delays each reply by as much; a client that waits for each reply before sending
+# its next sample only gets it once the vehicle has been quiet that long. REORDER_LATENESS_MS=0 holds
+# nothing back and drops out-of-order samples as late. A jump of more than REORDER_GAP_MS between consecutive samples
+# restarts the vehicle's window (0 disables).
+REORDER_LATENESS_MS = float(os.environ.get('REORDER_LATENESS_MS', 200))
+REORDER_GAP_MS = float(os.environ.get('REORDER_GAP_MS', 2000))
+REORDER_MAX_PENDING = int(os.environ.get('REORDER_MAX_PENDING', 64))
+reorderer = Reorderer(REORDER_LATENESS_MS, REORDER_GAP_MS, REORDER_MAX_PENDING)
+
+# --- Micro-batched inference ---
+# Ready windows from every connected client are scored together once per tick.
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 64))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 10))
+
+# Forward passes run off the eventlet hub ('inline' restores the old in-thread behaviour).
+# Samples whose batch is rejected, times out or fails are logged with INFERENCE_FALLBACK_RISK.
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'thread')
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 1))
+INFERENCE_MAX_IN_FLIGHT = int(os.environ.get('INFERENCE_MAX_IN_FLIGHT', 4))
+INFERENCE_TIMEOUT_MS = float(os.environ.get('INFERENCE_TIMEOUT_MS', 1000))
+INFERENCE_FALLBACK_RISK = os.environ.get('INFERENCE_FALLBACK_RISK', 'Unavailable')
+if INFERENCE_MODE not in INFERENCE_MODES:
+    print(f"WARNING: Unknown INFERENCE_MODE '{INFERENCE_MODE}', using 'thread'.")
+    INFERENCE_MODE = 'thread'
+
+def predict_windows(batch):
+    return lstm_model.predict(batch)
+
+def create_inference_executor():
+    if INFERENCE_MODE == 'process':
+        return ProcessExecutor(MODEL_BACKEND, MODEL_PATH, INFERENCE_WORKERS)
+    if INFERENCE_MODE == 'thread':
+        return ThreadExecutor(predict_windows, socketio.start_background_task)
+    return InlineExecutor(predict_windows)
+
+inference_pool = InferencePool(
+    create_inference_executor() if lstm_model else InlineExecutor(predict_windows),
+    max_in_flight=INFERENCE_MAX_IN_FLIGHT,
+    timeout=INFERENCE_TIMEOUT_MS / 1000
+)
+
+# Near-duplicate windows (parked cars, steady cruising) reuse earlier outputs instead of a forward pass.
+# PREDICTION_CACHE_SIZE=0 disables the cache; CHANGE_GATE_THRESHOLD=0 (the default) disables the gate.
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_RESOLUTION = float(os.environ.get('PREDICTION_CACHE_RESOLUTION', 0.05))
+CHANGE_GATE_THRESHOLD = float(os.environ.get('CHANGE_GATE_THRESHOLD', 0))
+prediction_cache = PredictionCache(inference_pool.predict, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_RESOLUTION)
+change_gate = ChangeGate(CHANGE_GATE_THRESHOLD)
+
+inference_engine = BatchInferenceEngine(
+    prediction_cache.predict,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait=INFERENCE_MAX_WAIT_MS / 1000,
+    sleep=socketio.sleep,
+    fallback_risk_level=INFERENCE_FALLBACK_RISK
+)
+
+# --- Dashboard broadcast ---
+# Telemetry is coalesced per vehicle and pushed to subscribed dashboards at a fixed rate.
+DASHBOARD_REFRESH_HZ = float(os.environ.get('DASHBOARD_REFRESH_HZ', 10))
+DASHBOARD_MAX_QUEUE_DEPTH = int(os.environ.get('DASHBOARD_MAX_QUEUE_DEPTH', 32))
+broadcaster = DashboardBroadcaster(socketio, DASHBOARD_REFRESH_HZ, DASHBOARD_MAX_QUEUE_DEPTH,
+                                   fanout='room' if CLUSTER_ADDRESS else 'client')
+
+def telemetry_values(timestamp, features, speed, predicted_class, risk_level):
+    values = dict(zip(('AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ'), features))
+    values.update(timestamp=timestamp, speed=speed, risk_level=risk_level)
+    values['class'] = predicted_class
+    return values
 
 # --- Flask Routes ---
 @app.route('/')
@@ -102,17 +431,15 @@ def dashboard():
 
 @app.route('/run_simulator')
 def run_simulator():
-    global simulator_process, active_session, session_start_time
+    global simulator_process
     try:
         if simulator_process is None or simulator_process.poll() is not None:
             python_path = sys.executable
             simulator_process = subprocess.Popen([python_path, "simulator.py"])
-            active_session = True
-            session_start_time = datetime.now()
             return jsonify({
                 "status": "success", 
                 "message": "Simulator started successfully",
-                "start_time": session_start_time.strftime('%Y-%m-%d %H:%M:%S')
+                "start_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             })
         return jsonify({
             "status": "error", 
@@ -124,34 +451,216 @@ def run_simulator():
             "message": f"Failed to start simulator: {str(e)}"
         })
 
+@app.route('/ingest_stats')
+def ingest_stats():
+    return jsonify({
+        "db_writer": log_writer.stats(),
+        "handler_latency": handler_latency.summary(),
+        "stage_latency": {stage: histogram.summary() for stage, histogram in stage_latency.items()},
+        "db_commit_latency": db_commit_latency.summary(),
+        "inference": inference_engine.stats(),
+        "inference_pool": inference_pool.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "change_gate": change_gate.stats(),
+        "reorder": reorderer.stats(),
+        "decimation": decimator.stats(),
+        "raw_archive": raw_archive.stats() if raw_archive else None,
+        "sessions": sessions.stats(),
+        "features": dict(feature_stage.stats(), skipped=raw_model_features),
+        "cluster": {
+            "coordinator": CLUSTER_ADDRESS,
+            "shard": CLUSTER_SHARD,
+            "shards": CLUSTER_SHARDS,
+            "misrouted_vehicles": misrouted_vehicles
+        }
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latency histograms and ingest counters in the Prometheus text format."""
+    writer = log_writer.stats()
+    inference = inference_engine.stats()
+    cache = prediction_cache.stats()
+    reorder = reorderer.stats()
+    decimation = decimator.stats()
+    text = prometheus_text(
+        histograms=[
+            ('driving_stage_seconds', 'Time spent per ingest stage.', 'stage', stage_latency),
+            ('driving_handler_seconds', 'Time spent in sensor_data/sensor_batch handlers.', None,
+             {None: handler_latency}),
+            ('driving_db_commit_seconds', 'Time per driving_log batch commit.', None, {None: db_commit_latency})
+        ],
+        counters=[
+            ('driving_rows_written_total', 'driving_log rows committed (or shipped to the coordinator).',
+             writer.get('rows_written', writer.get('rows_sent', 0))),
+            ('driving_rows_dropped_total', 'driving_log rows dropped by backpressure.', writer['rows_dropped']),
+            ('driving_windows_scored_total', 'Windows scored by the LSTM.', inference['windows_scored']),
+            ('driving_windows_failed_total', 'Windows that got the fallback risk level.', inference['windows_failed']),
+            ('driving_prediction_cache_hits_total', 'Windows answered from the prediction cache.', cache['hits']),
+            ('driving_samples_late_total', 'Samples dropped as too late to reorder.', reorder['late']),
+            ('driving_samples_duplicate_total', 'Samples dropped as duplicate timestamps.', reorder['duplicates']),
+            ('driving_sample_gaps_total', 'Gaps that restarted a vehicle window.', reorder['gaps']),
+            ('driving_samples_decimated_total', 'Samples low-passed away before reaching the model.',
+             decimation['samples_in'] - decimation['samples_out']),
+            ('driving_raw_samples_archived_total', 'Raw samples written to the raw archive.',
+             raw_archive.rows_archived if raw_archive else 0)
+        ],
+        gauges=[
+            ('driving_db_queue_depth', 'Rows waiting to be written.', writer['queue_depth']),
+            ('driving_inference_pending', 'Windows waiting for the next micro-batch.', inference['pending']),
+            ('driving_sessions_open', 'Open driving sessions on this process.', len(sessions)),
+            ('driving_samples_pending', 'Samples held back for reordering.', reorder['pending']),
+            ('driving_streams_decimated', 'Vehicles sampling faster than the model rate.',
+             decimation['decimated_streams'])
+        ])
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/broadcast_stats')
+def broadcast_stats():
+    return jsonify(broadcaster.stats())
+
 @app.route('/reset_session')
 def reset_session():
-    global active_session, session_start_time
-    clear_driving_logs()
-    active_session = False
-    session_start_time = None
+    session = reset_driver_session(None, request.args.get('vehicle_id'))
+    if session is None:
+        return jsonify({
+            "status": "error",
+            "message": "No active session to reset"
+        })
     return jsonify({
         "status": "success", 
-        "message": "Session reset successfully"
+        "message": "Session reset successfully",
+        "vehicle_id": session.vehicle_id,
+        "session_id": session.session_id
     })
 
+def history_error(message, status=400):
+    return jsonify({"status": "error", "message": message}), status
+
+def query_number(name, cast=float):
+    """Query parameter as a number, None if absent; raises ValueError naming the parameter."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number") from None
+
+def with_live_state(summary):
+    """Marks sessions open on this process and replaces their last checkpoint by the running aggregates."""
+    session = sessions.by_session_id(summary['session_id'])
+    summary['active'] = session is not None
+    if session is not None and session.stats.count:
+        stats = session.stats
+        summary.update(sample_count=stats.count, first_timestamp=stats.first_ts, last_timestamp=stats.last_ts,
+                       duration_s=stats.total_duration, speed_mean=stats.speed_sum / stats.count,
+                       speed_max=stats.speed_max, dwell_s=dict(stats.dwell))
+    return summary
+
+@app.route('/sessions')
+def list_sessions():
+    """Sessions newest first; page with ?before=<started_at of the last one>, filter with ?vehicle_id=."""
+    try:
+        before = query_number('before')
+        limit = query_number('limit', int)
+    except ValueError as e:
+        return history_error(str(e))
+    limit = min(max(1, limit or 50), HISTORY_MAX_SESSIONS)
+    conn = sqlite3.connect(DATABASE)
+    try:
+        found = history.list_sessions(conn, request.args.get('vehicle_id'), before, limit)
+    finally:
+        conn.close()
+    return jsonify({"sessions": [with_live_state(summary) for summary in found]})
+
+@app.route('/sessions/<int:session_id>')
+def session_detail(session_id):
+    conn = sqlite3.connect(DATABASE)
+    try:
+        summary = history.get_session(conn, session_id)
+    finally:
+        conn.close()
+    if summary is None:
+        return history_error(f"Unknown session {session_id}", 404)
+    return jsonify(with_live_state(summary))
+
+@app.route('/sessions/<int:session_id>/telemetry')
+def session_telemetry(session_id):
+    """Min/mean/max per bucket of a session's samples in [start, end) (epoch ms, default: the whole session).
+
+    ?resolution=<ms> fixes the bucket width; otherwise ?points= (default HISTORY_POINTS) picks it.
+    """
+    try:
+        start = query_number('start')
+        end = query_number('end')
+        resolution = query_number('resolution', int)
+        points = query_number('points', int)
+    except ValueError as e:
+        return history_error(str(e))
+    if resolution is not None and resolution <= 0:
+        return history_error("'resolution' must be positive")
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if history.get_session(conn, session_id) is None:
+            return history_error(f"Unknown session {session_id}", 404)
+        if start is None or end is None:
+            first, last = history.time_range(conn, session_id)
+            start = (first or 0) if start is None else start
+            end = (last or 0) + 1 if end is None else end
+        if end <= start:
+            return history_error("'end' must be after 'start'")
+        if resolution is None:
+            resolution = history.choose_resolution(start, end, min(max(1, points or HISTORY_POINTS),
+                                                                   HISTORY_MAX_POINTS))
+        elif (end - start) / resolution + 1 > HISTORY_MAX_POINTS:
+            return history_error(f"More than {HISTORY_MAX_POINTS} points requested; "
+                                 f"use a resolution of at least {history.choose_resolution(start, end, HISTORY_MAX_POINTS)} ms")
+        result = history.session_telemetry(conn, session_id, start, end, resolution,
+                                           (*RISK_LEVELS.values(), INFERENCE_FALLBACK_RISK))
+    finally:
+        conn.close()
+    return jsonify(result)
+
 # --- SocketIO Event Handlers ---
 @socketio.on('connect')
 def handle_connect():
     print(f"INFO: Client connected. SID: {request.sid}")
+    log_writer.start()
+    start_session_maintenance()
+    broadcaster.start(socketio.start_background_task)
+    if lstm_model:
+        inference_engine.start(socketio.start_background_task)
     emit('connection_status', {'status': 'connected'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print(f"INFO: Client disconnected. SID: {request.sid}")
+    # Sessions keyed by this SID can never receive another sample; vehicle sessions wait for their idle timeout
+    orphaned = [session for session in sessions.detach(request.sid) if session.vehicle_id == request.sid]
+    end_driver_sessions(orphaned)
+    broadcaster.unsubscribe(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    """Dashboards pick one channel: a vehicle_id, a session_id, or every vehicle when neither is given."""
+    data = data or {}
+    room = broadcaster.subscribe(request.sid, data.get('vehicle_id'), data.get('session_id'))
+    emit('subscribed', {'room': room})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe():
+    broadcaster.unsubscribe(request.sid)
 
 @socketio.on('reset_session')
-def handle_reset_session():
-    global session_start_time, session_active
-    clear_driving_logs()
-    session_start_time = datetime.now()
-    session_active = True
-    emit('session_reset', {'status': 'success', 'start_time': session_start_time.isoformat()})
+def handle_reset_session(data=None):
+    """Resets only the named vehicle's session, or the caller's own (most recently active if it feeds none)."""
+    session = reset_driver_session(request.sid, (data or {}).get('vehicle_id'))
+    if session is None:
+        emit('session_reset', {'status': 'error', 'message': 'No active session to reset'})
+        return
+    emit('session_reset', {'status': 'success', 'start_time': session.started_at.isoformat(),
+                           'vehicle_id': session.vehicle_id, 'session_id': session.session_id})
     
 @socketio.on('sensor_data')
 #def handle_sensor_data(data_point):
@@ -164,12 +673,14 @@ def handle_reset_session():
 #    ]
 #    speed = data_point.get('speed', 0)
 def handle_sensor_data(data_point):
-    global sequence_buffer, session_start_time, session_active
-    
-    if not session_active:
-        session_start_time = datetime.now()
-        session_active = True
+    started = time.perf_counter()
+    clock = stage_clock()
+    if isinstance(data_point, dict):
+        record_transit(clock, data_point.get('Timestamp'))
+    ingest_sample(request.sid, data_point, clock)
+    handler_latency.observe(time.perf_counter() - started)
 
+def ingest_sample(sid, data_point, clock=NULL_CLOCK):
     # Ensure all required fields are present
     required_fields = ['Timestamp', 'AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ', 'speed']
     if not all(field in data_point for field in required_fields):
@@ -183,46 +694,85 @@ def handle_sensor_data(data_point):
     ]
     speed = data_point['speed']
 
-    if any(f is None for f in features) or timestamp is None:
+    if any(f is None for f in features) or not isinstance(timestamp, (int, float)):
         return
+    clock.lap('validate')
 
-    current_features = np.array(features, dtype=np.float32)
-    sequence_buffer.append(current_features)
+    session = session_for(sid, data_point.get('vehicle_id') or sid)
+    released = reorderer.offer(session.reorder, timestamp, (sid, features, speed, clock))
+    if released is None:
+        # Late or duplicate: not stored, but still answered, with the vehicle's latest result
+        clock.lap('buffer')
+        complete_sample(sid, session, timestamp, features, speed, *session.last_result, clock,
+                        store=False, publish=False)
+        return
+    classify_released(session, released)
 
-    if len(sequence_buffer) > SEQUENCE_LENGTH:
-        sequence_buffer.pop(0)
+def classify_released(session, released):
+    """Classifies the (timestamp, (sid, features, speed, clock), gap) samples a reorder buffer released."""
+    for timestamp, (sid, features, speed, clock), gap in released:
+        classify_sample(sid, session, timestamp, features, speed, gap, clock)
 
-    predicted_class = 0
-    risk_level = "Collecting Data"
+def classify_sample(sid, session, timestamp, features, speed, gap=False, clock=NULL_CLOCK):
+    """Adds one in-order sample to its vehicle's window and scores the window once it is full.
 
-    if len(sequence_buffer) == SEQUENCE_LENGTH and lstm_model:
-        try:
-            input_sequence = np.array([sequence_buffer])
-            prediction = lstm_model.predict(input_sequence, verbose=0)
-            predicted_class = int(np.argmax(prediction) + 1)
-
-            risk_level = {
-                1: "Aggressive",
-                2: "Normal",
-                3: "Slow"
-            }.get(predicted_class, "Invalid Class")
-        except Exception as e:
-            print(f"ERROR: Error during LSTM prediction: {e}")
-            risk_level = "Error"
+    A sample the decimator drops is answered with the vehicle's latest result and, unless it starts
+    a gap, not stored in driving_log. The raw archive gets every sample, labelled with the result
+    known so far.
+    """
+    if gap:
+        restart_stream(session)
+    if raw_archive:
+        raw_archive.append(session.archive_name, [timestamp], [[*features, speed]], [session.last_result[0]])
+    filtered = decimator.decimate_one(session.vehicle_id, timestamp, features)
+    if filtered is None:
+        clock.lap('buffer')
+        complete_sample(sid, session, timestamp, features, speed, *session.last_result, clock, gap, store=gap)
+        return
+    window = session.window
+    if raw_model_features:
+        window.append(filtered[model_columns])
+    else:
+        window.append(feature_stage.update_one(session.vehicle_id, filtered)[model_columns])
+    clock.lap('buffer')
 
-    try:
-        conn = sqlite3.connect(DATABASE)
-        cur = conn.cursor()
-        cur.execute('''INSERT INTO driving_log
-                      (timestamp, acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z, speed, predicted_class, risk_level)
-                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                   (timestamp, *features, speed, predicted_class, risk_level))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"ERROR: Error storing data to database: {e}")
+    if window.is_full() and lstm_model:
+        reused_class = change_gate.reuse(window)
+        if reused_class is not None:
+            clock.lap('inference')
+            session.last_result = (reused_class, RISK_LEVELS[reused_class])
+            complete_sample(sid, session, timestamp, features, speed, *session.last_result, clock, gap)
+            return
+
+        scored = np.array(window.view())
+
+        def on_scored(predicted_class, risk_level):
+            # Includes the wait for the micro-batch and the inference pool
+            clock.lap('inference')
+            if predicted_class in RISK_LEVELS:
+                change_gate.record(window, scored, predicted_class)
+            session.last_result = (predicted_class, risk_level)
+            complete_sample(sid, session, timestamp, features, speed, predicted_class, risk_level, clock, gap)
+
+        inference_engine.submit(scored, on_scored)
+    else:
+        session.last_result = (0, "Collecting Data")
+        complete_sample(sid, session, timestamp, features, speed, *session.last_result, clock, gap)
 
-    emit('update', {
+def complete_sample(sid, session, timestamp, features, speed, predicted_class, risk_level, clock=NULL_CLOCK,
+                    gap=False, store=True, publish=True):
+    """Queues a classified sample for storage and dashboards (unless `store`/`publish` are False) and sends
+    the result back to its client."""
+    if store:
+        log_writer.submit((session.session_id, session.vehicle_id, timestamp, *features, speed,
+                           predicted_class, risk_level, int(gap)))
+        session.stats.update(timestamp, speed, risk_level, gap)
+    clock.lap('db_write')
+    if publish:
+        broadcaster.publish(session.vehicle_id, session.session_id,
+                            telemetry_values(timestamp, features, speed, predicted_class, risk_level))
+
+    update = {
         'timestamp': timestamp,
         'speed': speed,
         'class': predicted_class,
@@ -235,8 +785,187 @@ def handle_sensor_data(data_point):
             'GyroY': features[4],
             'GyroZ': features[5]
         }
-    })
-    emit('risk_alert', {'risk_level': risk_level})
+    }
+    timing = clock.echo()
+    if timing is not None:
+        update['timing'] = timing
+    socketio.emit('update', update, to=sid)
+    socketio.emit('risk_alert', {'risk_level': risk_level}, to=sid)
+    clock.lap('emit')
+
+@socketio.on('sensor_batch')
+def handle_sensor_batch(payload):
+    """Batched, binary counterpart of sensor_data: many samples in, one batch_result frame out."""
+    started = time.perf_counter()
+    clock = stage_clock()
+    try:
+        batch = wire.decode_samples(payload['frame'])
+    except (KeyError, TypeError, wire.FrameError) as e:
+        print(f"ERROR: Invalid sensor batch: {e}")
+        return
+    if len(batch):
+        record_transit(clock, int(batch.timestamps.max()))
+    clock.lap('validate')
+    predicted = ingest_batch(request.sid, batch, clock)
+    result = {'frame': wire.encode_results(batch.vehicle_ids, batch.vehicle_index, batch.timestamps, predicted)}
+    timing = clock.echo()
+    if timing is not None:
+        result['timing'] = timing
+    emit('batch_result', result)
+    clock.lap('emit')
+    handler_latency.observe(time.perf_counter() - started)
+
+def ingest_batch(sid, batch, clock=NULL_CLOCK):
+    """Windows, scores and stores a decoded SampleBatch; returns the predicted class per sample.
+
+    Late and duplicate samples are not stored and come back as reorder.DROPPED.
+    """
+    n = len(batch)
+    predicted = np.full(n, DROPPED, dtype=np.int8)
+    unavailable = np.zeros(n, dtype=bool)
+    if n == 0:
+        return predicted
+
+    # Put each vehicle's samples into Timestamp order and split them at gaps
+    vehicle_sessions = [None] * len(batch.vehicle_ids)
+    for vehicle in np.unique(batch.vehicle_index).tolist():
+        session = vehicle_sessions[vehicle] = session_for(sid, batch.vehicle_ids[vehicle])
+        if session.reorder:
+            classify_released(session, reorderer.flush(session.reorder))  # held sensor_data samples go first
+    stored, gaps = reorderer.order_batch([session and session.reorder for session in vehicle_sessions],
+                                         batch.vehicle_index, batch.timestamps)
+    predicted[stored] = 0
+    gap_rows = np.zeros(n, dtype=bool)
+    gap_rows[stored[gaps]] = True
+    stored_vehicles = batch.vehicle_index[stored]
+    starts = np.flatnonzero(np.r_[True, stored_vehicles[1:] != stored_vehicles[:-1]] | gaps)
+    segments = []  # (vehicle, rows in timestamp order, segments of the vehicle before it; > 0 follows a gap)
+    for start, rows in zip(starts.tolist(), np.split(stored, starts[1:]) if len(stored) else []):
+        vehicle = int(stored_vehicles[start])
+        index = segments[-1][2] + 1 if segments and segments[-1][0] == vehicle else int(gaps[start])
+        segments.append((vehicle, rows, index))
+
+    # Decimate high-rate streams to the model rate; only the kept (model) rows get features and windows.
+    # A segment after a gap restarts its vehicle's stream, so each vehicle's segments go in separate rounds.
+    features = np.zeros((n, len(model_columns)), dtype=np.float32)
+    model_rows = np.zeros(n, dtype=bool)
+    vehicle_slots = np.zeros(len(batch.vehicle_ids), dtype=np.int64)
+    decimator_slots = np.zeros(len(batch.vehicle_ids), dtype=np.int64)
+    for index in range(max((index for _, _, index in segments), default=-1) + 1):
+        current = [(vehicle, rows) for vehicle, rows, i in segments if i == index]
+        if not current:
+            continue
+        for vehicle, rows in current:
+            vehicle_id = vehicle_sessions[vehicle].vehicle_id
+            if index > 0:
+                feature_stage.release(vehicle_id)
+                decimator.restart(vehicle_id)
+            if not raw_model_features:
+                vehicle_slots[vehicle] = feature_stage.slot(vehicle_id)
+            decimator_slots[vehicle] = decimator.slot(vehicle_id)
+        rows = np.concatenate([rows for _, rows in current])
+        kept, filtered = decimator.decimate(decimator_slots[batch.vehicle_index[rows]], batch.timestamps[rows],
+                                            batch.features[rows])
+        rows = rows[kept]
+        model_rows[rows] = True
+        if raw_model_features:
+            features[rows] = filtered[:, model_columns]
+        else:
+            features[rows] = feature_stage.update(vehicle_slots[batch.vehicle_index[rows]], filtered)[:, model_columns]
+
+    ready_windows, ready_rows, gated, reused = [], [], {}, []
+    for vehicle, rows, index in segments:
+        session = vehicle_sessions[vehicle]
+        window = session.window
+        if index > 0:
+            window.clear()
+            gated.pop(vehicle, None)
+        rows = rows[model_rows[rows]]
+        if not len(rows):
+            continue
+        history = window.history()[-(SEQUENCE_LENGTH - 1):] if SEQUENCE_LENGTH > 1 else window.history()[:0]
+        samples = features[rows]
+        combined = np.concatenate([history, samples]) if len(history) else samples
+        if len(combined) >= SEQUENCE_LENGTH:
+            # Window k ends at combined[k + SEQUENCE_LENGTH - 1], i.e. at new sample k + offset
+            offset = SEQUENCE_LENGTH - 1 - len(history)
+            windows, window_rows = sliding_windows(combined, SEQUENCE_LENGTH), rows[offset:]
+            reuse = change_gate.matches(window, windows)
+            if reuse.any():
+                # Reused windows take the class of the latest window scored before them, in this frame or earlier
+                source = np.maximum.accumulate(np.where(reuse, -1, np.arange(len(reuse))))
+                from_frame = reuse & (source >= 0)
+                if window.last_class is not None:
+                    predicted[window_rows[reuse & ~from_frame]] = window.last_class
+                reused.append((window_rows[from_frame], window_rows[source[from_frame]]))
+                windows, window_rows = windows[~reuse], window_rows[~reuse]
+            if len(window_rows):
+                ready_windows.append(windows)
+                ready_rows.append(window_rows)
+                gated[vehicle] = (window, np.array(windows[-1]), window_rows[-1])
+        window.extend(samples)
+    clock.lap('buffer')
+
+    if ready_windows and lstm_model:
+        rows = np.concatenate(ready_rows)
+        try:
+            predicted[rows] = predicted_classes(prediction_cache.predict(np.concatenate(ready_windows)))
+        except InferenceUnavailable as e:
+            print(f"ERROR: Error during batched LSTM prediction: {e}")
+            unavailable[rows] = True
+        else:
+            for window, last_window, row in gated.values():
+                change_gate.record(window, last_window, int(predicted[row]))
+    for rows, sources in reused:
+        predicted[rows] = predicted[sources]
+        unavailable[rows] = unavailable[sources]
+    clock.lap('inference')
+
+    # Samples decimated away answer with the latest model sample before them in their segment, or
+    # with their vehicle's result from earlier frames (none after a gap)
+    decimated = ~model_rows[stored]
+    if decimated.any():
+        position = np.arange(len(stored))
+        source = np.maximum.accumulate(np.where(decimated, -1, position))
+        segment_start = starts[np.searchsorted(starts, position, side='right') - 1]
+        carried = decimated & (source >= segment_start)
+        predicted[stored[carried]] = predicted[stored[source[carried]]]
+        unavailable[stored[carried]] = unavailable[stored[source[carried]]]
+        for start, (vehicle, rows, index) in zip(starts.tolist(), segments):
+            leading = rows[decimated[start:start + len(rows)] & ~carried[start:start + len(rows)]]
+            if len(leading):
+                predicted_class, risk_level = vehicle_sessions[vehicle].last_result if index == 0 else (0, None)
+                predicted[leading] = predicted_class
+                unavailable[leading] = risk_level == INFERENCE_FALLBACK_RISK
+
+    if raw_archive:
+        for vehicle, rows, _ in segments:
+            raw_archive.append(vehicle_sessions[vehicle].archive_name, batch.timestamps[rows], batch.values[rows],
+                               predicted[rows])
+
+    # driving_log and the report aggregates get the model-rate samples, plus gap starts so that no
+    # duration is credited across a gap
+    latest = {}
+    modelled = stored[(model_rows | gap_rows)[stored]]
+    for vehicle, timestamp, values, predicted_class, failed, gap in zip(
+            batch.vehicle_index[modelled].tolist(), batch.timestamps[modelled].tolist(),
+            batch.values[modelled].tolist(), predicted[modelled].tolist(), unavailable[modelled].tolist(),
+            gap_rows[modelled].tolist()):
+        session = vehicle_sessions[vehicle]
+        risk_level = INFERENCE_FALLBACK_RISK if failed else RISK_LEVELS.get(predicted_class, "Collecting Data")
+        log_writer.submit((session.session_id, session.vehicle_id, timestamp, *values, predicted_class, risk_level,
+                           int(gap)))
+        session.stats.update(timestamp, values[6], risk_level, gap)
+        latest[vehicle] = (timestamp, values, predicted_class, risk_level)
+    clock.lap('db_write')
+
+    # Dashboards only ever see the newest sample per vehicle, so publish one per vehicle
+    for vehicle, (timestamp, values, predicted_class, risk_level) in latest.items():
+        session = vehicle_sessions[vehicle]
+        session.last_result = (predicted_class, risk_level)
+        broadcaster.publish(session.vehicle_id, session.session_id,
+                            telemetry_values(timestamp, values[:6], values[6], predicted_class, risk_level))
+    return predicted
 
 @socketio.on('generate_driving_report')
 def handle_generate_driving_report(data=None):
@@ -244,62 +973,24 @@ def handle_generate_driving_report(data=None):
     print(f"INFO: Generating driving report for {driver_name}...")
     
     try:
-        conn = sqlite3.connect(DATABASE)
-        query = """
-            SELECT timestamp, speed, risk_level 
-            FROM driving_log 
-            WHERE timestamp >= ?
-            ORDER BY timestamp ASC
-        """
-        df = pd.read_sql_query(query, conn, params=(int(session_start_time.timestamp()*1000),))
-        conn.close()
-
-        if df.empty or len(df) < 2:
+        data = data or {}
+        session_id = data.get('session_id')
+        if session_id is None:
+            session = sessions.find(request.sid, data.get('vehicle_id'))
+            session_id = session.session_id if session is not None else None
+        if session_id is None and data.get('vehicle_id'):
+            # Vehicle served by another worker (or no longer active): use its latest stored session
+            log_writer.flush()
+            conn = sqlite3.connect(DATABASE)
+            try:
+                session_id = schema.latest_session(conn, data['vehicle_id'])
+            finally:
+                conn.close()
+        stats = get_session_stats(session_id) if session_id is not None else None
+        if stats is None:
             report_text = "Not enough driving data recorded for a report."
         else:
-            df['timestamp_dt'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df['duration'] = df['timestamp_dt'].diff().dt.total_seconds().fillna(0)
-            
-            # Calculate statistics
-            start_time = df['timestamp_dt'].iloc[0].strftime('%Y-%m-%d %H:%M:%S')
-            end_time = df['timestamp_dt'].iloc[-1].strftime('%Y-%m-%d %H:%M:%S')
-            total_duration = (df['timestamp_dt'].iloc[-1] - df['timestamp_dt'].iloc[0]).total_seconds()
-            avg_speed = df['speed'].mean()
-            max_speed = df['speed'].max()
-            
-            # Behavior analysis
-            behavior_summary = df.groupby('risk_level')['duration'].sum()
-            total_behavior_time = behavior_summary.sum()
-            
-            # Generate report
-            report_parts = [
-                "=== DRIVING BEHAVIOR ANALYSIS REPORT ===",
-                f"\nDriver: {driver_name}",
-                f"Session Start: {start_time}",
-                f"Session End: {end_time}",
-                f"Duration: {total_duration:.2f} seconds",
-                f"\n--- Speed Statistics ---",
-                f"Average Speed: {avg_speed:.2f} km/h",
-                f"Maximum Speed: {max_speed:.2f} km/h",
-                f"\n--- Behavior Summary ---"
-            ]
-            
-            for behavior, duration in behavior_summary.items():
-                percentage = (duration / total_behavior_time * 100) if total_behavior_time > 0 else 0
-                report_parts.append(
-                    f"{behavior}: {duration:.2f}s ({percentage:.1f}%)"
-                )
-            
-            # Safety score calculation
-            aggressive_time = behavior_summary.get('Aggressive', 0)
-            safety_score = max(0, 100 - (aggressive_time / total_duration * 100)) if total_duration > 0 else 100
-            report_parts.extend([
-                f"\n--- Safety Evaluation ---",
-                f"Safety Score: {safety_score:.1f}/100",
-                f"\n=== END OF REPORT ==="
-            ])
-            
-            report_text = "\n".join(report_parts)
+            report_text = stats.render_report(driver_name)
 
         emit('driving_report', {'report': report_text})
     except Exception as e:
@@ -309,11 +1000,26 @@ def handle_generate_driving_report(data=None):
 
 # --- Main Execution Block ---
 if __name__ == '__main__':
-    init_db()
+    if not CLUSTER_ADDRESS:
+        init_db()  # in cluster mode the coordinator has already done this
+    log_writer.start()
+    start_session_maintenance()
+    broadcaster.start(socketio.start_background_task)
+    if lstm_model:
+        inference_engine.start(socketio.start_background_task)
     try:
-        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+        socketio.run(app, debug=not CLUSTER_ADDRESS, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
     except KeyboardInterrupt:
-        print("\nINFO: Shutting down server...")
-        if simulator_process and simulator_process.poll() is None:
-            simulator_process.terminate()
-        sys.exit(0)
\ No newline at end of file
+        pass
+    # eventlet's server also returns normally on Ctrl+C, so shut down either way
+    print("\nINFO: Shutting down server...")
+    inference_engine.stop()
+    inference_pool.shutdown()
+    broadcaster.stop()
+    checkpoint_session_stats()
+    log_writer.close()
+    if raw_archive:
+        raw_archive.close()
+    if simulator_process and simulator_process.poll() is None:
+        simulator_process.terminate()
+    sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""Offline batch scoring of recorded motion CSVs with the LSTM.
+
+Builds every sliding window of a train/test_motion_data.csv-format file with
+stride tricks, scores them in large batches and writes the predictions in one
+buffered pass. Files larger than memory are processed in chunks. The model is
+fed the features and window length `train.py --promote` recorded next to it (see features.py),
+extracted by one streaming extractor whose state carries across chunks.
+
+Usage:
+    python batch_score.py data/test_motion_data.csv -o data/simulation_output.csv
+    python batch_score.py big.csv -o scored.csv --chunksize 500000 --batch-size 8192
+    python batch_score.py data/test_motion_data.csv -o out.csv --realtime 10
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import RAW_FEATURES, FeatureExtractor, feature_names
+from model_backend import BACKENDS, MODEL_PATH, load_backend, load_features
+from window_store import sliding_windows
+
+FEATURES = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ']
+SEQUENCE_LENGTH = 5  # for models without a features file
+OUTPUT_BUFFER_BYTES = 1 << 20
+
+
+def predict_classes(model, windows, batch_size):
+    """Scores windows in slices of `batch_size` and returns 1-based class ids."""
+    classes = np.empty(len(windows), dtype=np.int64)
+    for start in range(0, len(windows), batch_size):
+        batch = windows[start:start + batch_size]
+        predictions = model.predict(batch)
+        classes[start:start + len(batch)] = np.argmax(predictions, axis=1) + 1
+    return classes
+
+
+def score_chunks(chunks, model, batch_size, length=SEQUENCE_LENGTH, names=RAW_FEATURES,
+                 feature_windows=(10, 50)):
+    """Yields (chunk, predicted_class) for each chunk, carrying the last length-1 rows across chunks.
+
+    The model reads the `names` columns of the feature vector; the rolling
+    statistics are only computed if it reads more than the raw axes. Rows that
+    do not yet have a full window behind them get class 0, like the
+    "Collecting Data" samples of the live server.
+    """
+    columns = [feature_names(feature_windows).index(name) for name in names]
+    extractor = None if all(name in RAW_FEATURES for name in names) else FeatureExtractor(feature_windows, 1)
+    slot = extractor.slot(None) if extractor is not None else None
+    carry = np.empty((0, len(names)), dtype=np.float32)
+    for chunk in chunks:
+        values = chunk[FEATURES].to_numpy(dtype=np.float64)
+        if extractor is not None:
+            values = extractor.update(np.full(len(values), slot), values)
+        values = values[:, columns].astype(np.float32)
+        if len(carry):
+            values = np.concatenate([carry, values])
+        predicted = np.zeros(len(chunk), dtype=np.int64)
+        if len(values) >= length:
+            scored = predict_classes(model, sliding_windows(values, length), batch_size)
+            # Window k ends at row k + length - 1 of `values`, i.e. row k + length - 1 - len(carry) of the chunk
+            offset = length - 1 - len(carry)
+            predicted[max(offset, 0):] = scored[max(-offset, 0):]
+        carry = values[-(length - 1):] if length > 1 else values[:0]
+        yield chunk, predicted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score motion CSVs with the LSTM model.")
+    parser.add_argument('input', help="CSV with AccX..GyroZ columns and optionally Timestamp")
+    parser.add_argument('-o', '--output', default='data/simulation_output.csv')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--backend', choices=BACKENDS, default='numpy')
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--chunksize', type=int, default=200_000,
+                        help="rows read per chunk, bounds memory for large files")
+    parser.add_argument('--realtime', type=float, default=None, metavar='ROWS_PER_S',
+                        help="replay predictions at this rate for demos instead of as fast as possible")
+    args = parser.parse_args(argv)
+
+    model = load_backend(args.backend, args.model)
+    trained_features = load_features(args.model)
+    names, feature_windows, length = trained_features or (RAW_FEATURES, (10, 50), SEQUENCE_LENGTH)
+    started = time.perf_counter()
+    rows = 0
+    chunks = pd.read_csv(args.input, chunksize=args.chunksize)
+
+    with open(args.output, 'w', newline='', buffering=OUTPUT_BUFFER_BYTES) as out:
+        for i, (chunk, predicted) in enumerate(score_chunks(chunks, model, args.batch_size, length,
+                                                              names, feature_windows)):
+            if 'Timestamp' in chunk:
+                timestamps = chunk['Timestamp'].to_numpy()
+            else:
+                timestamps = np.full(len(chunk), int(time.time() * 1000))
+            frame = pd.DataFrame({'Timestamp': timestamps})
+            for feature in FEATURES:
+                frame[feature] = chunk[feature].to_numpy()
+            frame['Predicted_Class'] = predicted
+
+            if args.realtime:
+                replay(frame, out, header=(i == 0), rate=args.realtime)
+            else:
+                frame.to_csv(out, header=(i == 0), index=False)
+            rows += len(frame)
+
+    elapsed = time.perf_counter() - started
+    print(f"INFO: Scored {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s) -> {args.output}")
+
+
+def replay(frame, out, header, rate):
+    """Writes and prints rows one at a time at `rate` rows per second."""
+    if header:
+        out.write(','.join(frame.columns) + '\n')
+    interval = 1.0 / rate
+    next_due = time.perf_counter()
+    for row in frame.itertuples(index=False):
+        out.write(','.join(str(v) for v in row) + '\n')
+        out.flush()
+        print(f"Processed @ {row.Timestamp} | Predicted Class: {row.Predicted_Class}")
+        next_due += interval
+        delay = next_due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Scan benchmark: columnar memory-mapped archive vs. CSV vs. SQLite driving_log.
+
+Usage: python benchmarks/bench_archive.py [--rows 1000000] [--chunk-rows 250000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import schema
+import telemetry_archive
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunk-rows', type=int, default=250_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = args.rows
+    frame = pd.DataFrame({
+        'timestamp': 1_700_000_000_000 + np.arange(n, dtype=np.int64) * 100,
+        **{c: rng.normal(size=n).astype(np.float32) for c in ('acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z')},
+        'speed': rng.uniform(0, 160, n).astype(np.float32),
+        'predicted_class': rng.integers(1, 4, n).astype(np.int8),
+    })
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, 'bench.db')
+        schema.init_db(db)
+        conn = sqlite3.connect(db)
+        session_id = schema.start_session(conn, 'bench')
+        rows = frame.assign(session_id=session_id, risk_level='Normal')
+        rows.to_sql('driving_log', conn, if_exists='append', index=False, chunksize=100_000)
+        conn.close()
+
+        csv_path = os.path.join(directory, 'bench.csv')
+        frame.to_csv(csv_path, index=False)
+
+        root = os.path.join(directory, 'archive')
+        start = time.perf_counter()
+        telemetry_archive.export_session(db, session_id, root, args.chunk_rows)
+        print(f"export: {time.perf_counter() - start:.2f}s for {n} rows")
+        reader = telemetry_archive.ArchiveReader(root, session_id)
+
+        def sqlite_scan():
+            conn = sqlite3.connect(db)
+            df = pd.read_sql_query('SELECT timestamp, speed FROM driving_log WHERE session_id = ?', conn,
+                                   params=(session_id,))
+            conn.close()
+            return df['speed'].mean()
+
+        def csv_scan():
+            return pd.read_csv(csv_path, usecols=['timestamp', 'speed'])['speed'].mean()
+
+        def archive_scan():
+            return sum(float(c['speed'].sum(dtype=np.float64)) for c in reader.iter_chunks(['speed'])) / len(reader)
+
+        mid = 1_700_000_000_000 + (n // 2) * 100
+        window = (mid, mid + 60_000)  # one minute of 10 Hz data
+
+        def sqlite_range():
+            conn = sqlite3.connect(db)
+            df = pd.read_sql_query('SELECT timestamp, speed FROM driving_log WHERE session_id = ? '
+                                   'AND timestamp BETWEEN ? AND ?', conn, params=(session_id, *window))
+            conn.close()
+            return len(df)
+
+        def archive_range():
+            return len(reader.read_range(*window, columns=['speed'])['speed'])
+
+        for label, fn in (('full scan  sqlite ', sqlite_scan), ('full scan  csv    ', csv_scan),
+                          ('full scan  archive', archive_scan), ('1-min range sqlite ', sqlite_range),
+                          ('1-min range archive', archive_range)):
+            print(f"{label}: {best_of(fn):9.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Model backend benchmark: cold start, RSS, per-window latency and agreement with Keras.
+
+Each backend runs in a fresh interpreter so startup and memory are measured
+from a cold import, the way app.py pays for them.
+
+Usage: python benchmarks/bench_backends.py [--backends keras tflite numpy] [--windows 1000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTED = time.perf_counter()
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+SEQUENCE_LENGTH = 5
+NUM_FEATURES = 6
+
+
+def run_child(backend, windows, output):
+    from model_backend import MODEL_PATH, load_backend
+
+    model = load_backend(backend, os.path.join(ROOT, MODEL_PATH))
+    batch = np.random.default_rng(0).normal(size=(windows, SEQUENCE_LENGTH, NUM_FEATURES)).astype(np.float32)
+    model.predict(batch[:1])
+    startup = time.perf_counter() - STARTED
+
+    latencies = []
+    for window in batch:
+        t0 = time.perf_counter()
+        model.predict(window[np.newaxis])
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for start in range(0, windows, 64):
+        model.predict(batch[start:start + 64])
+    batched = windows / (time.perf_counter() - t0)
+
+    np.save(output, model.predict(batch))
+    lat = np.asarray(latencies) * 1000
+    print(json.dumps({
+        'startup_s': startup,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+        'batch64_windows_s': batched
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['keras', 'tflite', 'numpy'])
+    parser.add_argument('--windows', type=int, default=1000)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.windows, args.output)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        outputs = {}
+        for backend in args.backends:
+            outputs[backend] = os.path.join(directory, f'{backend}.npy')
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', backend,
+                 '--windows', str(args.windows), '--output', outputs[backend]],
+                capture_output=True, text=True, check=True)
+            r = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{backend:7}: startup {r['startup_s']:6.2f}s  rss {r['rss_mb']:7.1f} MB  "
+                  f"window p50={r['p50_ms']:.3f}ms p99={r['p99_ms']:.3f}ms  "
+                  f"batch64 {r['batch64_windows_s']:10.0f} windows/s")
+
+        if 'keras' in outputs:
+            reference = np.load(outputs['keras'])
+            for backend, path in outputs.items():
+                if backend != 'keras':
+                    predictions = np.load(path)
+                    agree = np.mean(predictions.argmax(axis=1) == reference.argmax(axis=1))
+                    print(f"{backend:7}: max |p - keras| = {np.abs(predictions - reference).max():.2e}, "
+                          f"class agreement {agree:.2%}")
+
+
+if __name__ == '__main__':
+    main()
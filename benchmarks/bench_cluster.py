@@ -0,0 +1,101 @@
+"""Cluster scaling benchmark: end-to-end sensor_batch throughput vs. number of ingest workers.
+
+For each worker count, starts `cluster.py` against a throwaway database, runs
+several headless_sim.py client processes (batch transport, as fast as
+possible, cars routed to their shard's worker) and reports samples/s from the
+first frame sent until every sample has been answered, plus the rows the
+single coordinator writer stored. Only meaningful with at least as many CPU
+cores as workers + clients.
+
+Usage: python benchmarks/bench_cluster.py [--workers 1 2 4] [--clients 4] [--cars 500] [--duration 30]
+"""
+import argparse
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SENT = re.compile(r'Sent (\d+) samples .*; (\d+) updates received')
+
+
+def start_cluster(workers, base_port, coordinator, database):
+    cluster = subprocess.Popen(
+        [sys.executable, 'cluster.py', '--workers', str(workers), '--base-port', str(base_port),
+         '--coordinator', coordinator, '--database', database],
+        env=dict(os.environ, RAW_ARCHIVE_ROOT=os.path.join(os.path.dirname(database), 'raw')),
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 180
+    pending = [base_port + i for i in range(workers)]
+    while pending and time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://localhost:{pending[0]}/ingest_stats', timeout=1)
+            pending.pop(0)
+        except OSError:
+            time.sleep(0.5)
+    if pending:
+        cluster.kill()
+        raise RuntimeError(f"worker on port {pending[0]} did not come up")
+    return cluster
+
+
+def stop_cluster(cluster):
+    cluster.send_signal(signal.SIGINT)
+    try:
+        cluster.wait(60)
+    except subprocess.TimeoutExpired:
+        cluster.kill()
+
+
+def run_clients(urls, clients, cars, duration, drain):
+    """Runs the load generators in parallel; returns (samples sent, samples answered, seconds)."""
+    started = time.perf_counter()
+    procs = [subprocess.Popen(
+        [sys.executable, 'headless_sim.py', '--url', ','.join(urls), '--transport', 'batch', '--speedup', '0',
+         '--cars', str(cars), '--duration', str(duration), '--drain', str(drain), '--seed', str(seed)],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) for seed in range(clients)]
+    sent = answered = 0
+    for proc in procs:
+        output, _ = proc.communicate()
+        match = SENT.search(output)
+        if match:
+            sent += int(match.group(1))
+            answered += int(match.group(2))
+    return sent, answered, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=4, help="headless_sim processes")
+    parser.add_argument('--cars', type=int, default=500, help="cars per client")
+    parser.add_argument('--duration', type=float, default=30, help="simulated seconds per client")
+    parser.add_argument('--drain', type=float, default=60)
+    parser.add_argument('--base-port', type=int, default=5100)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores; {args.clients} clients x {args.cars} cars x {args.duration:g}s")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = os.path.join(tmp, 'bench.db')
+            coordinator = f'127.0.0.1:{args.base_port + 90}'
+            cluster = start_cluster(workers, args.base_port, coordinator, database)
+            try:
+                urls = [f'http://localhost:{args.base_port + i}' for i in range(workers)]
+                sent, answered, elapsed = run_clients(urls, args.clients, args.cars, args.duration, args.drain)
+            finally:
+                stop_cluster(cluster)
+            conn = sqlite3.connect(database)
+            stored = conn.execute('SELECT COUNT(*) FROM driving_log').fetchone()[0]
+            conn.close()
+        print(f"{workers} worker(s): {answered}/{sent} answered in {elapsed:6.1f}s "
+              f"= {answered / elapsed:8.0f} samples/s, {stored} rows stored")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Ingest benchmark: per-row connect/insert/commit vs. the batched DrivingLogWriter.
+
+Usage: python benchmarks/bench_db_writer.py [--rows 5000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db_writer import INSERT_DRIVING_LOG, DrivingLogWriter
+from metrics import LatencyRecorder
+import schema
+
+def make_db(directory, name):
+    path = os.path.join(directory, name)
+    schema.init_db(path)
+    return path
+
+
+def make_row(i):
+    return (1, 'bench', 1_700_000_000_000 + i * 100, 0.1, -0.2, 1.0, 0.01, 0.02, -0.03, 42.0, 2, 'Normal', 0)
+
+
+def bench_per_row(path, rows):
+    latency = LatencyRecorder(rows)
+    start = time.perf_counter()
+    for i in range(rows):
+        t0 = time.perf_counter()
+        conn = sqlite3.connect(path)
+        conn.execute(INSERT_DRIVING_LOG, make_row(i))
+        conn.commit()
+        conn.close()
+        latency.observe(time.perf_counter() - t0)
+    return rows / (time.perf_counter() - start), latency.summary()
+
+
+def bench_writer(path, rows):
+    writer = DrivingLogWriter(path)
+    writer.start()
+    latency = LatencyRecorder(rows)
+    start = time.perf_counter()
+    for i in range(rows):
+        t0 = time.perf_counter()
+        writer.submit(make_row(i))
+        latency.observe(time.perf_counter() - t0)
+    writer.close()
+    return rows / (time.perf_counter() - start), latency.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, bench, name in (('per-row', bench_per_row, 'per_row.db'),
+                                   ('batched', bench_writer, 'batched.db')):
+            rate, latency = bench(make_db(directory, name), args.rows)
+            print(f"{label:8}: {rate:10.1f} rows/s  handler p50={latency['p50_ms']:.3f}ms "
+                  f"p99={latency['p99_ms']:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Streaming feature benchmark: per-sample update cost vs. vehicles per call, and offline extraction.
+
+Usage: python benchmarks/bench_features.py [--vehicles 1 10 100 1000] [--windows 10,50]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from features import RAW_FEATURES, FeatureExtractor, extract, parse_windows
+
+
+def per_sample_cost(vehicles, windows, ticks=200):
+    extractor = FeatureExtractor(windows)
+    slots = np.array([extractor.slot(i) for i in range(vehicles)])
+    samples = np.random.default_rng(0).normal(size=(ticks, vehicles, len(RAW_FEATURES)))
+    started = time.perf_counter()
+    for tick in samples:
+        extractor.update(slots, tick)
+    return (time.perf_counter() - started) / (ticks * vehicles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehicles', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--windows', type=parse_windows, default=parse_windows('10,50'))
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'data', 'train_motion_data.csv'))
+    args = parser.parse_args()
+
+    for vehicles in args.vehicles:
+        print(f"{vehicles:5} vehicles per update: {per_sample_cost(vehicles, args.windows) * 1e6:7.1f} us/sample")
+
+    samples = pd.read_csv(args.csv)[list(RAW_FEATURES)].to_numpy()
+    started = time.perf_counter()
+    matrix = extract(samples, args.windows)
+    print(f"extract({os.path.basename(args.csv)}): {matrix.shape[0]} x {matrix.shape[1]} features "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
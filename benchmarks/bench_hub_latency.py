@@ -0,0 +1,139 @@
+"""Hub responsiveness benchmark: connect/report latency while sensor_batch traffic keeps the model busy.
+
+Starts app.py once per INFERENCE_MODE against a throwaway database, then
+measures how long a fresh Socket.IO connect and a driving-report round trip
+take, first idle and then while loader clients stream large sensor batches.
+
+Usage: python benchmarks/bench_hub_latency.py [--modes inline thread process] [--loaders 4] [--vehicles 500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import socketio
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from metrics import LatencyRecorder
+import wire
+
+
+def start_server(mode, port, database):
+    env = dict(os.environ, INFERENCE_MODE=mode, PORT=str(port), DATABASE=database,
+               RAW_ARCHIVE_ROOT=os.path.splitext(database)[0] + '_raw')
+    server = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}/ingest_stats', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f"app.py did not come up on port {port}")
+
+
+class Loader(threading.Thread):
+    """Streams one sensor_batch frame at a time, sending the next as soon as the previous is answered."""
+
+    def __init__(self, url, index, vehicles):
+        super().__init__(daemon=True)
+        self.running = True
+        self.frames = 0
+        self.vehicle_ids = [f'load-{index}-{i}' for i in range(vehicles)]
+        self.answered = threading.Event()
+        self.client = socketio.Client()
+        self.client.on('batch_result', lambda data: self.answered.set())
+        self.client.connect(url, transports=['websocket'])
+
+    def run(self):
+        rng = np.random.default_rng(len(self.vehicle_ids))
+        n = len(self.vehicle_ids)
+        timestamp = 1_700_000_000_000
+        while self.running:
+            timestamp += 100
+            frame = wire.encode_samples(self.vehicle_ids, np.arange(n), np.full(n, timestamp),
+                                        rng.normal(size=(n, wire.NUM_VALUES)))
+            self.answered.clear()
+            self.client.emit('sensor_batch', {'frame': frame})
+            if self.answered.wait(10):
+                self.frames += 1
+
+    def stop(self):
+        self.running = False
+        self.join(15)
+        self.client.disconnect()
+
+
+def probe(url, samples, interval):
+    """Measures a fresh connect and a report round trip `samples` times."""
+    connect, report = LatencyRecorder(samples), LatencyRecorder(samples)
+    for _ in range(samples):
+        client = socketio.Client()
+        connected = threading.Event()
+        reported = threading.Event()
+        client.on('connection_status', lambda data: connected.set())
+        client.on('driving_report', lambda data: reported.set())
+
+        started = time.perf_counter()
+        client.connect(url, transports=['websocket'])
+        connected.wait(30)
+        connect.observe(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        client.emit('generate_driving_report', {'driver_name': 'bench'})
+        reported.wait(30)
+        report.observe(time.perf_counter() - started)
+        client.disconnect()
+        time.sleep(interval)
+    return connect.summary(), report.summary()
+
+
+def print_row(mode, label, connect, report):
+    print(f"{mode:8} {label:6}: connect p50={connect['p50_ms']:7.1f}ms p95={connect['p95_ms']:7.1f}ms "
+          f"max={connect['max_ms']:7.1f}ms | report p50={report['p50_ms']:7.1f}ms "
+          f"p95={report['p95_ms']:7.1f}ms max={report['max_ms']:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['inline', 'thread', 'process'])
+    parser.add_argument('--loaders', type=int, default=4)
+    parser.add_argument('--vehicles', type=int, default=500, help="samples per sensor_batch frame")
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--interval', type=float, default=0.1)
+    parser.add_argument('--port', type=int, default=5057)
+    args = parser.parse_args()
+    url = f'http://localhost:{args.port}'
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in args.modes:
+            server = start_server(mode, args.port, os.path.join(directory, f'{mode}.db'))
+            try:
+                print_row(mode, 'idle', *probe(url, args.samples, args.interval))
+                loaders = [Loader(url, i, args.vehicles) for i in range(args.loaders)]
+                for loader in loaders:
+                    loader.start()
+                time.sleep(2)
+                started = time.perf_counter()
+                print_row(mode, 'loaded', *probe(url, args.samples, args.interval))
+                elapsed = time.perf_counter() - started
+                frames = sum(loader.frames for loader in loaders)
+                for loader in loaders:
+                    loader.stop()
+                print(f"{'':15} load: {frames * args.vehicles / elapsed:.0f} samples/s scored")
+            finally:
+                server.terminate()
+                server.wait(30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Throughput/latency benchmark: one predict() per event vs. the micro-batched engine.
+
+Usage: python benchmarks/bench_inference.py [--events 2000] [--clients 50] [--batch 64] [--wait-ms 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '0')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from inference import BatchInferenceEngine
+
+SEQUENCE_LENGTH = 5
+NUM_FEATURES = 6
+
+
+def percentiles(latencies):
+    lat = np.asarray(latencies) * 1000
+    return {p: float(np.percentile(lat, p)) for p in (50, 95, 99)}
+
+
+def bench_per_event(model, windows):
+    latencies = []
+    start = time.perf_counter()
+    for window in windows:
+        t0 = time.perf_counter()
+        model.predict(window[np.newaxis], verbose=0)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return len(windows) / elapsed, percentiles(latencies)
+
+
+def bench_batched(model, windows, clients, max_batch_size, max_wait):
+    engine = BatchInferenceEngine(lambda batch: model.predict(batch, verbose=0),
+                                  max_batch_size=max_batch_size, max_wait=max_wait)
+    latencies = []
+
+    def make_callback(t0):
+        return lambda predicted_class, risk_level: latencies.append(time.perf_counter() - t0)
+
+    # Every client delivers one sample per "tick"; the engine scores once per tick.
+    start = time.perf_counter()
+    for i in range(0, len(windows), clients):
+        for window in windows[i:i + clients]:
+            engine.submit(window, make_callback(time.perf_counter()))
+        while engine.pending():
+            engine.run_once()
+    elapsed = time.perf_counter() - start
+    return len(windows) / elapsed, percentiles(latencies), engine.stats()['avg_batch_size']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/lstm_model.h5')
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+    model = load_model(args.model)
+
+    rng = np.random.default_rng(0)
+    windows = rng.normal(size=(args.events, SEQUENCE_LENGTH, NUM_FEATURES)).astype(np.float32)
+    model.predict(windows[:1], verbose=0)  # warm-up
+
+    rate, pct = bench_per_event(model, windows)
+    print(f"per-event : {rate:10.1f} windows/s  p50={pct[50]:.2f}ms p95={pct[95]:.2f}ms p99={pct[99]:.2f}ms")
+    rate, pct, avg_batch = bench_batched(model, windows, args.clients, args.batch, args.wait_ms / 1000)
+    print(f"batched   : {rate:10.1f} windows/s  p50={pct[50]:.2f}ms p95={pct[95]:.2f}ms p99={pct[99]:.2f}ms"
+          f"  (avg batch {avg_batch:.1f}, {args.clients} clients)")
+
+
+if __name__ == '__main__':
+    main()
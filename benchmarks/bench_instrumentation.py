@@ -0,0 +1,86 @@
+"""Instrumentation overhead benchmark: end-to-end throughput with METRICS_ENABLED=0 vs 1.
+
+Starts app.py once per setting against a throwaway database and streams the
+same headless fleet over sensor_data (the per-event path, where the relative
+cost of timing is highest), timing until every sample has been answered.
+Rounds alternate between the two servers to spread out machine noise. As
+end-to-end rates are noisy, the per-sample cost of the timing calls alone is
+also measured in-process and compared to the per-sample time at that rate.
+
+Usage: python benchmarks/bench_instrumentation.py [--cars 50] [--duration 20] [--rounds 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_hub_latency import start_server
+from headless_sim import Fleet, SharedTransport, parse_mix, run, wait_for_results
+from metrics import Histogram, StageClock
+
+STAGES = ('receive', 'validate', 'buffer', 'inference', 'db_write', 'emit')
+
+
+def clock_cost(samples=100000):
+    """Seconds per sample spent on a StageClock with every stage lapped and echoed."""
+    histograms = {stage: Histogram() for stage in STAGES}
+    started = time.perf_counter()
+    for _ in range(samples):
+        clock = StageClock(histograms)
+        clock.record('receive', 0.002)
+        for stage in STAGES[1:]:
+            clock.lap(stage)
+        clock.echo()
+    return (time.perf_counter() - started) / samples
+
+
+def throughput(url, cars, duration, seed):
+    fleet = Fleet(cars, parse_mix('aggressive=1,normal=2,slow=1'), seed)
+    transport = SharedTransport(url, fleet.vehicle_ids)
+    try:
+        started = time.perf_counter()
+        sent, _ = run(fleet, transport, duration, speedup=0)
+        wait_for_results(transport, sent, 120)
+        return transport.updates_received / (time.perf_counter() - started)
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20, help="simulated seconds per round")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--port', type=int, default=5200)
+    args = parser.parse_args()
+
+    rates = {'0': [], '1': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        servers = {}
+        try:
+            for i, setting in enumerate(rates):
+                os.environ['METRICS_ENABLED'] = setting
+                servers[setting] = start_server('thread', args.port + i, os.path.join(tmp, f'{setting}.db'))
+            for round_index in range(args.rounds):
+                for i, setting in enumerate(rates):
+                    rate = throughput(f'http://localhost:{args.port + i}', args.cars, args.duration, round_index)
+                    rates[setting].append(rate)
+                    print(f"round {round_index + 1}, METRICS_ENABLED={setting}: {rate:8.0f} samples/s")
+        finally:
+            for server in servers.values():
+                server.terminate()
+                server.wait(10)
+
+    off, on = (sum(rates[s]) / len(rates[s]) for s in ('0', '1'))
+    print(f"mean: off {off:.0f} samples/s, on {on:.0f} samples/s -> overhead {1 - on / off:+.1%}")
+    cost = clock_cost()
+    print(f"stage timing: {cost * 1e6:.1f} us/sample = {cost * off:.2%} of the per-sample time at {off:.0f} samples/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Prediction cache / change gate benchmark: forward passes saved vs. classes changed.
+
+Generates parked (no input) and cruising (scripted 'normal' drivers) traffic
+with the headless simulator physics, then scores every window tick by tick,
+once uncached and once per cache resolution / gate threshold.
+
+Usage: python benchmarks/bench_prediction_cache.py [--cars 200] [--seconds 60] [--backend numpy]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from headless_sim import Fleet
+from inference import predicted_classes
+from model_backend import MODEL_PATH, load_backend
+from prediction_cache import ChangeGate, PredictionCache
+from window_store import RingWindow
+
+SEQUENCE_LENGTH = 5
+NUM_FEATURES = 6
+FRAMES_PER_SAMPLE = 2
+
+
+def record(cars, seconds, scenario, seed=0):
+    """Returns (ticks, cars, 6) sensor readings sampled every 100 ms."""
+    fleet = Fleet(cars, {'normal': 1}, seed=seed)
+    idle = np.zeros(cars, dtype=bool)
+    samples = []
+    for frame in range(int(seconds * 1000 / 50)):
+        if scenario == 'parked':
+            fleet.physics.step(idle, idle, idle, idle, frame * 0.05)
+        else:
+            fleet.advance()
+        if frame % FRAMES_PER_SAMPLE == FRAMES_PER_SAMPLE - 1:
+            samples.append(fleet.physics.sensors.astype(np.float32))
+    return np.stack(samples)
+
+
+def per_tick_windows(samples):
+    """Yields (tick, (cars, L, 6) windows) for every tick that has a full window behind it."""
+    for tick in range(samples.shape[0] - SEQUENCE_LENGTH + 1):
+        yield tick, np.ascontiguousarray(samples[tick:tick + SEQUENCE_LENGTH].transpose(1, 0, 2))
+
+
+def run(model, samples, resolution=None, threshold=0.0):
+    calls = [0]
+
+    def predict(batch):
+        calls[0] += len(batch)
+        return model.predict(batch)
+
+    predict_fn = PredictionCache(predict, resolution=resolution).predict if resolution else predict
+    gate = ChangeGate(threshold)
+    rings = [RingWindow(SEQUENCE_LENGTH, NUM_FEATURES) for _ in range(samples.shape[1])]
+    classes = []
+    for _, windows in per_tick_windows(samples):
+        tick_classes = np.zeros(len(windows), dtype=np.int64)
+        reuse = np.array([gate.matches(ring, window[np.newaxis])[0] for ring, window in zip(rings, windows)])
+        for i in np.flatnonzero(reuse):
+            tick_classes[i] = rings[i].last_class
+        scored = np.flatnonzero(~reuse)
+        if len(scored):
+            tick_classes[scored] = predicted_classes(predict_fn(windows[scored]))
+            for i in scored:
+                gate.record(rings[i], windows[i], int(tick_classes[i]))
+        classes.append(tick_classes)
+    return calls[0], np.concatenate(classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--backend', default='numpy')
+    parser.add_argument('--resolutions', type=float, nargs='+', default=[0.01, 0.05, 0.1])
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.05, 0.1, 0.2])
+    args = parser.parse_args()
+
+    model = load_backend(args.backend, MODEL_PATH)
+    for scenario in ('parked', 'cruising'):
+        samples = record(args.cars, args.seconds, scenario)
+        baseline_calls, baseline = run(model, samples)
+        print(f"{scenario}: {baseline_calls} windows, uncached")
+        configs = [(f"cache res={r}", r, 0.0) for r in args.resolutions]
+        configs += [(f"gate thr={t}", None, t) for t in args.thresholds]
+        configs += [(f"cache {args.resolutions[0]} + gate {args.thresholds[0]}",
+                     args.resolutions[0], args.thresholds[0])]
+        for label, resolution, threshold in configs:
+            calls, classes = run(model, samples, resolution, threshold)
+            print(f"  {label:24}: {calls:7} passes ({1 - calls / baseline_calls:6.1%} saved), "
+                  f"class agreement {np.mean(classes == baseline):.2%}")
+
+
+if __name__ == '__main__':
+    main()
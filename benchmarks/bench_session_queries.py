@@ -0,0 +1,110 @@
+"""Report/history query benchmark on a synthetic multi-million-row driving_log.
+
+Compares the old `WHERE timestamp >= ?` full scan on an unindexed table with the
+session-partitioned `WHERE session_id = ?` range scan added by schema v1, and
+times the history API's bucketed telemetry query at several resolutions.
+
+Usage: python benchmarks/bench_session_queries.py [--rows 2000000] [--sessions 400]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import history
+import schema
+
+LEGACY_REPORT = 'SELECT timestamp, speed, risk_level FROM driving_log WHERE timestamp >= ? ORDER BY timestamp ASC'
+SESSION_REPORT = 'SELECT timestamp, speed, risk_level FROM driving_log WHERE session_id = ? ORDER BY timestamp ASC'
+SESSION_HISTORY = 'SELECT * FROM driving_log WHERE session_id = ? ORDER BY timestamp DESC LIMIT 20'
+
+
+def populate(conn, rows, sessions, chunk=200_000):
+    """Sessions are laid out back to back in time, 10 Hz within each session."""
+    rng = np.random.default_rng(0)
+    per_session = rows // sessions
+    base = 1_700_000_000_000
+    with conn:
+        for s in range(sessions):
+            conn.execute('INSERT INTO sessions (vehicle_id, started_at) VALUES (?, ?)',
+                         (f'veh-{s % 50}', base + s * per_session * 100))
+    for start in range(0, rows, chunk):
+        idx = np.arange(start, min(start + chunk, rows))
+        values = rng.normal(size=(len(idx), 7)).round(4)
+        labels = rng.integers(1, 4, len(idx))
+        session = idx // per_session + 1
+        batch = [
+            (int(session[i]), f'veh-{(session[i] - 1) % 50}', base + int(idx[i]) * 100, *values[i].tolist(),
+             int(labels[i]), ('Aggressive', 'Normal', 'Slow')[labels[i] - 1])
+            for i in range(len(idx))
+        ]
+        with conn:
+            conn.executemany('''INSERT INTO driving_log
+                (session_id, vehicle_id, timestamp, acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z,
+                 speed, predicted_class, risk_level) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+    return per_session, base
+
+
+def timed(conn, query, params, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = conn.execute(query, params).fetchall()
+        best = min(best, time.perf_counter() - start)
+    plan = ' | '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params))
+    return best * 1000, len(result), plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--sessions', type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        conn = sqlite3.connect(path)
+        # Build the v1 tables without their indexes first to measure the legacy query
+        schema.apply_migrations(conn)
+        for index in ('idx_driving_log_session_ts', 'idx_driving_log_vehicle_ts'):
+            conn.execute(f'DROP INDEX {index}')
+        start = time.perf_counter()
+        per_session, base = populate(conn, args.rows, args.sessions)
+        print(f"populated {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        last = args.sessions
+        last_start = base + (last - 1) * per_session * 100
+        ms, n, plan = timed(conn, LEGACY_REPORT, (last_start,))
+        print(f"legacy report (no index)  : {ms:8.2f}ms  {n} rows  [{plan}]")
+
+        start = time.perf_counter()
+        conn.execute('CREATE INDEX idx_driving_log_session_ts ON driving_log (session_id, timestamp)')
+        conn.execute('CREATE INDEX idx_driving_log_vehicle_ts ON driving_log (vehicle_id, timestamp)')
+        print(f"built indexes in {time.perf_counter() - start:.1f}s")
+
+        for label, query in (('session report', SESSION_REPORT), ('session history', SESSION_HISTORY)):
+            for session in (1, last // 2, last):
+                ms, n, plan = timed(conn, query, (session,))
+                print(f"{label:15} #{session:<6}: {ms:8.2f}ms  {n} rows  [{plan}]")
+
+        session_start = base + (last - 1) * per_session * 100
+        for resolution in (1000, 10_000, 60_000):
+            best = float('inf')
+            for _ in range(3):
+                start = time.perf_counter()
+                result = history.session_telemetry(conn, last, session_start, session_start + per_session * 100,
+                                                   resolution)
+                best = min(best, time.perf_counter() - start)
+            print(f"telemetry {resolution // 1000:>4}s : {best * 1000:8.2f}ms  {result['points']} points "
+                  f"from {per_session} rows")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
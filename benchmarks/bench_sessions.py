@@ -0,0 +1,69 @@
+"""Session registry benchmark: memory per live driver session and per-sample lookup cost.
+
+Opens N sessions in a SessionRegistry (no database; session ids are synthetic),
+feeds each a full window of samples, and reports tracemalloc-measured bytes
+per session plus the cost of the SID/vehicle lookups done on every sample.
+
+Usage: python benchmarks/bench_sessions.py [--sessions 100 1000 10000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from inference import RISK_LEVELS
+from sessions import SessionRegistry
+
+SEQUENCE_LENGTH = 5
+NUM_FEATURES = 6
+
+
+def fill(registry, count, clients):
+    rng = np.random.default_rng(0)
+    samples = rng.normal(size=(SEQUENCE_LENGTH, NUM_FEATURES)).astype(np.float32)
+    for i in range(count):
+        session = registry.add(f'sid-{i % clients}', f'vehicle-{i:06d}', i + 1)
+        for t, sample in enumerate(samples):
+            session.window.append(sample)
+            session.stats.update(1_700_000_000_000 + t * 100, 40.0 + t, RISK_LEVELS[1 + t % 3])
+
+
+def measure(count, clients):
+    fill(SessionRegistry(SEQUENCE_LENGTH, NUM_FEATURES), 10, clients)  # warm up one-time allocations
+    tracemalloc.start()
+    registry = SessionRegistry(SEQUENCE_LENGTH, NUM_FEATURES)
+    before = tracemalloc.take_snapshot()
+    fill(registry, count, clients)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    vehicle_ids = [f'vehicle-{i:06d}' for i in range(count)]
+    lookups = 200_000
+    order = np.random.default_rng(1).integers(0, count, lookups)
+    started = time.perf_counter()
+    for i in order.tolist():
+        registry.touch(f'sid-{i % clients}', vehicle_ids[i])
+    per_lookup = (time.perf_counter() - started) / lookups
+    return allocated / count, per_lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--clients', type=int, default=10, help="SIDs the sessions are spread over")
+    args = parser.parse_args()
+
+    for count in args.sessions:
+        per_session, per_lookup = measure(count, args.clients)
+        print(f"{count:6} sessions: {per_session:7.0f} bytes/session "
+              f"({per_session * count / 2**20:6.1f} MiB total), touch() {per_lookup * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+"""Hot-path benchmark suite: ingest -> classify -> store, reports and the DB writer, with JSON results.
+
+Each (scenario, client count) runs in a fresh child interpreter that imports
+app.py against a throwaway database and drives it in-process through the
+Flask-SocketIO test client, so peak RSS is per run and no sockets are involved.
+
+  ingest   every client replays sensor_data (test_motion_data.csv rows, or
+           synthetic with --source synthetic) stamped 100 ms apart, one event
+           at a time, and waits for its 'update'; latency is emit -> update
+  report   generate_driving_report round trips after a short ingest
+  db       DrivingLogWriter alone: submit + flush of synthetic rows
+  highrate sensor_batch frames holding 50 ms of --sample-rate samples for each of
+           `clients` vehicles on one connection, sent back to back; events are
+           samples (--events per vehicle), latency is emit -> batch_result and
+           realtime_x is how many times faster than real time they were served
+
+Results (events/s, latency p50/p95/p99/max, peak RSS, driving_log rows/s) are
+written as JSON together with the commit and machine they were measured on;
+`compare` flags metrics that got worse by more than --threshold. An event whose
+reply never arrived is counted in `timeouts`; a run with timeouts is reported
+as INVALID, makes `run` exit 1 and fails `compare`, since its throughput
+includes the time spent waiting.
+
+The server runs with REORDER_LATENESS_MS=0 unless --env sets it: an ingest
+client waits for each reply before sending its next sample, so a sample held
+back for reordering would only come out after the lateness expired.
+
+Usage:
+    python benchmarks/bench_suite.py run [--clients 1 4 16] [--events 2000] [-o results.json]
+    python benchmarks/bench_suite.py run --scenarios highrate --clients 100 500 --sample-rate 200
+    python benchmarks/bench_suite.py compare baseline.json results.json [--threshold 0.10]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('ingest', 'report', 'db', 'highrate')
+FRAME_MS = 50
+# metric -> True if larger is better
+COMPARED = {'events_per_s': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False,
+            'peak_rss_mb': False, 'db_rows_per_s': True, 'realtime_x': True}
+
+
+# --- Child side ---
+def load_samples(source, count, seed=0):
+    import numpy as np
+    import pandas as pd
+
+    columns = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ']
+    if source == 'synthetic':
+        values = np.random.default_rng(seed).normal(scale=0.5, size=(count, 6))
+    else:
+        values = pd.read_csv(source)[columns].to_numpy()
+        values = values[np.arange(count) % len(values)]
+    return [dict(zip(columns, row)) for row in values.tolist()]
+
+
+def latency_summary(latencies):
+    import numpy as np
+
+    if not latencies:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    samples = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': float(samples.max())}
+
+
+def drive(server, clients, samples, reply, poll=0.0005, timeout=10.0):
+    """Sends samples round-robin, one in flight per client.
+
+    Returns the per-event latencies (emit -> `reply`) and the number of events
+    that got no reply within `timeout` seconds.
+    """
+    latencies = []
+    timeouts = 0
+    per_client = len(samples) // len(clients)
+    start_ms = int(time.time() * 1000)
+    for tick in range(per_client):
+        sent = {}
+        for i, client in enumerate(clients):
+            # Each vehicle replays a 10 Hz stream (the model rate) at full speed. Wall-clock stamps would
+            # repeat whenever two events share a millisecond and look like a >1 kHz stream to the decimator.
+            payload = dict(samples[tick * len(clients) + i], Timestamp=start_ms + tick * 100,
+                           speed=40.0, vehicle_id=f'bench-{i}')
+            sent[i] = time.perf_counter()
+            client.emit('sensor_data', payload)
+        deadline = time.perf_counter() + timeout
+        while sent and time.perf_counter() < deadline:
+            for i in list(sent):
+                if any(message['name'] == reply for message in clients[i].get_received()):
+                    latencies.append(time.perf_counter() - sent.pop(i))
+            if sent:
+                server.socketio.sleep(poll)
+        timeouts += len(sent)
+    return latencies, timeouts
+
+
+def run_app_scenario(scenario, num_clients, events, source):
+    import app as server
+
+    server.init_db()
+    # Handlers run inline in emit(); inference still completes on the engine's background task
+    server.socketio.server.async_handlers = False
+    clients = [server.socketio.test_client(server.app) for _ in range(num_clients)]
+    samples = load_samples(source, events if scenario == 'ingest' else 20 * num_clients)
+
+    started = time.perf_counter()
+    latencies, timeouts = drive(server, clients, samples, 'update')
+    elapsed = time.perf_counter() - started
+    server.log_writer.flush()
+    rows = server.log_writer.stats()['rows_written']
+    result = {'events': len(latencies), 'events_per_s': len(latencies) / elapsed,
+              'db_rows_per_s': rows / elapsed, 'timeouts': timeouts}
+
+    if scenario == 'report':
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(max(1, events // (10 * num_clients))):
+            for i, client in enumerate(clients):
+                sent = time.perf_counter()
+                client.emit('generate_driving_report', {'vehicle_id': f'bench-{i}'})
+                if any(message['name'] == 'driving_report' for message in client.get_received()):
+                    latencies.append(time.perf_counter() - sent)
+                else:
+                    timeouts += 1
+        result.update(events=len(latencies), events_per_s=len(latencies) / (time.perf_counter() - started),
+                      timeouts=timeouts)
+
+    for client in clients:
+        client.disconnect()
+    server.inference_engine.stop()
+    server.log_writer.close()
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run_highrate_scenario(num_vehicles, events, source, sample_rate):
+    import numpy as np
+    import app as server
+    import wire
+
+    server.init_db()
+    server.socketio.server.async_handlers = False
+    client = server.socketio.test_client(server.app)
+    per_frame = max(1, round(sample_rate * FRAME_MS / 1000))
+    frames = max(1, events // per_frame)
+    columns = wire.VALUE_FIELDS[:6]
+    values = np.zeros((per_frame * num_vehicles * min(frames, 20), wire.NUM_VALUES), dtype=np.float32)
+    values[:, :6] = [[sample[c] for c in columns] for sample in load_samples(source, len(values))]
+    values[:, 6] = 40.0
+    vehicle_ids = [f'bench-{i}' for i in range(num_vehicles)]
+    vehicle_index = np.repeat(np.arange(num_vehicles), per_frame)
+    start_ms = int(time.time() * 1000)
+
+    latencies = []
+    timeouts = 0
+    started = time.perf_counter()
+    for frame in range(frames):
+        timestamps = start_ms + np.rint((frame * per_frame + np.arange(per_frame)) * 1000 / sample_rate)
+        rows = (frame % 20) * len(vehicle_index) + np.arange(len(vehicle_index))
+        payload = {'frame': wire.encode_samples(vehicle_ids, vehicle_index, np.tile(timestamps, num_vehicles),
+                                                values[rows])}
+        sent = time.perf_counter()
+        client.emit('sensor_batch', payload)
+        if any(message['name'] == 'batch_result' for message in client.get_received()):
+            latencies.append(time.perf_counter() - sent)
+        else:
+            timeouts += 1
+    server.log_writer.flush(60)
+    elapsed = time.perf_counter() - started
+    samples = frames * per_frame * num_vehicles
+    result = {'events': samples, 'events_per_s': samples / elapsed,
+              'db_rows_per_s': server.log_writer.stats()['rows_written'] / elapsed,
+              'realtime_x': samples / elapsed / (num_vehicles * sample_rate),
+              'decimation': server.decimator.stats(), 'timeouts': timeouts}
+    client.disconnect()
+    server.inference_engine.stop()
+    server.log_writer.close()
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run_db_scenario(events, database):
+    from db_writer import DrivingLogWriter
+    import schema
+
+    schema.init_db(database)
+    writer = DrivingLogWriter(database)
+    writer.start()
+    latencies = []
+    started = time.perf_counter()
+    for i in range(events):
+        submitted = time.perf_counter()
+        writer.submit((1, 'bench', 1_700_000_000_000 + i * 100, 0.1, -0.2, 1.0, 0.01, 0.02, -0.03,
+                       42.0, 2, 'Normal'))
+        latencies.append(time.perf_counter() - submitted)
+    writer.flush(60)
+    elapsed = time.perf_counter() - started
+    writer.close()
+    result = {'events': events, 'events_per_s': events / elapsed,
+              'db_rows_per_s': writer.rows_written / elapsed, 'timeouts': 0}
+    result.update(latency_summary(latencies))
+    return result
+
+
+def child(args):
+    if args.scenario == 'db':
+        result = run_db_scenario(args.events, os.environ['DATABASE'])
+    elif args.scenario == 'highrate':
+        result = run_highrate_scenario(args.clients, args.events, args.source, args.sample_rate)
+    else:
+        result = run_app_scenario(args.scenario, args.clients, args.events, args.source)
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print('RESULT ' + json.dumps(result))
+
+
+# --- Parent side ---
+def run_child(scenario, clients, events, source, sample_rate, extra_env):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE=os.path.join(tmp, 'bench.db'), RAW_ARCHIVE_ROOT=os.path.join(tmp, 'raw'))
+        env.setdefault('REORDER_LATENESS_MS', '0')
+        env.update(extra_env)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'child', scenario, '--clients', str(clients),
+             '--events', str(events), '--source', source, '--sample-rate', str(sample_rate)],
+            cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith('RESULT '):
+            return json.loads(line[len('RESULT '):])
+    raise RuntimeError(f"{scenario} x{clients} failed:\n{proc.stderr[-2000:]}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    extra_env = dict(item.split('=', 1) for item in args.env)
+    results = []
+    invalid = 0
+    for scenario in args.scenarios:
+        for clients in ([1] if scenario == 'db' else args.clients):
+            result = dict(scenario=scenario, clients=clients,
+                          **run_child(scenario, clients, args.events, args.source, args.sample_rate, extra_env))
+            results.append(result)
+            print(f"{scenario:7} x{clients:<3}: {result['events_per_s']:9.0f} events/s  "
+                  f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+                  f"rss {result['peak_rss_mb']:6.0f} MB  db {result['db_rows_per_s']:8.0f} rows/s"
+                  + (f"  {result['realtime_x']:.1f}x real time" if 'realtime_x' in result else '')
+                  + (f"  INVALID: {result['timeouts']} timed out" if result['timeouts'] else ''))
+            invalid += bool(result['timeouts'])
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'config': {'events': args.events, 'source': args.source, 'sample_rate': args.sample_rate,
+                   'env': extra_env},
+        'results': results
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"INFO: Results written to {output}.")
+    if invalid:
+        print(f"ERROR: {invalid} run(s) had events without a reply; their figures are not valid.")
+        return 1
+    return 0
+
+
+def compare(args):
+    """Prints the relative change of every metric; exits 1 if any got worse by more than the threshold."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    before = {(r['scenario'], r['clients']): r for r in baseline['results']}
+    regressions = 0
+    print(f"{baseline.get('commit')} -> {current.get('commit')}")
+    for result in current['results']:
+        old = before.get((result['scenario'], result['clients']))
+        if result.get('timeouts'):
+            regressions += 1
+            print(f"  {result['scenario']:7} x{result['clients']:<3} INVALID: {result['timeouts']} events timed out")
+            continue
+        if old is None or old.get('timeouts'):
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            if not old.get(metric):
+                continue
+            change = result[metric] / old[metric] - 1
+            worse = -change if higher_is_better else change
+            flag = 'REGRESSION' if worse > args.threshold else ''
+            regressions += bool(flag)
+            print(f"  {result['scenario']:7} x{result['clients']:<3} {metric:14} "
+                  f"{old[metric]:12.2f} -> {result[metric]:12.2f} ({change:+7.1%}) {flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the suite and save JSON results")
+    run_parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    run_parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    run_parser.add_argument('--events', type=int, default=2000, help="events per run")
+    run_parser.add_argument('--source', default=os.path.join(ROOT, 'data', 'test_motion_data.csv'),
+                            help="motion CSV to replay, or 'synthetic'")
+    run_parser.add_argument('--sample-rate', type=float, default=200, help="Hz per vehicle in highrate")
+    run_parser.add_argument('--env', nargs='*', default=[], help="KEY=VALUE settings for app.py")
+    run_parser.add_argument('-o', '--output', help="default: benchmarks/results/<commit>.json")
+
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+
+    child_parser = commands.add_parser('child')
+    child_parser.add_argument('scenario', choices=SCENARIOS)
+    child_parser.add_argument('--clients', type=int, default=1)
+    child_parser.add_argument('--events', type=int, default=2000)
+    child_parser.add_argument('--source', default='synthetic')
+    child_parser.add_argument('--sample-rate', type=float, default=200)
+
+    args = parser.parse_args(argv)
+    if args.command == 'child':
+        return child(args)
+    if args.command == 'compare':
+        return compare(args)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
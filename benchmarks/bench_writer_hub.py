@@ -0,0 +1,105 @@
+"""Socket latency while the DrivingLogWriter commits, with and without eventlet.tpool.
+
+app.py runs under eventlet.monkey_patch(), so the writer's thread is a green
+thread. Runs the writer that way in-process, with its inserts and commits
+either in the writer's own green thread or handed to eventlet.tpool as app.py
+does. Meanwhile an echo server on the hub answers a native-thread client that
+pings it every millisecond. The round-trip times show how long a socket waits
+while a batch is being committed.
+
+Usage: python benchmarks/bench_writer_hub.py [--rows 200000] [--batch-size 5000]
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from eventlet import patcher, tpool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db_writer import DrivingLogWriter
+from metrics import LatencyRecorder
+import schema
+
+native_socket = patcher.original('socket')
+native_threading = patcher.original('threading')
+native_time = patcher.original('time')
+
+
+def make_row(i):
+    return (1, 'bench', 1_700_000_000_000 + i * 100, 0.1, -0.2, 1.0, 0.01, 0.02, -0.03, 42.0, 2, 'Normal', 0)
+
+
+def echo(conn):
+    while True:
+        data = conn.recv(64)
+        if not data:
+            break
+        conn.sendall(data)
+    conn.close()
+
+
+def serve(listener):
+    while True:
+        conn, _ = listener.accept()
+        eventlet.spawn(echo, conn)
+
+
+def ping(port, stop, latency):
+    """Native thread: one-byte round trips to the hub's echo server every millisecond."""
+    sock = native_socket.create_connection(('127.0.0.1', port))
+    sock.setsockopt(native_socket.IPPROTO_TCP, native_socket.TCP_NODELAY, 1)
+    while not stop.is_set():
+        started = time.perf_counter()
+        sock.sendall(b'x')
+        sock.recv(1)
+        latency.observe(time.perf_counter() - started)
+        native_time.sleep(0.001)
+    sock.close()
+
+
+def run(path, rows, batch_size, offload, port):
+    writer = DrivingLogWriter(path, batch_size=batch_size, max_queue=rows + 1, offload=offload)
+    writer.start()
+    latency = LatencyRecorder(100_000)
+    stop = native_threading.Event()
+    pinger = native_threading.Thread(target=ping, args=(port, stop, latency), daemon=True)
+    pinger.start()
+    eventlet.sleep(0.1)
+    started = time.perf_counter()
+    for i in range(rows):
+        writer.submit(make_row(i))
+        if i % 100 == 99:
+            eventlet.sleep(0)
+    writer.close(timeout=60)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    pinger.join(5)
+    return rows / elapsed, writer.batches_written, latency.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    listener = eventlet.listen(('127.0.0.1', 0))
+    eventlet.spawn(serve, listener)
+    port = listener.getsockname()[1]
+    with tempfile.TemporaryDirectory() as directory:
+        for label, offload in (('green', None), ('tpool', tpool.execute)):
+            path = os.path.join(directory, f'{label}.db')
+            schema.init_db(path)
+            rate, batches, latency = run(path, args.rows, args.batch_size, offload, port)
+            print(f"{label:6}: {rate:9.0f} rows/s in {batches} commits  socket RTT p50={latency['p50_ms']:.3f}ms "
+                  f"p99={latency['p99_ms']:.3f}ms max={latency['max_ms']:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Checks that sensor_data and sensor_batch classify the same stream identically.
+
+Replays one recorded drive (test_motion_data.csv rows, one every 1000 /
+--sample-rate ms) into app.py twice, in-process through the Flask-SocketIO
+test client against a throwaway database: once as sensor_data events, each
+sent after the previous 'update' arrived, and once as sensor_batch frames of
+--frame samples for a second vehicle. The per-sample classes of both paths
+must match; the decimator (above the model rate, e.g. --sample-rate 100), the
+change gate (--threshold) and the prediction cache are the stages whose
+decisions depend on how the samples were framed.
+
+Usage: python benchmarks/check_paths.py [--samples 600] [--frame 10] [--threshold 1.5] [--sample-rate 10]
+Exits 1 if any sample's class differs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+
+
+def per_sample(server, client, timestamps, values, poll=0.0005, timeout=10.0):
+    classes = np.full(len(timestamps), -2, dtype=np.int64)
+    for i, (timestamp, row) in enumerate(zip(timestamps.tolist(), values.tolist())):
+        client.emit('sensor_data', dict(zip(('AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ', 'speed'), row),
+                                        Timestamp=timestamp, vehicle_id='per-sample'))
+        deadline = time.perf_counter() + timeout
+        while classes[i] == -2 and time.perf_counter() < deadline:
+            for message in client.get_received():
+                if message['name'] == 'update':
+                    classes[i] = message['args'][0]['class']
+            if classes[i] == -2:
+                server.socketio.sleep(poll)
+    return classes
+
+
+def framed(client, timestamps, values, frame):
+    import wire
+
+    classes = np.full(len(timestamps), -2, dtype=np.int64)
+    for start in range(0, len(timestamps), frame):
+        rows = slice(start, start + frame)
+        count = len(timestamps[rows])
+        client.emit('sensor_batch', {'frame': wire.encode_samples(['framed'], np.zeros(count, dtype=np.int64),
+                                                                  timestamps[rows], values[rows])})
+        for message in client.get_received():
+            if message['name'] == 'batch_result':
+                classes[rows] = wire.decode_results(message['args'][0]['frame'])[3]
+    return classes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=os.path.join(ROOT, 'data', 'test_motion_data.csv'))
+    parser.add_argument('--samples', type=int, default=600)
+    parser.add_argument('--frame', type=int, default=10, help="samples per sensor_batch frame")
+    parser.add_argument('--threshold', type=float, default=1.5, help="CHANGE_GATE_THRESHOLD")
+    parser.add_argument('--sample-rate', type=float, default=10, help="samples per second of the replayed stream")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE=os.path.join(tmp, 'check.db'), RAW_ARCHIVE_ROOT='',
+                      CHANGE_GATE_THRESHOLD=str(args.threshold))
+    import app as server
+
+    server.init_db()
+    server.socketio.server.async_handlers = False
+    server.log_writer.start()
+    server.inference_engine.start(server.socketio.start_background_task)
+
+    columns = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ']
+    recorded = pd.read_csv(args.source)[columns].to_numpy()
+    values = np.zeros((args.samples, 7), dtype=np.float32)
+    values[:, :6] = recorded[np.arange(args.samples) % len(recorded)]
+    values[:, 6] = 40.0
+    timestamps = 1_700_000_000_000 + np.rint(np.arange(args.samples) * 1000 / args.sample_rate).astype(np.int64)
+
+    expected = per_sample(server, server.socketio.test_client(server.app), timestamps, values)
+    actual = framed(server.socketio.test_client(server.app), timestamps, values, args.frame)
+    server.inference_engine.stop()
+    server.log_writer.close()
+
+    differ = np.flatnonzero(expected != actual)
+    print(f"{args.samples} samples at {args.sample_rate:g} Hz, frames of {args.frame}, gate {args.threshold:g}: "
+          f"{len(differ)} differ; gate {server.change_gate.stats()}")
+    if len(differ):
+        first = differ[:10]
+        print(f"first differences at {first.tolist()}: sensor_data {expected[first].tolist()}, "
+              f"sensor_batch {actual[first].tolist()}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import time
+
+ALL_VEHICLES = '*'
+
+
+def room_for(vehicle_id=None, session_id=None):
+    """Socket.IO room of a dashboard channel: one vehicle, one session, or every vehicle."""
+    if vehicle_id not in (None, '', ALL_VEHICLES):
+        return f'vehicle:{vehicle_id}'
+    if session_id is not None:
+        return f'session:{session_id}'
+    return 'vehicles:*'
+
+
+class ClientStats:
+    __slots__ = ('room', 'frames_sent', 'frames_dropped', 'queue_depth', 'resync')
+
+    def __init__(self, room):
+        self.room = room
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.queue_depth = 0
+        self.resync = set()
+
+
+class DashboardBroadcaster:
+    """Coalesces per-vehicle telemetry and pushes it to subscribed dashboards at a fixed rate.
+
+    `publish()` only records the latest values; every 1/refresh_hz seconds the
+    fields that changed since the previous tick are sent as one `telemetry`
+    message per client. A client whose Engine.IO send queue is deeper than
+    `max_queue_depth` misses that tick and gets a full snapshot once it catches up.
+
+    With fanout='room' (several workers behind a message queue) one frame per
+    room is emitted instead, so dashboards on other workers receive it too;
+    per-client backpressure is not possible there, and every
+    `snapshot_interval` seconds full values are sent so late subscribers
+    converge on vehicles owned by other workers.
+    """
+
+    def __init__(self, socketio, refresh_hz=10, max_queue_depth=32, namespace='/', fanout='client',
+                 snapshot_interval=2.0):
+        self.socketio = socketio
+        self.interval = 1.0 / refresh_hz
+        self.max_queue_depth = max_queue_depth
+        self.namespace = namespace
+        self.fanout = fanout
+        self.snapshot_ticks = max(1, round(snapshot_interval * refresh_hz))
+        self._latest = {}
+        self._sent = {}
+        self._rooms = {}
+        self._dirty = set()
+        self._clients = {}
+        self._running = False
+        self.ticks = 0
+
+    # --- Producers ---
+    def publish(self, vehicle_id, session_id, values):
+        """Records the newest values for a vehicle; earlier unsent values are overwritten."""
+        latest = self._latest.get(vehicle_id)
+        if latest is None:
+            latest = self._latest[vehicle_id] = {}
+        latest.update(values)
+        self._rooms[vehicle_id] = (room_for(vehicle_id), room_for(session_id=session_id), room_for())
+        self._dirty.add(vehicle_id)
+
+    def forget(self, vehicle_id):
+        for state in (self._latest, self._sent, self._rooms):
+            state.pop(vehicle_id, None)
+        self._dirty.discard(vehicle_id)
+
+    # --- Subscriptions ---
+    def subscribe(self, sid, vehicle_id=None, session_id=None):
+        """Moves a dashboard to one channel and queues a full snapshot of it."""
+        self.unsubscribe(sid)
+        room = room_for(vehicle_id, session_id)
+        self.socketio.server.enter_room(sid, room, namespace=self.namespace)
+        client = self._clients[sid] = ClientStats(room)
+        local = [vid for vid, rooms in self._rooms.items() if room in rooms]
+        if self.fanout == 'room':
+            # Room frames are shared, so this worker's vehicles are sent to the new client right away
+            if local:
+                updates = [dict(self._latest[vid], vehicle_id=vid) for vid in local]
+                self.socketio.emit('telemetry', {'vehicles': updates}, to=sid, namespace=self.namespace)
+                client.frames_sent += 1
+            return room
+        client.resync.update(local)
+        self._dirty.update(client.resync)
+        return room
+
+    def unsubscribe(self, sid):
+        client = self._clients.pop(sid, None)
+        if client is not None:
+            self.socketio.server.leave_room(sid, client.room, namespace=self.namespace)
+
+    # --- Delivery ---
+    def start(self, spawn):
+        if not self._running:
+            self._running = True
+            spawn(self._run)
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        while self._running:
+            started = time.perf_counter()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"ERROR: Dashboard broadcast failed: {e}")
+            self.socketio.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
+
+    def flush(self):
+        """Sends one coalesced frame per subscribed client. Returns the number of messages emitted."""
+        self.ticks += 1
+        snapshot = self.fanout == 'room' and self.ticks % self.snapshot_ticks == 0
+        if snapshot:
+            self._dirty.update(self._latest)
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+
+        # Delta per vehicle, computed once and shared by every room it belongs to
+        deltas = {}
+        frames_by_room = {}
+        for vehicle_id in dirty:
+            latest = self._latest.get(vehicle_id)
+            if latest is None:
+                continue
+            sent = self._sent.setdefault(vehicle_id, {})
+            delta = {key: value for key, value in latest.items() if sent.get(key) != value}
+            sent.update(delta)
+            deltas[vehicle_id] = dict(latest) if snapshot else delta
+            for room in self._rooms[vehicle_id]:
+                frames_by_room.setdefault(room, []).append(vehicle_id)
+
+        if self.fanout == 'room':
+            return self._emit_to_rooms(frames_by_room, deltas)
+
+        emitted = 0
+        manager = self.socketio.server.manager
+        for room, vehicle_ids in frames_by_room.items():
+            for sid, eio_sid in manager.get_participants(self.namespace, room):
+                client = self._clients.get(sid)
+                if client is None:
+                    continue
+                client.queue_depth = self._queue_depth(eio_sid)
+                if client.queue_depth > self.max_queue_depth:
+                    # Slow consumer: skip this tick and send full state once it drains
+                    client.frames_dropped += 1
+                    client.resync.update(vehicle_ids)
+                    self._dirty.update(vehicle_ids)
+                    continue
+                updates = []
+                for vehicle_id in vehicle_ids:
+                    if vehicle_id in client.resync:
+                        client.resync.discard(vehicle_id)
+                        values = self._latest[vehicle_id]
+                    else:
+                        values = deltas[vehicle_id]
+                        if not values:
+                            continue
+                    updates.append(dict(values, vehicle_id=vehicle_id))
+                if updates:
+                    self.socketio.emit('telemetry', {'vehicles': updates}, to=sid, namespace=self.namespace)
+                    client.frames_sent += 1
+                    emitted += 1
+        return emitted
+
+    def _emit_to_rooms(self, frames_by_room, deltas):
+        emitted = 0
+        for room, vehicle_ids in frames_by_room.items():
+            updates = [dict(deltas[vid], vehicle_id=vid) for vid in vehicle_ids if deltas[vid]]
+            if updates:
+                self.socketio.emit('telemetry', {'vehicles': updates}, to=room, namespace=self.namespace)
+                emitted += 1
+        return emitted
+
+    def _queue_depth(self, eio_sid):
+        socket = self.socketio.server.eio.sockets.get(eio_sid)
+        return socket.queue.qsize() if socket is not None else 0
+
+    def stats(self):
+        return {
+            'refresh_hz': 1.0 / self.interval,
+            'fanout': self.fanout,
+            'max_queue_depth': self.max_queue_depth,
+            'vehicles': len(self._latest),
+            'ticks': self.ticks,
+            'clients': {
+                sid: {
+                    'room': client.room,
+                    'queue_depth': client.queue_depth,
+                    'frames_sent': client.frames_sent,
+                    'frames_dropped': client.frames_dropped
+                } for sid, client in self._clients.items()
+            }
+        }
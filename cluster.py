@@ -0,0 +1,377 @@
+"""Multi-process deployment: several Socket.IO ingest workers around one coordinator.
+
+    python cluster.py --workers 4                # workers on ports 5000-5003
+
+The coordinator hosts, through multiprocessing.managers, a small pub/sub hub
+standing in for Redis as the Socket.IO message queue, the single
+DrivingLogWriter that owns driving_log and the one connection that opens,
+closes and checkpoints sessions, so workers never write the database
+themselves. Each worker is an ordinary app.py
+process started with CLUSTER_* environment variables. Vehicles are sharded by
+crc32(vehicle_id) % workers, so a vehicle's LSTM window and session always
+live on one worker; clients pick the worker with `shard_for()` (see
+headless_sim.py --url with several URLs).
+"""
+import argparse
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from multiprocessing.managers import BaseManager
+
+import socketio
+
+from db_writer import DrivingLogWriter, connect
+import schema
+from session_stats import UPSERT_SESSION_STATS
+
+DEFAULT_AUTHKEY = 'driving-behavior-cluster'
+LISTEN_BATCH = 256
+
+
+def shard_for(vehicle_id, shards):
+    """Worker index that owns `vehicle_id`; stable across processes and restarts."""
+    return zlib.crc32(str(vehicle_id).encode('utf-8')) % shards
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+# --- Coordinator side ---
+class ClusterHub:
+    """Lives in the coordinator process; workers reach it through a manager proxy."""
+
+    def __init__(self, database, **writer_options):
+        self._subscribers = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.writer = DrivingLogWriter(database, **writer_options)
+        self.writer.start()
+        self._sessions = connect(database)
+        self._sessions_lock = threading.Lock()
+
+    # Socket.IO message queue
+    def subscribe(self):
+        with self._lock:
+            self._next_id += 1
+            self._subscribers[self._next_id] = queue.Queue()
+            return self._next_id
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def publish(self, messages):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for q in subscribers:
+            for message in messages:
+                q.put(message)
+
+    def listen(self, subscriber, timeout=1.0):
+        """Returns the messages waiting for `subscriber`, blocking up to `timeout` for the first one."""
+        q = self._subscribers[subscriber]
+        try:
+            messages = [q.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(messages) < LISTEN_BATCH:
+            try:
+                messages.append(q.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+    # Single driving_log writer
+    def submit_rows(self, rows):
+        return sum(self.writer.submit(row) for row in rows)
+
+    def flush(self, timeout=5.0):
+        return self.writer.flush(timeout)
+
+    def writer_stats(self):
+        return self.writer.stats()
+
+    # sessions and session_stats rows of every worker
+    def start_session(self, vehicle_id, driver_name=None):
+        with self._sessions_lock:
+            return schema.start_session(self._sessions, vehicle_id, driver_name)
+
+    def write_sessions(self, ended, stats_rows):
+        """Closes the `ended` session ids and upserts session_stats rows (SessionStats.checkpoint_row())."""
+        with self._sessions_lock:
+            for session_id in ended:
+                schema.end_session(self._sessions, session_id)
+            with self._sessions:
+                self._sessions.executemany(UPSERT_SESSION_STATS, stats_rows)
+
+    def close(self):
+        self.writer.close()
+        self._sessions.close()
+
+
+_hub = None
+
+
+def _init_hub(database, writer_options):
+    global _hub
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the launcher shuts the coordinator down explicitly
+    _hub = ClusterHub(database, **writer_options)
+
+
+def _get_hub():
+    return _hub
+
+
+class ClusterManager(BaseManager):
+    pass
+
+
+ClusterManager.register('hub', callable=_get_hub)
+
+
+def connect_hub(address, authkey):
+    manager = ClusterManager(address=parse_address(address), authkey=authkey.encode('utf-8'))
+    manager.connect()
+    return manager.hub()
+
+
+# --- Worker side ---
+# Manager proxies keep one connection per (green) thread, so each of these
+# classes talks to the hub from a single long-lived background task.
+class QueuePubSubManager(socketio.PubSubManager):
+    """Socket.IO client manager that relays cross-worker events through the coordinator hub."""
+
+    name = 'cluster'
+
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.address = address
+        self.authkey = authkey
+        self._outgoing = queue.Queue()
+
+    def initialize(self):
+        super().initialize()
+        self.server.start_background_task(self._publisher)
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        # Replies to a client connected to this worker never need the queue
+        room = to or room
+        if callback is None and isinstance(room, str) and self.is_connected(room, namespace or '/'):
+            kwargs['ignore_queue'] = True
+        return super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid,
+                            callback=callback, **kwargs)
+
+    def _publish(self, data):
+        self._outgoing.put(data)
+
+    def _publisher(self):
+        hub = connect_hub(self.address, self.authkey)
+        while True:
+            messages = [self._outgoing.get()]
+            while len(messages) < LISTEN_BATCH:
+                try:
+                    messages.append(self._outgoing.get_nowait())
+                except queue.Empty:
+                    break
+            hub.publish(messages)
+
+    def _listen(self):
+        hub = connect_hub(self.address, self.authkey)
+        subscriber = hub.subscribe()
+        while True:
+            for message in hub.listen(subscriber, 1.0):
+                yield message
+
+
+class RemoteLogWriter:
+    """DrivingLogWriter stand-in for workers: rows are shipped in batches to the coordinator's writer.
+
+    Session rows go the same way: start_session() and write_sessions() are run
+    on the coordinator's hub by the sender task, after the rows submitted
+    before them, and wait for its result.
+    """
+
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY, batch_size=500, flush_interval=0.25,
+                 max_queue=20000, block_timeout=1.0, spawn=None):
+        self.address = address
+        self.authkey = authkey
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.block_timeout = block_timeout
+        self._spawn = spawn or (lambda target: threading.Thread(target=target, daemon=True).start())
+        self._pending = []
+        self._flush_waiters = []
+        self._calls = []  # [method, args, done event, result, exception]
+        self._wake = threading.Event()
+        self._drained = threading.Event()
+        self._started = False
+        self._closing = False
+        self.rows_sent = 0
+        self.rows_dropped = 0
+        self.batches_sent = 0
+        self.send_errors = 0
+        # Optional metrics.Histogram observing each shipment round trip
+        self.commit_latency = None
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self._spawn(self._run)
+
+    def submit(self, row):
+        """Queues one row, waiting up to `block_timeout` for the sender when the buffer is full.
+
+        The default wait is longer than DrivingLogWriter's because draining the
+        buffer takes a round trip to the coordinator rather than a local write.
+        """
+        if len(self._pending) >= self.max_queue:
+            self._drained.clear()
+            self._wake.set()
+            self._drained.wait(self.block_timeout)
+            if len(self._pending) >= self.max_queue:
+                self.rows_dropped += 1
+                return False
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self, timeout=5.0):
+        """Blocks until every row submitted before this call has been committed by the coordinator."""
+        if not self._started:
+            return False
+        done = threading.Event()
+        self._flush_waiters.append(done)
+        self._wake.set()
+        return done.wait(timeout)
+
+    def start_session(self, vehicle_id, driver_name=None):
+        return self._call('start_session', vehicle_id, driver_name)
+
+    def write_sessions(self, ended, stats_rows):
+        return self._call('write_sessions', list(ended), list(stats_rows))
+
+    def _call(self, method, *args, timeout=5.0):
+        if not self._started:
+            raise RuntimeError("the cluster writer is not started")
+        call = [method, args, threading.Event(), None, None]
+        self._calls.append(call)
+        self._wake.set()
+        if not call[2].wait(timeout):
+            raise TimeoutError(f"the coordinator did not answer {method} within {timeout}s")
+        if call[4] is not None:
+            raise call[4]
+        return call[3]
+
+    def close(self, timeout=5.0):
+        if self._started:
+            self.flush(timeout)
+            self._closing = True
+            self._wake.set()
+
+    def _run(self):
+        hub = connect_hub(self.address, self.authkey)
+        while not self._closing:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            waiters, self._flush_waiters = self._flush_waiters, []
+            # Shipped in batch_size chunks so blocked submitters can refill the buffer between calls
+            while self._pending:
+                rows = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._drained.set()
+                started = time.perf_counter()
+                try:
+                    accepted = hub.submit_rows(rows)
+                    if self.commit_latency is not None:
+                        self.commit_latency.observe(time.perf_counter() - started)
+                    self.rows_sent += accepted
+                    self.rows_dropped += len(rows) - accepted
+                    self.batches_sent += 1
+                except Exception as e:
+                    self.send_errors += 1
+                    self.rows_dropped += len(rows)
+                    print(f"ERROR: Failed to ship {len(rows)} rows to the cluster writer: {e}")
+            calls, self._calls = self._calls, []
+            for call in calls:
+                try:
+                    call[3] = getattr(hub, call[0])(*call[1])
+                except Exception as e:
+                    call[4] = e
+                call[2].set()
+            if waiters:
+                try:
+                    hub.flush()
+                except Exception as e:
+                    print(f"ERROR: Failed to flush the cluster writer: {e}")
+            for done in waiters:
+                done.set()
+
+    def stats(self):
+        return {
+            'queue_depth': len(self._pending),
+            'rows_sent': self.rows_sent,
+            'rows_dropped': self.rows_dropped,
+            'batches_sent': self.batches_sent,
+            'send_errors': self.send_errors,
+            'coordinator': self.address
+        }
+
+
+# --- Launcher ---
+def start_workers(count, base_port, address, authkey, database, extra_env=None):
+    workers = []
+    for shard in range(count):
+        env = dict(os.environ, CLUSTER_ADDRESS=address, CLUSTER_AUTHKEY=authkey, CLUSTER_SHARD=str(shard),
+                   CLUSTER_SHARDS=str(count), PORT=str(base_port + shard), DATABASE=database, **(extra_env or {}))
+        workers.append(subprocess.Popen([sys.executable, 'app.py'], env=env,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))))
+    return workers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run app.py as several sharded ingest workers.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--base-port', type=int, default=5000)
+    parser.add_argument('--coordinator', default='127.0.0.1:5999', help="host:port of the coordinator hub")
+    parser.add_argument('--authkey', default=os.environ.get('CLUSTER_AUTHKEY', DEFAULT_AUTHKEY))
+    parser.add_argument('--database', default=os.environ.get('DATABASE', 'instance/driving_behavior.db'))
+    args = parser.parse_args(argv)
+
+    version = schema.init_db(args.database)
+    print(f"INFO: Database '{args.database}' initialized at schema version {version}.")
+    manager = ClusterManager(address=parse_address(args.coordinator), authkey=args.authkey.encode('utf-8'))
+    manager.start(_init_hub, (args.database, {}))
+    workers = start_workers(args.workers, args.base_port, args.coordinator, args.authkey, args.database)
+    print(f"INFO: {args.workers} workers on ports {args.base_port}-{args.base_port + args.workers - 1}, "
+          f"coordinator on {args.coordinator}.")
+    try:
+        while all(worker.poll() is None for worker in workers):
+            time.sleep(1)
+        print("ERROR: A worker exited; shutting the cluster down.")
+    except KeyboardInterrupt:
+        print("\nINFO: Shutting down cluster...")
+    finally:
+        # SIGINT lets each worker close its sessions and ship its last rows
+        for worker in workers:
+            if worker.poll() is None:
+                worker.send_signal(signal.SIGINT)
+        for worker in workers:
+            try:
+                worker.wait(10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        manager.hub().close()
+        manager.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import queue
+import sqlite3
+import threading
+import time
+
+INSERT_DRIVING_LOG = '''INSERT INTO driving_log
+                      (session_id, vehicle_id, timestamp, acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z,
+                       speed, predicted_class, risk_level, gap)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# Backpressure policies applied when the queue is full
+OVERFLOW_BLOCK = 'block'              # wait up to `block_timeout`, then drop the new row
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # drop the new row immediately
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # drop the oldest queued row to make room
+
+
+def connect(database):
+    """Opens a connection configured for a single long-lived writer.
+
+    The writer may hand its statements to other (native) threads, one at a
+    time, so the connection is not tied to the thread that opened it.
+    """
+    conn = sqlite3.connect(database, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class _FlushMarker:
+    __slots__ = ('event',)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class DrivingLogWriter:
+    """Background writer that batches driving_log rows over one WAL-mode connection.
+
+    Rows are queued by `submit()` and written with `executemany` whenever
+    `batch_size` rows are waiting or `flush_interval` seconds have passed.
+    Under eventlet the writer's thread is a green thread, so the blocking
+    insert and commit are passed to `offload(fn, *args)`, e.g.
+    eventlet.tpool.execute, to run on a native thread while the hub keeps
+    serving sockets; by default they run in the writer's own thread.
+    """
+
+    def __init__(self, database, batch_size=500, flush_interval=0.25, max_queue=20000,
+                 overflow=OVERFLOW_BLOCK, block_timeout=0.05, offload=None):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._offload = offload
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closing = False
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self._started_at = None
+        # Optional metrics.Histogram observing each batch commit
+        self.commit_latency = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._closing = False
+                self._started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name='driving-log-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, row):
+        """Queues one row. Returns False if the row was dropped by the backpressure policy."""
+        try:
+            if self.overflow == OVERFLOW_BLOCK:
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            try:
+                self._queue.get_nowait()
+                self._queue.put_nowait(row)
+                self.rows_dropped += 1
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+        self.rows_dropped += 1
+        return False
+
+    def flush(self, timeout=5.0):
+        """Blocks until every row queued before this call has been committed."""
+        if self._thread is None:
+            return False
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.event.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Flushes outstanding rows and stops the writer thread."""
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._closing = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        conn = connect(self.database)
+        try:
+            while True:
+                rows, markers, stop = self._next_batch()
+                if rows:
+                    self._write(conn, rows)
+                for marker in markers:
+                    marker.event.set()
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        rows, markers = [], []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return rows, markers, self._closing
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is None:
+                return rows, markers, True
+            if isinstance(item, _FlushMarker):
+                # Commit everything queued ahead of the marker before releasing it
+                markers.append(item)
+                return rows, markers, False
+            rows.append(item)
+            if len(rows) >= self.batch_size:
+                return rows, markers, False
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return rows, markers, False
+
+    def _write(self, conn, rows):
+        started = time.perf_counter()
+        try:
+            if self._offload is None:
+                self._commit(conn, rows)
+            else:
+                self._offload(self._commit, conn, rows)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+            if self.commit_latency is not None:
+                self.commit_latency.observe(time.perf_counter() - started)
+        except Exception as e:
+            self.write_errors += 1
+            print(f"ERROR: Error storing {len(rows)} rows to database: {e}")
+
+    @staticmethod
+    def _commit(conn, rows):
+        conn.executemany(INSERT_DRIVING_LOG, rows)
+        conn.commit()
+
+    def stats(self):
+        elapsed = (time.time() - self._started_at) if self._started_at else 0.0
+        return {
+            'queue_depth': self._queue.qsize(),
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'batches_written': self.batches_written,
+            'write_errors': self.write_errors,
+            'rows_per_second': (self.rows_written / elapsed) if elapsed > 0 else 0.0,
+            'overflow_policy': self.overflow
+        }
@@ -0,0 +1,214 @@
+"""Anti-aliased decimation of high-rate sensor streams down to the model's sample rate.
+
+Phone IMUs deliver 50-200 Hz while the LSTM windows are MODEL_SAMPLE_RATE_HZ
+samples. Every vehicle's sample interval is estimated from its timestamps
+(median per call, smoothed across calls); a stream at k times the model rate
+goes through a windowed-sinc low-pass FIR with its cutoff at the model rate's
+Nyquist frequency (4k+1 Hamming taps, i.e. a delay of two model samples) and
+only every k-th filtered sample is passed on. Streams at or below the model
+rate (k = 1) pass through untouched. A new stream's first sample, whose rate
+is only known from the second one, is always passed on unfiltered, and the
+sample phase counts from it; so the same samples are kept whether the stream
+arrives in frames or one sample at a time.
+
+State is kept per stream in preallocated arrays like features.py: a ring of
+the most recent raw samples, the sample phase and the rate estimate.
+Consecutive frames and single sensor_data samples therefore filter like one
+long stream as long as its rate is steady (when it changes, the smoothed
+estimates of the two may switch factor a few samples apart), and one
+`decimate()` call filters any number of vehicles at once, computing only the
+kept outputs as one gather of their input windows times the taps.
+"""
+import numpy as np
+
+NUM_AXES = 6
+TAPS_PER_FACTOR = 4
+RATE_SMOOTHING_SAMPLES = 20  # sample intervals after which a call's median replaces the old estimate
+
+
+def lowpass_taps(factor):
+    """Windowed-sinc low-pass for decimating by `factor`: 4 * factor + 1 taps, unit DC gain."""
+    if factor <= 1:
+        return np.ones(1)
+    lags = np.arange(TAPS_PER_FACTOR * factor + 1) - TAPS_PER_FACTOR * factor // 2
+    taps = np.sinc(lags / factor) * np.hamming(len(lags))
+    return taps / taps.sum()
+
+
+class Decimator:
+    """Per-vehicle low-pass and downsampling to `model_rate_hz`; 0 passes every sample through."""
+
+    def __init__(self, model_rate_hz=10.0, max_factor=20, capacity=64):
+        self.model_rate_hz = model_rate_hz
+        self.period = 1000 / model_rate_hz if model_rate_hz > 0 else 0.0
+        self.max_factor = max(1, max_factor)
+        self.history = TAPS_PER_FACTOR * self.max_factor
+        # Row k holds the taps for factor k, right-aligned so the last column weights the newest sample
+        self._taps = np.zeros((self.max_factor + 1, self.history + 1))
+        for factor in range(1, self.max_factor + 1):
+            taps = lowpass_taps(factor)
+            self._taps[factor, -len(taps):] = taps
+        self._slots = {}
+        self._free = []
+        self.samples_in = 0
+        self.samples_out = 0
+        self.rate_changes = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, '_factor', None)
+        start = 0 if old is None else len(old)
+        self._raw = self._grow(getattr(self, '_raw', None), (capacity, self.history, NUM_AXES))
+        self._head = self._grow(getattr(self, '_head', None), (capacity,), np.int64)
+        self._seen = self._grow(getattr(self, '_seen', None), (capacity,), np.int64)
+        self._phase = self._grow(getattr(self, '_phase', None), (capacity,), np.int64)
+        self._interval = self._grow(getattr(self, '_interval', None), (capacity,))
+        self._last_timestamp = self._grow(getattr(self, '_last_timestamp', None), (capacity,), np.int64)
+        self._factor = self._grow(old, (capacity,), np.int64)
+        self._factor[start:] = 1
+        self._free.extend(range(capacity - 1, start - 1, -1))
+
+    @staticmethod
+    def _grow(array, shape, dtype=np.float64):
+        grown = np.zeros(shape, dtype=dtype)
+        if array is not None:
+            grown[:len(array)] = array
+        return grown
+
+    # --- Streams ---
+    def slot(self, key):
+        """Returns the state slot of a stream, allocating an empty one on first use."""
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                self._allocate(2 * len(self._factor))
+            slot = self._slots[key] = self._free.pop()
+        return slot
+
+    def restart(self, key):
+        """Forgets a stream's samples, e.g. after a gap, but keeps its rate estimate."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._seen[slot] = 0
+            self._phase[slot] = 0
+            self._last_timestamp[slot] = 0
+
+    def release(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._seen[slot] = self._phase[slot] = self._last_timestamp[slot] = 0
+            self._interval[slot] = 0.0
+            self._factor[slot] = 1
+            self._free.append(slot)
+
+    def __len__(self):
+        return len(self._slots)
+
+    # --- Updates ---
+    def decimate(self, slots, timestamps, samples):
+        """Feeds (n, 6) raw samples to their streams; returns (kept, filtered).
+
+        Each slot's rows must be contiguous and in timestamp order. `kept` are
+        the indices of the rows that go on to the model, `filtered` their
+        low-passed (len(kept), 6) values.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        samples = np.asarray(samples, dtype=np.float64).reshape(len(slots), NUM_AXES)
+        n = len(slots)
+        self.samples_in += n
+        if n == 0:
+            return np.zeros(0, dtype=np.int64), samples
+        starts = np.flatnonzero(np.r_[True, slots[1:] != slots[:-1]])
+        counts = np.diff(np.r_[starts, n])
+        group = np.repeat(np.arange(len(starts)), counts)
+        rank = np.arange(n) - starts[group]
+        streams = slots[starts]
+
+        factor, first, known = self._estimate_rate(streams, starts, counts, group, timestamps)
+        phase = self._phase[streams]
+        kept = np.flatnonzero(((phase[group] + rank + 1) % factor[group] == 0) | first)
+        # Until a stream's rate is known its phase counts from its first sample
+        self._phase[streams] = np.where(known, (phase + counts) % factor, phase + counts)
+        self._last_timestamp[streams] = timestamps[starts + counts - 1]
+
+        filtered = samples[kept]
+        width = TAPS_PER_FACTOR * int(factor.max()) if factor.max() > 1 else 0
+        if width:
+            # Inputs of each kept row at lags width..0: new rows of its stream, else its raw history,
+            # else (history still short) the stream's oldest known sample repeated
+            g = group[kept]
+            lag_rank = rank[kept][:, None] - np.arange(width, -1, -1)
+            lag_rank = np.maximum(lag_rank, -self._seen[streams][g][:, None])
+            from_history = lag_rank < 0
+            inputs = np.empty(lag_rank.shape + (NUM_AXES,))
+            inputs[~from_history] = samples[(starts[g][:, None] + lag_rank)[~from_history]]
+            if from_history.any():
+                ring = (self._head[streams][g][:, None] + lag_rank) % self.history
+                inputs[from_history] = self._raw[np.broadcast_to(streams[g][:, None], ring.shape)[from_history],
+                                                 ring[from_history]]
+            filtered = np.einsum('kl,kla->ka', self._taps[factor[g], -(width + 1):], inputs)
+
+        # Append each stream's newest raw samples (at most `history`) to its ring
+        recent = rank >= counts[group] - self.history
+        head = self._head[streams]
+        self._raw[slots[recent], (head[group] + rank)[recent] % self.history] = samples[recent]
+        self._head[streams] = (head + counts) % self.history
+        self._seen[streams] = np.minimum(self._seen[streams] + counts, self.history)
+        self.samples_out += len(kept)
+        return kept, filtered
+
+    def decimate_one(self, key, timestamp, sample):
+        """Feeds one sample; returns its filtered value if it goes on to the model, else None."""
+        kept, filtered = self.decimate([self.slot(key)], [timestamp], [sample])
+        return filtered[0] if len(kept) else None
+
+    def _estimate_rate(self, streams, starts, counts, group, timestamps):
+        """Updates each stream's interval estimate from the call's timestamps.
+
+        Returns each stream's decimation factor, which rows arrived while their
+        stream's rate was still unknown (a new stream's first sample, passed on
+        as at factor 1), and which streams have a rate estimate after the call.
+        """
+        previous = np.empty_like(timestamps)
+        previous[1:] = timestamps[:-1]
+        previous[starts] = self._last_timestamp[streams]
+        intervals = (timestamps - previous).astype(np.float64)
+        valid = (previous > 0) & (intervals > 0)
+        # Median valid interval per stream: sort by (stream, interval) with invalid ones last
+        order = np.lexsort((np.where(valid, intervals, np.inf), group))
+        measured = np.bincount(group, weights=valid, minlength=len(starts)).astype(np.int64)
+        has = measured > 0
+        median = np.zeros(len(starts))
+        median[has] = intervals[order[starts[has] + measured[has] // 2]]
+
+        interval = prior = self._interval[streams]
+        alpha = np.minimum(1.0, measured / RATE_SMOOTHING_SAMPLES)
+        interval = np.where(has & (interval > 0), interval + alpha * (median - interval),
+                            np.where(has, median, interval))
+        self._interval[streams] = interval
+        factor = np.ones(len(starts), dtype=np.int64)
+        known = interval > 0
+        if self.period <= 0:
+            return factor, np.zeros(len(timestamps), dtype=bool), known
+        factor[known] = np.clip(np.rint(self.period / interval[known]), 1, self.max_factor)
+        # A new rate starts a new phase (the raw history stays valid); a stream's first estimate
+        # continues the phase counted since its first sample, as one call over all of them would
+        changed = (factor != self._factor[streams]) & (prior > 0)
+        if changed.any():
+            self.rate_changes += int(changed.sum())
+            self._phase[streams[changed]] = 0
+        self._factor[streams] = factor
+        return factor, ~valid & (prior[group] == 0), known
+
+    def stats(self):
+        factors = self._factor[list(self._slots.values())] if self._slots else np.zeros(0, dtype=np.int64)
+        return {
+            'model_rate_hz': self.model_rate_hz,
+            'streams': len(self._slots),
+            'decimated_streams': int((factors > 1).sum()),
+            'max_factor_in_use': int(factors.max(initial=1)),
+            'samples_in': self.samples_in,
+            'samples_out': self.samples_out,
+            'rate_changes': self.rate_changes
+        }
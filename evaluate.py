@@ -0,0 +1,219 @@
+"""Accuracy vs. latency of the serving path on the labeled motion CSVs.
+
+Each file is replayed as one vehicle stream through the same stages as
+app.py: reordering (reorder.py), decimation to the model rate (decimate.py),
+streaming features (features.py), --window sample windows, the change gate,
+the prediction cache in INFERENCE_MAX_BATCH_SIZE batches and the model
+backend. Rows are sent --sample-rate times per second, or with
+--sample-rate 0 stamped with the file's Timestamp column read as ms, as a
+client forwarding it would; duplicate and late timestamps are then dropped
+and a gap starts new windows, as in a sensor_batch frame. Every combination of the given backends, batch sizes, cache
+resolutions and gate thresholds is scored against the `Class` column, and one
+table lists accuracy, per-class F1, agreement with the exact (no cache, no
+gate) predictions, the share of windows that reached the model, per-window
+cost and the confusion matrix (rows = true Aggressive/Normal/Slow).
+
+Windows are built for a whole gap-free segment at once and the model runs on whole
+batches, so a file evaluates in seconds; only the change gate, whose decision
+depends on the previously scored window, walks the windows one by one.
+Defaults are read from the same environment variables as app.py.
+
+Usage:
+    python evaluate.py                                        # data/test_motion_data.csv, current settings
+    python evaluate.py data/*_motion_data.csv --backends numpy tflite
+    python evaluate.py --cache-resolutions 0 0.05 0.1 --gate-thresholds 0 0.05 --json eval.json
+    python evaluate.py --sample-rate 100                      # decimated 10:1 to the model rate
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from decimate import Decimator
+from features import RAW_FEATURES, extract, feature_names, parse_windows
+from inference import RISK_LEVELS, predicted_classes
+from model_backend import BACKENDS, MODEL_PATH, load_backend, load_features
+from prediction_cache import PredictionCache
+from reorder import ReorderBuffer, Reorderer
+from train import CLASS_NAMES, score
+from window_store import sliding_windows
+
+SEQUENCE_LENGTH = 5  # as in app.py for models without a features file
+
+
+class CountingModel:
+    """Wraps a backend, counting the windows that actually reach it."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.windows = 0
+
+    def predict(self, batch):
+        self.windows += len(batch)
+        return self.backend.predict(batch)
+
+
+def serving_windows(path, names, feature_windows, length, sample_rate, reorderer, decimator):
+    """Returns (windows, labels) of one file replayed through app.py's reorder, decimation and feature stages.
+
+    Each window is labeled with the Class of the row it ends at; windows never span a gap.
+    """
+    data = pd.read_csv(path)
+    labels = data['Class'].map({name: i for i, name in enumerate(CLASS_NAMES)}).to_numpy()
+    if np.isnan(labels.astype(float)).any():
+        raise ValueError(f"{path}: unknown Class values {sorted(set(data['Class']) - set(CLASS_NAMES))}")
+    if sample_rate > 0:
+        timestamps = 1_700_000_000_000 + np.rint(np.arange(len(data)) * 1000 / sample_rate).astype(np.int64)
+    else:
+        timestamps = data['Timestamp'].to_numpy(dtype=np.int64)
+    samples = data[list(RAW_FEATURES)].to_numpy(dtype=np.float64)
+    columns = [feature_names(feature_windows).index(name) for name in names]
+
+    stored, gaps = reorderer.order_batch([ReorderBuffer()], np.zeros(len(data), dtype=np.int64), timestamps)
+    windows, window_labels = [], []
+    for index, rows in enumerate(np.split(stored, np.flatnonzero(gaps))):
+        if index > 0:
+            decimator.restart(path)
+        kept, filtered = decimator.decimate(np.full(len(rows), decimator.slot(path)), timestamps[rows],
+                                            samples[rows])
+        matrix = extract(filtered, feature_windows)[:, columns].astype(np.float32)
+        if len(matrix) >= length:
+            windows.append(sliding_windows(matrix, length))
+            window_labels.append(labels[rows[kept][length - 1:]])
+    decimator.release(path)
+    if not windows:
+        return np.zeros((0, length, len(names)), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return np.ascontiguousarray(np.concatenate(windows)), np.concatenate(window_labels).astype(np.int64)
+
+
+def gate_mask(windows, threshold):
+    """True for windows ChangeGate would answer with the last scored class (per-sample serving path)."""
+    reused = np.zeros(len(windows), dtype=bool)
+    if threshold <= 0 or not len(windows):
+        return reused
+    reference = windows[0]
+    for i in range(1, len(windows)):
+        if np.abs(windows[i] - reference).max() < threshold:
+            reused[i] = True
+        else:
+            reference = windows[i]
+    return reused
+
+
+def replay(windows, backend, batch_size, resolution, threshold, cache_size):
+    """Returns (1-based classes, windows scored by the model, seconds) for one serving configuration."""
+    model = CountingModel(backend)
+    cache = PredictionCache(model.predict, cache_size if resolution > 0 else 0, resolution or 1.0)
+    started = time.perf_counter()
+    reused = gate_mask(windows, threshold)
+    scored = np.flatnonzero(~reused)
+    classes = np.zeros(len(windows), dtype=np.int64)
+    for start in range(0, len(scored), batch_size):
+        rows = scored[start:start + batch_size]
+        classes[rows] = predicted_classes(cache.predict(windows[rows]))
+    # Gated windows carry the class of the last window that was scored before them
+    last_scored = np.maximum.accumulate(np.where(reused, 0, np.arange(len(windows))))
+    classes = classes[last_scored]
+    return classes, model.windows, time.perf_counter() - started
+
+
+def format_table(rows):
+    headers = ['file', 'backend', 'batch', 'cache', 'gate', 'acc', 'F1 aggr', 'F1 norm', 'F1 slow',
+               'agree', 'model', 'us/win', 'confusion']
+    lines = [[
+        row['file'], row['backend'], str(row['batch_size']), f"{row['cache_resolution']:g}",
+        f"{row['gate_threshold']:g}", f"{row['accuracy']:.3f}",
+        *(f"{row['per_class'][RISK_LEVELS[c]]['f1']:.3f}" for c in (1, 2, 3)),
+        f"{row['agreement']:.3f}", f"{row['model_fraction']:.1%}", f"{row['us_per_window']:.1f}",
+        ' / '.join(' '.join(str(v) for v in counts) for counts in row['confusion_matrix'])
+    ] for row in rows]
+    widths = [max(len(h), *(len(line[i]) for line in lines)) for i, h in enumerate(headers)]
+    text = ['  '.join(h.ljust(w) for h, w in zip(headers, widths))]
+    text += ['  '.join(v.ljust(w) for v, w in zip(line, widths)) for line in lines]
+    return '\n'.join(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate accuracy and cost of serving configurations.")
+    parser.add_argument('files', nargs='*', default=['data/test_motion_data.csv'],
+                        help="motion CSVs with AccX..GyroZ and Class columns")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                        default=[os.environ.get('MODEL_BACKEND', 'numpy')])
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 64))])
+    parser.add_argument('--cache-resolutions', type=float, nargs='+',
+                        default=sorted({0.0, float(os.environ.get('PREDICTION_CACHE_RESOLUTION', 0.05))}),
+                        help="prediction cache grid; 0 disables the cache")
+    parser.add_argument('--cache-size', type=int, default=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)))
+    parser.add_argument('--gate-thresholds', type=float, nargs='+',
+                        default=sorted({0.0, float(os.environ.get('CHANGE_GATE_THRESHOLD', 0))}),
+                        help="change gate thresholds; 0 disables the gate")
+    parser.add_argument('--features', default=os.environ.get('MODEL_FEATURES'),
+                        help="default: the features recorded next to --model, else the raw axes")
+    parser.add_argument('--feature-windows', type=parse_windows, default=os.environ.get('FEATURE_WINDOWS'))
+    parser.add_argument('--sample-rate', type=float, default=10,
+                        help="Hz the rows are sent at; 0 sends the file's Timestamp column as ms")
+    parser.add_argument('--model-rate', type=float, default=float(os.environ.get('MODEL_SAMPLE_RATE_HZ', 10)),
+                        help="MODEL_SAMPLE_RATE_HZ; 0 disables decimation")
+    parser.add_argument('--max-factor', type=int, default=int(os.environ.get('DECIMATION_MAX_FACTOR', 20)))
+    parser.add_argument('--gap-ms', type=float, default=float(os.environ.get('REORDER_GAP_MS', 2000)),
+                        help="REORDER_GAP_MS; 0 never splits the stream")
+    parser.add_argument('--window', type=int, help="samples per window; default: as recorded next to --model")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    trained_features = load_features(args.model)
+    if args.features is None:
+        args.features = ','.join(trained_features[0] if trained_features else RAW_FEATURES)
+    if args.feature_windows is None:
+        args.feature_windows = trained_features[1] if trained_features else (10, 50)
+    if args.window is None:
+        args.window = trained_features[2] if trained_features else SEQUENCE_LENGTH
+    names = [name for name in args.features.split(',') if name]
+    missing = [name for name in names if name not in feature_names(args.feature_windows)]
+    if missing:
+        parser.error(f"unknown feature(s): {', '.join(missing)}")
+
+    backends = {name: load_backend(name, args.model) for name in args.backends}
+    rows = []
+    for path in args.files:
+        started = time.perf_counter()
+        reorderer, decimator = Reorderer(gap=args.gap_ms), Decimator(args.model_rate, args.max_factor)
+        windows, labels = serving_windows(path, names, args.feature_windows, args.window, args.sample_rate, reorderer,
+                                          decimator)
+        print(f"INFO: {os.path.basename(path)}: {reorderer.accepted} rows in order "
+              f"({reorderer.duplicates} duplicate, {reorderer.late} late, {reorderer.gaps} gaps), "
+              f"{decimator.samples_out} at the model rate, {len(windows)} windows built in "
+              f"{time.perf_counter() - started:.2f}s")
+        if not len(windows):
+            continue
+        for name, backend in backends.items():
+            backend.predict(windows[:args.batch_sizes[0]])  # warm-up, e.g. TFLite tensor allocation
+            exact, _, _ = replay(windows, backend, args.batch_sizes[0], 0, 0, 0)
+            for batch_size, resolution, threshold in itertools.product(
+                    args.batch_sizes, sorted(args.cache_resolutions), sorted(args.gate_thresholds)):
+                classes, scored, seconds = replay(windows, backend, batch_size, resolution, threshold,
+                                                  args.cache_size)
+                rows.append(dict(
+                    file=os.path.basename(path), backend=name, batch_size=batch_size,
+                    cache_resolution=resolution, gate_threshold=threshold,
+                    **score(labels, classes - 1),
+                    agreement=float((classes == exact).mean()),
+                    model_fraction=scored / len(windows),
+                    us_per_window=seconds / len(windows) * 1e6))
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"INFO: Results written to {args.json}.")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
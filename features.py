@@ -0,0 +1,215 @@
+"""Streaming feature extraction shared by serving (app.py) and training.
+
+From every raw AccX..GyroZ sample three signals are derived: acceleration
+magnitude, gyro magnitude and jerk (magnitude of the change in acceleration
+since the previous sample, per sample rather than per second so that 1 Hz
+training data and 10 Hz live data agree). Over each configured window of the
+most recent samples, every signal gets a rolling mean, std, min, max and
+high-frequency energy (mean squared sample-to-sample difference, i.e. the
+spectral energy weighted towards fast changes).
+
+State is kept per stream (vehicle) in preallocated arrays, so one `update()`
+call advances any number of vehicles at once, in O(1) per sample and window.
+Mean and std come from a sliding-window Welford update (no sum-of-squares
+cancellation on offset signals such as acceleration magnitude near 9.8) and
+energy from a running sum. Min/max use van Herk/Gil-Werman blocks: the stream
+is cut into blocks of `window` samples, and the window ending at a sample is
+the head of its block (a running min/max) plus the tail of the previous block
+(suffix min/max, computed once when that block completed).
+Offline, `extract()` runs the very same update over a recorded series.
+"""
+import numpy as np
+
+RAW_FEATURES = ('AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ')
+SIGNALS = ('acc_mag', 'gyro_mag', 'jerk')
+STATISTICS = ('mean', 'std', 'min', 'max', 'energy')
+DEFAULT_WINDOWS = (10, 50)
+
+
+def feature_names(windows=DEFAULT_WINDOWS):
+    names = list(RAW_FEATURES) + list(SIGNALS)
+    for window in windows:
+        names += [f'{signal}_{stat}_{window}' for signal in SIGNALS for stat in STATISTICS]
+    return names
+
+
+def parse_windows(text):
+    """'10,50' -> (10, 50)"""
+    return tuple(sorted({int(part) for part in text.split(',') if part.strip()}))
+
+
+class FeatureExtractor:
+    """Per-vehicle rolling statistics over the last `windows` samples, updated for many vehicles at once."""
+
+    def __init__(self, windows=DEFAULT_WINDOWS, capacity=64):
+        self.windows = tuple(sorted(windows))
+        self.history = self.windows[-1]
+        self.names = feature_names(self.windows)
+        self._slots = {}
+        self._free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        num_signals = len(SIGNALS)
+        old = getattr(self, '_count', None)
+        self._ring = self._grow(getattr(self, '_ring', None), (capacity, self.history, num_signals))
+        self._diff2 = self._grow(getattr(self, '_diff2', None), (capacity, self.history, num_signals))
+        self._last_acc = self._grow(getattr(self, '_last_acc', None), (capacity, 3))
+        self._last_signal = self._grow(getattr(self, '_last_signal', None), (capacity, num_signals))
+        shape = (len(self.windows), capacity, num_signals)
+        self._mean = self._grow(getattr(self, '_mean', None), shape, axis=1)
+        self._m2 = self._grow(getattr(self, '_m2', None), shape, axis=1)
+        self._energy = self._grow(getattr(self, '_energy', None), shape, axis=1)
+        self._head_min = self._grow(getattr(self, '_head_min', None), shape, axis=1)
+        self._head_max = self._grow(getattr(self, '_head_max', None), shape, axis=1)
+        # Suffix min/max of each window's previous block; window k uses the first windows[k] entries
+        blocks = (len(self.windows), capacity, self.history, num_signals)
+        self._tail_min = self._grow(getattr(self, '_tail_min', None), blocks, axis=1)
+        self._tail_max = self._grow(getattr(self, '_tail_max', None), blocks, axis=1)
+        self._count = self._grow(old, (capacity,), dtype=np.int64)
+        self._head = self._grow(getattr(self, '_head', None), (capacity,), dtype=np.int64)
+        start = 0 if old is None else len(old)
+        self._free.extend(range(capacity - 1, start - 1, -1))
+
+    @staticmethod
+    def _grow(array, shape, axis=0, dtype=np.float64):
+        grown = np.zeros(shape, dtype=dtype)
+        if array is not None:
+            index = [slice(None)] * len(shape)
+            index[axis] = slice(0, array.shape[axis])
+            grown[tuple(index)] = array
+        return grown
+
+    # --- Streams ---
+    def slot(self, key):
+        """Returns the state slot of a stream, allocating an empty one on first use."""
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                self._allocate(2 * len(self._count))
+            slot = self._slots[key] = self._free.pop()
+        return slot
+
+    def release(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._reset(slot)
+            self._free.append(slot)
+
+    def _reset(self, slot):
+        self._count[slot] = 0
+        self._head[slot] = 0
+        self._mean[:, slot] = 0
+        self._m2[:, slot] = 0
+        self._energy[:, slot] = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    # --- Updates ---
+    def update(self, slots, samples):
+        """Advances the streams in `slots` by one raw (n, 6) sample each, in order; returns (n, F) float32.
+
+        A slot may appear several times; its samples are applied in the order given.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        samples = np.asarray(samples, dtype=np.float64).reshape(len(slots), len(RAW_FEATURES))
+        n = len(slots)
+        out = np.empty((n, len(self.names)), dtype=np.float32)
+        if n <= 1:
+            if n:
+                out[:] = self._update_unique(slots, samples)
+            return out
+        # rank = how many earlier samples of the same slot precede each row; round r applies rank r
+        order = np.argsort(slots, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(slots[order]) != 0])
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+        by_rank = np.argsort(rank, kind='stable')
+        bounds = np.searchsorted(rank[by_rank], np.arange(1, rank.max() + 1))
+        for rows in np.split(by_rank, bounds):
+            out[rows] = self._update_unique(slots[rows], samples[rows])
+        return out
+
+    def update_one(self, key, sample):
+        return self.update([self.slot(key)], [sample])[0]
+
+    def _update_unique(self, slots, samples):
+        acc = samples[:, :3]
+        signal = np.empty((len(slots), len(SIGNALS)))
+        signal[:, 0] = np.linalg.norm(acc, axis=1)
+        signal[:, 1] = np.linalg.norm(samples[:, 3:], axis=1)
+        seen = self._count[slots] > 0
+        signal[:, 2] = np.where(seen, np.linalg.norm(acc - self._last_acc[slots], axis=1), 0.0)
+        diff2 = np.where(seen[:, None], (signal - self._last_signal[slots]) ** 2, 0.0)
+
+        head = self._head[slots]
+        count = self._count[slots]
+        columns = [samples, signal]
+        for w, window in enumerate(self.windows):
+            # Sliding Welford: replace the sample leaving this window, or add to a window still filling
+            leaving = (count >= window)[:, None]
+            old = self._ring[slots, (head - window) % self.history]
+            n = np.minimum(count + 1, window)[:, None]
+            mean = self._mean[w, slots]
+            new_mean = np.where(leaving, mean + (signal - old) / window, mean + (signal - mean) / n)
+            m2 = np.where(leaving, self._m2[w, slots] + (signal - old) * (signal - new_mean + old - mean),
+                          self._m2[w, slots] + (signal - mean) * (signal - new_mean))
+            leaving_diff2 = self._diff2[slots, (head - window) % self.history]
+            energy = self._energy[w, slots] + diff2 - np.where(leaving, leaving_diff2, 0.0)
+            self._mean[w, slots] = new_mean
+            self._m2[w, slots] = m2
+            self._energy[w, slots] = energy
+
+            # Head of the current block, plus the tail of the previous one unless the block is complete
+            position = count % window
+            first = (position == 0)[:, None]
+            low = self._head_min[w, slots] = np.where(first, signal, np.minimum(self._head_min[w, slots], signal))
+            high = self._head_max[w, slots] = np.where(first, signal, np.maximum(self._head_max[w, slots], signal))
+            tail = (count >= window) & (position < window - 1)
+            if tail.any():
+                s, p = slots[tail], position[tail] + 1
+                low[tail] = np.minimum(low[tail], self._tail_min[w, s, p])
+                high[tail] = np.maximum(high[tail], self._tail_max[w, s, p])
+
+            std = np.sqrt(np.maximum(m2 / n, 0.0))
+            columns.append(np.stack([new_mean, std, low, high, np.maximum(energy, 0.0) / n],
+                                    axis=2).reshape(len(slots), -1))
+
+        self._ring[slots, head] = signal
+        self._diff2[slots, head] = diff2
+        self._last_acc[slots] = acc
+        self._last_signal[slots] = signal
+        self._head[slots] = (head + 1) % self.history
+        self._count[slots] = count + 1
+
+        for w, window in enumerate(self.windows):
+            # A completed block's suffix min/max serve the windows ending in the next block
+            done = count % window == window - 1
+            if done.any():
+                s = slots[done]
+                ages = np.arange(window - 1, -1, -1)
+                block = self._ring[s[:, None], (head[done][:, None] - ages) % self.history]
+                self._tail_min[w, s, :window] = np.minimum.accumulate(block[:, ::-1], axis=1)[:, ::-1]
+                self._tail_max[w, s, :window] = np.maximum.accumulate(block[:, ::-1], axis=1)[:, ::-1]
+        return np.concatenate(columns, axis=1)
+
+    def columns(self, names):
+        """Indices of `names` in the feature vector."""
+        return np.array([self.names.index(name) for name in names], dtype=np.int64)
+
+    def stats(self):
+        return {
+            'streams': len(self._slots),
+            'capacity': len(self._count),
+            'windows': list(self.windows),
+            'features': len(self.names)
+        }
+
+
+def extract(samples, windows=DEFAULT_WINDOWS):
+    """Feature matrix of one recorded (n, 6) series, computed exactly as the live stream would be."""
+    extractor = FeatureExtractor(windows, capacity=1)
+    slot = extractor.slot(None)
+    samples = np.asarray(samples, dtype=np.float64)
+    return extractor.update(np.full(len(samples), slot), samples)
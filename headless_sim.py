@@ -0,0 +1,313 @@
+"""Headless multi-vehicle simulator for load-testing app.py.
+
+Steps N virtual cars at once with the vectorized simulator physics, drives them
+with scripted aggressive/normal/slow profiles and streams their sensor_data
+to the server. Runs are reproducible from --seed.
+
+Usage:
+    python headless_sim.py --cars 200 --duration 60
+    python headless_sim.py --cars 2000 --transport shared --speedup 0 --duration 30
+    python headless_sim.py --cars 2000 --transport batch --speedup 0 --duration 30
+    python headless_sim.py --cars 200 --transport batch --update-interval 5   # 200 Hz IMUs
+    python headless_sim.py --cars 10 --duration 20 --csv fleet.csv   # no server needed
+    python headless_sim.py --cars 2000 --transport batch --url http://localhost:5000,http://localhost:5001
+
+Several comma-separated --url values address the workers of `python cluster.py`;
+each car is sent to the worker that owns its vehicle_id shard. An
+--update-interval below the 50 ms physics frame oversamples every frame
+(sim_physics.FleetPhysics.oversample), like a phone IMU at 50-200 Hz.
+"""
+import argparse
+import csv
+import sys
+import threading
+import time
+
+import numpy as np
+import socketio
+
+import wire
+from cluster import shard_for
+from sim_physics import GAME_LOOP_INTERVAL_MS, MAX_SPEED, SENSOR_FIELDS, FleetPhysics
+
+FLASK_SERVER_URL = 'http://localhost:5000'
+UPDATE_INTERVAL_MS = 100
+
+# target_speed: cruise speed as a fraction of MAX_SPEED
+# steer_prob: chance per frame of starting a steering input, held for steer_hold frames
+# brake_prob: chance per frame of a hard braking input
+PROFILES = {
+    'aggressive': {'target_speed': 0.95, 'steer_prob': 0.15, 'steer_hold': 4, 'brake_prob': 0.05},
+    'normal': {'target_speed': 0.6, 'steer_prob': 0.03, 'steer_hold': 2, 'brake_prob': 0.01},
+    'slow': {'target_speed': 0.25, 'steer_prob': 0.01, 'steer_hold': 1, 'brake_prob': 0.005},
+}
+
+
+class ScriptedDrivers:
+    """Generates arrow-key inputs for every car from its profile, vectorized over cars."""
+
+    def __init__(self, profile_names, rng):
+        self.rng = rng
+        self.profile_names = list(profile_names)
+        n = len(self.profile_names)
+        params = [PROFILES[name] for name in self.profile_names]
+        self.target_speed = np.array([p['target_speed'] for p in params]) * MAX_SPEED
+        self.steer_prob = np.array([p['steer_prob'] for p in params])
+        self.steer_hold = np.array([p['steer_hold'] for p in params])
+        self.brake_prob = np.array([p['brake_prob'] for p in params])
+        self.steer_left = np.zeros(n, dtype=bool)
+        self.steer_remaining = np.zeros(n, dtype=np.int64)
+
+    def controls(self, velocity):
+        n = len(velocity)
+        draws = self.rng.random((n, 3))
+        braking = draws[:, 0] < self.brake_prob
+        up = (velocity < self.target_speed) & ~braking
+        down = braking | (velocity > self.target_speed * 1.2)
+
+        starting = (self.steer_remaining == 0) & (draws[:, 1] < self.steer_prob)
+        self.steer_left = np.where(starting, draws[:, 2] < 0.5, self.steer_left)
+        self.steer_remaining = np.where(starting, self.steer_hold, np.maximum(self.steer_remaining - 1, 0))
+        steering = self.steer_remaining > 0
+        return up, down, steering & self.steer_left, steering & ~self.steer_left
+
+
+def assign_profiles(num_cars, mix, rng):
+    """Draws a profile name per car from a {profile: weight} mix."""
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=np.float64)
+    return [names[i] for i in rng.choice(len(names), size=num_cars, p=weights / weights.sum())]
+
+
+class Fleet:
+    """Physics plus drivers; `advance()` runs one frame and returns the cars that should send samples.
+
+    `readings` holds the frame's (samples_per_frame, N, 6) sensor readings.
+    """
+
+    def __init__(self, num_cars, mix, seed=0, update_interval_ms=UPDATE_INTERVAL_MS, start_ms=None):
+        self.rng = np.random.default_rng(seed)
+        self.vehicle_ids = [f'sim-{seed}-{i:05d}' for i in range(num_cars)]
+        self.profiles = assign_profiles(num_cars, mix, self.rng)
+        self.physics = FleetPhysics(num_cars, self.rng)
+        self.drivers = ScriptedDrivers(self.profiles, self.rng)
+        self.frames_per_sample = max(1, round(update_interval_ms / GAME_LOOP_INTERVAL_MS))
+        self.samples_per_frame = max(1, round(GAME_LOOP_INTERVAL_MS / update_interval_ms))
+        self.readings = self.physics.sensors[None]
+        self.start_ms = int(time.time() * 1000) if start_ms is None else start_ms
+        self.frame = 0
+
+    @property
+    def timestamp_ms(self):
+        return self.start_ms + self.frame * GAME_LOOP_INTERVAL_MS
+
+    def advance(self):
+        """Returns (indices, timestamps_ms) of cars due to send and the frame's sample times.
+
+        indices is None on frames without a sample.
+        """
+        up, down, left, right = self.drivers.controls(self.physics.velocity)
+        sim_time = self.frame * GAME_LOOP_INTERVAL_MS / 1000
+        self.physics.step(up, down, left, right, sim_time)
+        self.frame += 1
+        k = self.samples_per_frame
+        timestamps = self.timestamp_ms - np.rint(np.arange(k - 1, -1, -1) * GAME_LOOP_INTERVAL_MS / k).astype(np.int64)
+        if self.frame % self.frames_per_sample:
+            return None, timestamps
+        if k > 1:
+            self.readings = self.physics.oversample(k, sim_time)
+        # Like the GUI simulator, only cars with a key pressed or still moving send data
+        active = up | down | left | right | (np.abs(self.physics.velocity) > 0.1)
+        return np.flatnonzero(active), timestamps
+
+
+def sensor_payloads(fleet, indices, timestamps):
+    speed = fleet.physics.speed_kmh
+    for sensors, timestamp in zip(fleet.readings, timestamps.tolist()):
+        for i in indices:
+            payload = dict(zip(SENSOR_FIELDS, sensors[i].tolist()))
+            payload['Timestamp'] = timestamp
+            payload['speed'] = float(speed[i])
+            payload['vehicle_id'] = fleet.vehicle_ids[i]
+            yield i, payload
+
+
+def shard_index(url, vehicle_ids):
+    """Splits a comma-separated --url into worker URLs; returns them with each vehicle's worker index."""
+    urls = url.split(',')
+    return urls, np.array([shard_for(vid, len(urls)) for vid in vehicle_ids], dtype=np.int64)
+
+
+class PerCarTransport:
+    """One Socket.IO client per car, like running N GUI simulators."""
+
+    def __init__(self, url, vehicle_ids):
+        urls, shards = shard_index(url, vehicle_ids)
+        self.clients = [socketio.Client(reconnection_delay_max=5) for _ in vehicle_ids]
+        self.updates_received = 0
+        self._lock = threading.Lock()
+        for client in self.clients:
+            client.on('update', self._on_update)
+        for client, shard in zip(self.clients, shards.tolist()):
+            client.connect(urls[shard], transports=['websocket'])
+
+    def _on_update(self, data):
+        with self._lock:
+            self.updates_received += 1
+
+    def send(self, fleet, indices, timestamps):
+        for i, payload in sensor_payloads(fleet, indices, timestamps):
+            self.clients[i].emit('sensor_data', payload)
+        return len(indices) * len(timestamps)
+
+    def close(self):
+        for client in self.clients:
+            client.disconnect()
+
+
+class SharedTransport(PerCarTransport):
+    """All cars multiplexed over one Socket.IO connection per worker, told apart by vehicle_id."""
+
+    def __init__(self, url, vehicle_ids):
+        urls, self.shards = shard_index(url, vehicle_ids)
+        self.clients = [socketio.Client(reconnection_delay_max=5) for _ in urls]
+        self.updates_received = 0
+        self._lock = threading.Lock()
+        for client, worker_url in zip(self.clients, urls):
+            client.on('update', self._on_update)
+            client.connect(worker_url, transports=['websocket'])
+
+    def send(self, fleet, indices, timestamps):
+        for i, payload in sensor_payloads(fleet, indices, timestamps):
+            self.clients[self.shards[i]].emit('sensor_data', payload)
+        return len(indices) * len(timestamps)
+
+
+class BatchTransport(PerCarTransport):
+    """One connection sending each tick's samples for the whole fleet as a single binary sensor_batch frame."""
+
+    def __init__(self, url, vehicle_ids):
+        urls, self.shards = shard_index(url, vehicle_ids)
+        self.clients = [socketio.Client(reconnection_delay_max=5) for _ in urls]
+        self.updates_received = 0
+        self._lock = threading.Lock()
+        for client, worker_url in zip(self.clients, urls):
+            client.on('batch_result', self._on_batch_result)
+            client.connect(worker_url, transports=['websocket'])
+
+    def _on_batch_result(self, data):
+        _, _, timestamps, _ = wire.decode_results(data['frame'])
+        with self._lock:
+            self.updates_received += len(timestamps)
+
+    def send(self, fleet, indices, timestamps):
+        shards = self.shards[indices]
+        k = len(timestamps)
+        for shard, client in enumerate(self.clients):
+            owned = indices[shards == shard] if len(self.clients) > 1 else indices
+            if not len(owned):
+                continue
+            # Each car's samples of the frame in a row, oldest first
+            values = np.empty((len(owned), k, wire.NUM_VALUES), dtype=np.float32)
+            values[:, :, :6] = fleet.readings[:, owned].transpose(1, 0, 2)
+            values[:, :, 6] = fleet.physics.speed_kmh[owned][:, None]
+            frame = wire.encode_samples(
+                [fleet.vehicle_ids[i] for i in owned],
+                np.repeat(np.arange(len(owned)), k),
+                np.tile(timestamps, len(owned)),
+                values.reshape(-1, wire.NUM_VALUES))
+            client.emit('sensor_batch', {'frame': frame})
+        return len(indices) * k
+
+
+class CsvTransport:
+    """Writes the samples to a CSV instead of a server, for reproducibility checks and offline use."""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['Timestamp', 'vehicle_id'] + SENSOR_FIELDS + ['speed'])
+        self.updates_received = 0
+
+    def send(self, fleet, indices, timestamps):
+        for _, payload in sensor_payloads(fleet, indices, timestamps):
+            self._writer.writerow([payload['Timestamp'], payload['vehicle_id']]
+                                  + [payload[f] for f in SENSOR_FIELDS] + [payload['speed']])
+        return len(indices) * len(timestamps)
+
+    def close(self):
+        self._file.close()
+
+
+TRANSPORTS = {
+    'per-car': PerCarTransport,
+    'shared': SharedTransport,
+    'batch': BatchTransport,
+}
+
+
+def run(fleet, transport, duration_s, speedup=1.0):
+    """Steps the fleet for `duration_s` simulated seconds. speedup=0 runs as fast as possible."""
+    frames = int(duration_s * 1000 / GAME_LOOP_INTERVAL_MS)
+    frame_s = GAME_LOOP_INTERVAL_MS / 1000 / speedup if speedup else 0.0
+    sent = 0
+    started = time.perf_counter()
+    for frame in range(frames):
+        indices, timestamps = fleet.advance()
+        if indices is not None and len(indices):
+            sent += transport.send(fleet, indices, timestamps)
+        if frame_s:
+            delay = started + (frame + 1) * frame_s - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return sent, time.perf_counter() - started
+
+
+def wait_for_results(transport, expected, timeout):
+    """Keeps the connections open until every sample has been answered or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while transport.updates_received < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def parse_mix(text):
+    """'aggressive=1,normal=2,slow=1' -> {'aggressive': 1.0, ...}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in PROFILES:
+            raise argparse.ArgumentTypeError(f"unknown profile '{name}' (choose from {', '.join(PROFILES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless multi-vehicle load generator.")
+    parser.add_argument('--url', default=FLASK_SERVER_URL, help="server URL, or comma-separated worker URLs")
+    parser.add_argument('--cars', type=int, default=100)
+    parser.add_argument('--profiles', type=parse_mix, default=parse_mix('aggressive=1,normal=2,slow=1'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=30, help="simulated seconds")
+    parser.add_argument('--update-interval', type=int, default=UPDATE_INTERVAL_MS, help="ms between samples; below the 50 ms physics frame each frame is oversampled")
+    parser.add_argument('--speedup', type=float, default=1.0, help="1 = real time, 0 = as fast as possible")
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='per-car')
+    parser.add_argument('--start-ms', type=int, default=None, help="timestamp of the first frame")
+    parser.add_argument('--drain', type=float, default=5.0,
+                        help="seconds to wait for outstanding results before disconnecting")
+    parser.add_argument('--csv', help="write samples to this CSV instead of streaming to the server")
+    args = parser.parse_args(argv)
+
+    fleet = Fleet(args.cars, args.profiles, args.seed, args.update_interval, args.start_ms)
+    transport = CsvTransport(args.csv) if args.csv else TRANSPORTS[args.transport](args.url, fleet.vehicle_ids)
+    try:
+        sent, elapsed = run(fleet, transport, args.duration, args.speedup)
+        if not args.csv:
+            wait_for_results(transport, sent, args.drain)
+    finally:
+        transport.close()
+    print(f"INFO: Sent {sent} samples from {args.cars} cars in {elapsed:.2f}s "
+          f"({sent / elapsed:.0f} events/s); {transport.updates_received} updates received.")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Read-only queries behind the session history API.
+
+Sessions are listed newest first with their checkpointed report aggregates.
+A session's telemetry is returned downsampled on the server: driving_log rows
+in the requested time range are grouped into fixed buckets of `resolution` ms
+aligned to the epoch, and SQLite computes each bucket's min/mean/max per
+sensor column and its sample count per risk level in one pass over the
+(session_id, timestamp) index range. An hour of 10 Hz samples (36,000 rows)
+charts as e.g. 1,800 two-second buckets, and the same bucket boundaries come
+back whatever range a dashboard pans to.
+
+Results are columnar (one list per series) to keep the JSON small.
+"""
+import json
+
+from inference import RISK_LEVELS
+
+SERIES = ('acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z', 'speed')
+
+# Automatic resolutions (ms); the finest one yielding at most `max_points` buckets is chosen
+RESOLUTIONS = (100, 250, 500, 1000, 2000, 5000, 10_000, 30_000, 60_000, 300_000, 600_000, 1_800_000, 3_600_000)
+
+
+def list_sessions(conn, vehicle_id=None, before=None, limit=50):
+    """Sessions started before `before` (epoch ms), newest first, optionally for one vehicle."""
+    clauses, params = [], []
+    if vehicle_id is not None:
+        clauses.append('s.vehicle_id = ?')
+        params.append(vehicle_id)
+    if before is not None:
+        clauses.append('s.started_at < ?')
+        params.append(before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    rows = conn.execute(f'''
+        SELECT s.id, s.vehicle_id, s.driver_name, s.started_at, s.ended_at,
+               st.sample_count, st.speed_sum, st.speed_max, st.first_ts, st.last_ts, st.dwell
+        FROM sessions s LEFT JOIN session_stats st ON st.session_id = s.id
+        {where}
+        ORDER BY s.started_at DESC, s.id DESC LIMIT ?
+    ''', (*params, limit)).fetchall()
+    return [session_summary(row) for row in rows]
+
+
+def get_session(conn, session_id):
+    row = conn.execute('''
+        SELECT s.id, s.vehicle_id, s.driver_name, s.started_at, s.ended_at,
+               st.sample_count, st.speed_sum, st.speed_max, st.first_ts, st.last_ts, st.dwell
+        FROM sessions s LEFT JOIN session_stats st ON st.session_id = s.id
+        WHERE s.id = ?
+    ''', (session_id,)).fetchone()
+    return session_summary(row) if row else None
+
+
+def session_summary(row):
+    """Session metadata and aggregates; the aggregates are None until its stats were first checkpointed."""
+    session_id, vehicle_id, driver_name, started_at, ended_at, count, speed_sum, speed_max, first_ts, last_ts, dwell = row
+    return {
+        'session_id': session_id,
+        'vehicle_id': vehicle_id,
+        'driver_name': driver_name,
+        'started_at': started_at,
+        'ended_at': ended_at,
+        'sample_count': count,
+        'first_timestamp': first_ts,
+        'last_timestamp': last_ts,
+        'duration_s': (last_ts - first_ts) / 1000 if count else None,
+        'speed_mean': speed_sum / count if count else None,
+        'speed_max': speed_max,
+        'dwell_s': json.loads(dwell) if dwell else None
+    }
+
+
+def time_range(conn, session_id):
+    """(first, last) driving_log timestamp of a session, or (None, None) if it has no rows."""
+    return conn.execute('SELECT MIN(timestamp), MAX(timestamp) FROM driving_log WHERE session_id = ?',
+                        (session_id,)).fetchone()
+
+
+def choose_resolution(start, end, max_points):
+    """Finest of RESOLUTIONS that covers [start, end) in at most `max_points` epoch-aligned buckets."""
+    span = max(0.0, end - start)
+    for resolution in RESOLUTIONS:
+        if span / resolution + 1 <= max_points:
+            return resolution
+    return int(-(-span // max(1, max_points - 1)))
+
+
+def session_telemetry(conn, session_id, start, end, resolution, risk_levels=tuple(RISK_LEVELS.values())):
+    """Bucketed series of a session's rows with start <= timestamp < end.
+
+    Each bucket is reported by its start time (a multiple of `resolution`);
+    buckets without rows are omitted.
+    """
+    stats = ', '.join(f'MIN({c}), AVG({c}), MAX({c})' for c in SERIES)
+    levels = ', '.join('SUM(risk_level = ?)' for _ in risk_levels)
+    rows = conn.execute(f'''
+        SELECT CAST(timestamp / ? AS INTEGER) AS bucket, COUNT(*), {stats}, {levels}
+        FROM driving_log
+        WHERE session_id = ? AND timestamp >= ? AND timestamp < ?
+        GROUP BY bucket ORDER BY bucket
+    ''', (resolution, *risk_levels, session_id, start, end)).fetchall()
+    columns = list(zip(*rows)) if rows else [()] * (2 + 3 * len(SERIES) + len(risk_levels))
+    result = {
+        'session_id': session_id,
+        'start': start,
+        'end': end,
+        'resolution_ms': resolution,
+        'points': len(rows),
+        'timestamp': [bucket * resolution for bucket in columns[0]],
+        'count': list(columns[1])
+    }
+    for i, name in enumerate(SERIES):
+        result[name] = {stat: list(columns[2 + 3 * i + j]) for j, stat in enumerate(('min', 'mean', 'max'))}
+    offset = 2 + 3 * len(SERIES)
+    result['risk_levels'] = {level: list(columns[offset + i]) for i, level in enumerate(risk_levels)}
+    return result
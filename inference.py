@@ -0,0 +1,108 @@
+import time
+from collections import deque
+
+import numpy as np
+
+# --- Class mapping shared by every inference path ---
+RISK_LEVELS = {
+    1: "Aggressive",
+    2: "Normal",
+    3: "Slow"
+}
+
+
+def predicted_classes(predictions):
+    """Converts a (batch, 3) softmax output into 1-based class ids."""
+    return np.argmax(predictions, axis=1) + 1
+
+
+def classify(predictions):
+    """Converts a (batch, 3) softmax output into (class id, risk label) pairs."""
+    return [(int(c), RISK_LEVELS.get(int(c), "Invalid Class")) for c in predicted_classes(predictions)]
+
+
+class BatchInferenceEngine:
+    """Collects ready LSTM windows from all clients and scores them in one forward pass per tick.
+
+    `predict_fn` takes a (batch, SEQUENCE_LENGTH, NUM_FEATURES) array and returns the
+    model output. Each submitted window carries a callback that receives
+    (predicted_class, risk_level) once its batch has been scored, or
+    (0, fallback_risk_level) if scoring failed.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait=0.01, sleep=time.sleep,
+                 fallback_risk_level="Error"):
+        self.predict_fn = predict_fn
+        self.fallback_risk_level = fallback_risk_level
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._sleep = sleep
+        self._pending = deque()
+        self._running = False
+        self.batches_run = 0
+        self.windows_scored = 0
+        self.windows_failed = 0
+
+    def submit(self, window, callback):
+        """Queues a snapshot of `window` for the next batch, so the caller may keep mutating it."""
+        self._pending.append((time.perf_counter(), np.array(window, dtype=np.float32), callback))
+
+    def pending(self):
+        return len(self._pending)
+
+    def start(self, spawn):
+        """Starts the batching loop with `spawn` (e.g. socketio.start_background_task)."""
+        if not self._running:
+            self._running = True
+            spawn(self._run)
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        while self._running:
+            if not self._pending:
+                self._sleep(self.max_wait)
+                continue
+            oldest = self._pending[0][0]
+            waited = time.perf_counter() - oldest
+            if len(self._pending) < self.max_batch_size and waited < self.max_wait:
+                self._sleep(self.max_wait - waited)
+                continue
+            self.run_once()
+
+    def run_once(self):
+        """Scores up to `max_batch_size` pending windows and dispatches their results."""
+        count = min(len(self._pending), self.max_batch_size)
+        if count == 0:
+            return 0
+        items = [self._pending.popleft() for _ in range(count)]
+        batch = np.stack([window for _, window, _ in items])
+        try:
+            results = classify(self.predict_fn(batch))
+        except Exception as e:
+            print(f"ERROR: Error during batched LSTM prediction: {e}")
+            results = [(0, self.fallback_risk_level)] * count
+            self.windows_failed += count
+        else:
+            self.windows_scored += count
+
+        self.batches_run += 1
+        for (_, _, callback), (predicted_class, risk_level) in zip(items, results):
+            try:
+                callback(predicted_class, risk_level)
+            except Exception as e:
+                print(f"ERROR: Failed to deliver prediction result: {e}")
+        return count
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'batches_run': self.batches_run,
+            'windows_scored': self.windows_scored,
+            'windows_failed': self.windows_failed,
+            'avg_batch_size': ((self.windows_scored + self.windows_failed) / self.batches_run
+                               if self.batches_run else 0.0),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
@@ -0,0 +1,151 @@
+"""Runs LSTM forward passes off the eventlet hub.
+
+A forward pass takes milliseconds of CPU; run inline in a green thread it
+stalls every other socket. The pool hands each batch to an executor and waits
+on its future, which under eventlet's monkey patching yields to the hub
+instead of blocking it.
+
+    inline   predict in the calling green thread (the original behaviour)
+    thread   eventlet.tpool native threads sharing the loaded model
+    process  a spawned process pool, each worker holding its own model copy
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+
+INFERENCE_MODES = ('inline', 'thread', 'process')
+
+
+class InferenceUnavailable(RuntimeError):
+    """The pool is saturated, timed out or failed; callers fall back instead of waiting."""
+
+
+class InlineExecutor:
+    def __init__(self, predict_fn):
+        self.predict_fn = predict_fn
+
+    def submit(self, batch):
+        future = Future()
+        try:
+            future.set_result(self.predict_fn(batch))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self):
+        pass
+
+
+class ThreadExecutor:
+    """Runs `predict_fn` in eventlet's native thread pool (size set by EVENTLET_THREADPOOL_SIZE)."""
+
+    def __init__(self, predict_fn, spawn):
+        from eventlet import tpool
+        self.predict_fn = predict_fn
+        self._execute = tpool.execute
+        self._spawn = spawn
+
+    def submit(self, batch):
+        future = Future()
+        self._spawn(self._complete, future, batch)
+        return future
+
+    def _complete(self, future, batch):
+        try:
+            future.set_result(self._execute(self.predict_fn, batch))
+        except Exception as e:
+            future.set_exception(e)
+
+    def shutdown(self):
+        pass
+
+
+_worker_model = None
+
+
+def _load_worker_model(backend, model_path):
+    global _worker_model
+    from model_backend import load_backend
+    _worker_model = load_backend(backend, model_path)
+
+
+def _predict_in_worker(batch):
+    return _worker_model.predict(batch)
+
+
+class ProcessExecutor:
+    """Scores batches in separate processes so a forward pass never competes with the hub for the GIL."""
+
+    def __init__(self, backend, model_path, workers=1):
+        # TensorFlow is not fork-safe, so workers are spawned and load the model themselves
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_load_worker_model,
+            initargs=(backend, model_path))
+
+    def submit(self, batch):
+        return self._pool.submit(_predict_in_worker, batch)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class InferencePool:
+    """Bounds in-flight forward passes and how long a caller waits for one.
+
+    A caller waits for one of `max_in_flight` slots and then for its result,
+    `timeout` seconds in total. `predict()` raises InferenceUnavailable when
+    no slot frees up in time, when the result is late, or when the executor
+    fails. A timed-out batch keeps its slot until it actually finishes, so a
+    stuck model cannot pile up unbounded work.
+    """
+
+    def __init__(self, executor, max_in_flight=4, timeout=1.0):
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def predict(self, batch):
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            self.rejected += 1
+            raise InferenceUnavailable(f"no inference slot free within {self.timeout * 1000:.0f} ms")
+        self.in_flight += 1
+        self.submitted += 1
+        future = self.executor.submit(batch)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            self.timeouts += 1
+            raise InferenceUnavailable(f"inference timed out after {self.timeout * 1000:.0f} ms")
+        except Exception as e:
+            self.errors += 1
+            raise InferenceUnavailable(f"inference failed: {e}") from e
+
+    def _release(self, future):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def stats(self):
+        return {
+            'executor': type(self.executor).__name__,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'timeout_ms': self.timeout * 1000,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'errors': self.errors
+        }
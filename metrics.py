@@ -0,0 +1,153 @@
+import time
+from bisect import bisect_left
+from collections import deque
+
+import numpy as np
+
+# Histogram bucket upper bounds in seconds: 0.1 ms doubling up to ~13 s
+DEFAULT_BUCKETS = tuple(0.0001 * 2 ** i for i in range(18))
+
+
+class LatencyRecorder:
+    """Keeps the most recent `size` latency samples (seconds) for percentile reporting."""
+
+    def __init__(self, size=10000):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        """Returns count and p50/p95/p99/max latency in milliseconds."""
+        if not self._samples:
+            return {'count': self.count, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        samples = np.fromiter(self._samples, dtype=np.float64) * 1000
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+        return {
+            'count': self.count,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': float(samples.max())
+        }
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (seconds): O(log buckets) per observation and no sample storage.
+
+    Percentiles are interpolated within a bucket, so they are exact to the
+    bucket width (a factor of 2 with the default buckets). `summary()` has the
+    same shape as LatencyRecorder's.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'p50_ms': self.quantile(0.5) * 1000,
+            'p95_ms': self.quantile(0.95) * 1000,
+            'p99_ms': self.quantile(0.99) * 1000,
+            'max_ms': self.max * 1000
+        }
+
+    def prometheus(self, name, labels=''):
+        """Sample lines of this histogram in the Prometheus text exposition format."""
+        sep = ',' if labels else ''
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class StageClock:
+    """Times the stages of one request: `lap(stage)` records the time since the previous lap."""
+
+    __slots__ = ('histograms', 'last', 'stages')
+
+    def __init__(self, histograms):
+        self.histograms = histograms
+        self.last = time.perf_counter()
+        self.stages = {}
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.record(stage, now - self.last)
+        self.last = now
+
+    def record(self, stage, seconds):
+        self.stages[stage] = seconds
+        self.histograms[stage].observe(seconds)
+
+    def echo(self):
+        """Stage times so far in milliseconds, for sending back to the client."""
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+class NullClock:
+    """StageClock stand-in used when instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+    def record(self, stage, seconds):
+        pass
+
+    def echo(self):
+        return None
+
+
+NULL_CLOCK = NullClock()
+
+
+def prometheus_text(histograms=(), counters=(), gauges=()):
+    """Renders metric families in the Prometheus text format.
+
+    histograms: (name, help, label_name, {label_value: Histogram}) tuples.
+    counters, gauges: (name, help, value) tuples.
+    """
+    lines = []
+    for name, help_text, label, by_label in histograms:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for value, histogram in by_label.items():
+            lines += histogram.prometheus(name, f'{label}="{value}"' if label else '')
+    for kind, families in (('counter', counters), ('gauge', gauges)):
+        for name, help_text, value in families:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,234 @@
+"""Interchangeable runtimes for the driving-behaviour LSTM.
+
+The model is a single 64-unit LSTM over (5, 6) windows followed by a softmax
+dense layer, small enough that loading the full Keras stack dominates startup.
+The weights are exported once from the .h5 file, with h5py and no TensorFlow,
+and then run by one of:
+
+    numpy   a hand-vectorized LSTM cell; needs only numpy
+    tflite  a TFLite interpreter (ai-edge-litert, tflite-runtime or tensorflow.lite)
+    keras   the original model via tensorflow.keras, imported only when selected
+
+Every backend exposes ``predict(batch) -> (batch, 3) probabilities``. The
+exported files are regenerated automatically when the .h5 model is newer.
+
+Usage:
+    python model_backend.py export            # models/lstm_weights.npz
+    python model_backend.py export --tflite   # also models/lstm_model.tflite (needs tensorflow)
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+MODEL_PATH = 'models/lstm_model.h5'
+BACKENDS = ('numpy', 'tflite', 'keras')
+
+
+def weights_path(model_path):
+    return os.path.join(os.path.dirname(model_path), 'lstm_weights.npz')
+
+
+def tflite_path(model_path):
+    return os.path.splitext(model_path)[0] + '.tflite'
+
+
+def features_path(model_path):
+    return os.path.splitext(model_path)[0] + '.features.json'
+
+
+def save_features(model_path, names, feature_windows, sequence_length):
+    """Records the input a model was trained on (features, samples per window) next to it, for the server."""
+    with open(features_path(model_path), 'w') as f:
+        json.dump({'features': list(names), 'feature_windows': list(feature_windows),
+                   'sequence_length': sequence_length}, f, indent=2)
+
+
+def load_features(model_path=MODEL_PATH):
+    """(feature names, feature windows, sequence length) recorded for a model, or None if it has no features file.
+
+    Files written before the sequence length was recorded get the original 5 samples.
+    """
+    path = features_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        spec = json.load(f)
+    return list(spec['features']), tuple(spec['feature_windows']), int(spec.get('sequence_length', 5))
+
+
+def _is_stale(derived, model_path):
+    return not os.path.exists(derived) or os.path.getmtime(derived) < os.path.getmtime(model_path)
+
+
+def _quiet_tensorflow():
+    os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '0')
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+
+# --- Export ---
+def _find_dataset(group, name):
+    found = []
+    group.visititems(lambda path, obj: found.append(obj) if path.endswith(name) else None)
+    if len(found) != 1:
+        raise ValueError(f"expected one '{name}' weight in {group.name}, found {len(found)}")
+    return found[0][()]
+
+
+def export_weights(model_path=MODEL_PATH, output=None):
+    """Copies the LSTM and dense weights out of a Keras .h5 file into an .npz."""
+    import h5py
+
+    output = output or weights_path(model_path)
+    with h5py.File(model_path, 'r') as f:
+        layers = json.loads(f.attrs['model_config'])['config']['layers']
+        lstm = next(l['config'] for l in layers if l['class_name'] == 'LSTM')
+        dense = next(l['config'] for l in layers if l['class_name'] == 'Dense')
+        expected = {'activation': 'tanh', 'recurrent_activation': 'sigmoid', 'return_sequences': False,
+                    'go_backwards': False}
+        for key, value in expected.items():
+            if lstm.get(key, value) != value:
+                raise ValueError(f"unsupported LSTM {key}={lstm[key]!r}")
+        if dense['activation'] != 'softmax':
+            raise ValueError(f"unsupported dense activation {dense['activation']!r}")
+
+        weights = f['model_weights']
+        np.savez(
+            output,
+            kernel=_find_dataset(weights['lstm'], 'lstm_cell/kernel'),
+            recurrent_kernel=_find_dataset(weights['lstm'], 'lstm_cell/recurrent_kernel'),
+            bias=_find_dataset(weights['lstm'], 'lstm_cell/bias'),
+            dense_kernel=_find_dataset(weights['dense'], 'dense/kernel'),
+            dense_bias=_find_dataset(weights['dense'], 'dense/bias'))
+    return output
+
+
+def export_tflite(model_path=MODEL_PATH, output=None):
+    """Converts the Keras model to a TFLite flatbuffer. Needs tensorflow, only at export time."""
+    _quiet_tensorflow()
+    import tensorflow as tf
+
+    output = output or tflite_path(model_path)
+    trained = tf.keras.models.load_model(model_path)
+    # Unrolling the 5 timesteps keeps the graph to builtin ops (no TensorList while loop)
+    config = trained.get_config()
+    for layer in config['layers']:
+        if layer['class_name'] == 'LSTM':
+            layer['config']['unroll'] = True
+    model = tf.keras.Sequential.from_config(config)
+    model.set_weights(trained.get_weights())
+
+    flatbuffer = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    with open(output, 'wb') as f:
+        f.write(flatbuffer)
+    return output
+
+
+# --- Backends ---
+class NumpyBackend:
+    """Keras-compatible LSTM forward pass (gate order i, f, c, o) over a whole batch at once."""
+
+    def __init__(self, model_path=MODEL_PATH):
+        path = weights_path(model_path)
+        if _is_stale(path, model_path):
+            export_weights(model_path, path)
+        with np.load(path) as w:
+            self.kernel = w['kernel'].astype(np.float32)
+            self.recurrent_kernel = w['recurrent_kernel'].astype(np.float32)
+            self.bias = w['bias'].astype(np.float32)
+            self.dense_kernel = w['dense_kernel'].astype(np.float32)
+            self.dense_bias = w['dense_bias'].astype(np.float32)
+        self.units = self.recurrent_kernel.shape[0]
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        n, steps, _ = batch.shape
+        units = self.units
+        # Input projections for every timestep in one matmul; only the recurrent part is sequential
+        projected = batch @ self.kernel + self.bias
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        for t in range(steps):
+            z = projected[:, t] + h @ self.recurrent_kernel
+            gates = 1.0 / (1.0 + np.exp(-z[:, :2 * units]))
+            i, f = gates[:, :units], gates[:, units:]
+            o = 1.0 / (1.0 + np.exp(-z[:, 3 * units:]))
+            c = f * c + i * np.tanh(z[:, 2 * units:3 * units])
+            h = o * np.tanh(c)
+        logits = h @ self.dense_kernel + self.dense_bias
+        logits -= logits.max(axis=1, keepdims=True)
+        e = np.exp(logits)
+        return e / e.sum(axis=1, keepdims=True)
+
+
+def _tflite_interpreter(path):
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            _quiet_tensorflow()
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path)
+
+
+class TFLiteBackend:
+    def __init__(self, model_path=MODEL_PATH):
+        path = tflite_path(model_path)
+        if _is_stale(path, model_path):
+            export_tflite(model_path, path)
+        self.interpreter = _tflite_interpreter(path)
+        self._input = self.interpreter.get_input_details()[0]['index']
+        self._output = self.interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if len(batch) != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input, batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(batch)
+        self.interpreter.set_tensor(self._input, batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output).copy()
+
+
+class KerasBackend:
+    def __init__(self, model_path=MODEL_PATH):
+        _quiet_tensorflow()
+        from tensorflow.keras.models import load_model
+        self.model = load_model(model_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+def load_backend(name, model_path=MODEL_PATH):
+    """Returns a loaded backend by name ('numpy', 'tflite' or 'keras')."""
+    if name == 'numpy':
+        return NumpyBackend(model_path)
+    if name == 'tflite':
+        return TFLiteBackend(model_path)
+    if name == 'keras':
+        return KerasBackend(model_path)
+    raise ValueError(f"unknown model backend '{name}' (choose from {', '.join(BACKENDS)})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the LSTM for the lightweight backends.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help="write lstm_weights.npz next to the .h5 model")
+    export.add_argument('--model', default=MODEL_PATH)
+    export.add_argument('--tflite', action='store_true', help="also convert to .tflite (needs tensorflow)")
+    args = parser.parse_args(argv)
+
+    print(f"INFO: Wrote {export_weights(args.model)}")
+    if args.tflite:
+        print(f"INFO: Wrote {export_tflite(args.model)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,14 @@ import sqlite3
 conn = sqlite3.connect('instance/driving_behavior.db')
 cur = conn.cursor()
 
-cur.execute("SELECT * FROM driving_log ORDER BY timestamp DESC LIMIT 20")
+# Latest session only, served from the (session_id, timestamp) index
+cur.execute("""
+    SELECT * FROM driving_log
+    WHERE session_id = (SELECT MAX(id) FROM sessions)
+    ORDER BY timestamp DESC LIMIT 20
+""")
 rows = cur.fetchall()
 
 print("Last 20 predictions:")
 for r in rows:
-    print(r)
\ No newline at end of file
+    print(r)
@@ -0,0 +1,127 @@
+"""Skips LSTM passes for windows the model has effectively already seen.
+
+PredictionCache memoizes model outputs keyed on the window quantized to
+`resolution`, so windows that round to the same grid share one forward pass.
+ChangeGate reuses a vehicle's previous class while its window stays within
+`threshold` (max absolute difference) of the last window that was actually
+scored. Both trade exactness for fewer passes; resolution/threshold bound how
+far an input may move before it is scored again.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """LRU cache in front of a batch `predict_fn` returning (batch, classes) outputs."""
+
+    def __init__(self, predict_fn, capacity=4096, resolution=0.05):
+        self.predict_fn = predict_fn
+        self.capacity = capacity
+        self.resolution = resolution
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def keys(self, batch):
+        quantized = np.rint(np.asarray(batch, dtype=np.float32) / self.resolution).astype(np.int32)
+        quantized = np.ascontiguousarray(quantized.reshape(len(quantized), -1))
+        return quantized.view(np.dtype((np.void, quantized.shape[1] * 4))).ravel().tolist()
+
+    def predict(self, batch):
+        if self.capacity <= 0:
+            return self.predict_fn(batch)
+        keys = self.keys(batch)
+        results = [self._entries.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        for key, result in zip(keys, results):
+            if result is not None:
+                self._entries.move_to_end(key)
+
+        if missing:
+            # Identical keys within one batch are scored once
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], i)
+            outputs = np.asarray(self.predict_fn(np.asarray(batch)[list(unique.values())]))
+            for key, output in zip(unique, outputs):
+                self._entries[key] = output
+            for i in missing:
+                results[i] = self._entries[keys[i]]
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return np.stack(results)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'resolution': self.resolution,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0
+        }
+
+
+class ChangeGate:
+    """Reuses a window's last class while the input barely changes. threshold <= 0 disables it.
+
+    The reference is stored on the RingWindow (`last_scored`, `last_class`), so
+    it is dropped together with the window when its client disconnects.
+    """
+
+    def __init__(self, threshold=0.0):
+        self.threshold = threshold
+        self.reused = 0
+        self.checked = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def matches(self, ring, windows):
+        """Boolean mask over a (n, length, features) stack of consecutive windows: True where the class of
+        the last scored window can be reused.
+
+        The windows are taken in order and every one that is not reused becomes
+        the reference for those after it, as if each were scored before the
+        next arrived, so a frame of windows gets the same mask as the windows
+        one by one.
+        """
+        mask = np.zeros(len(windows), dtype=bool)
+        if not self.enabled:
+            return mask
+        reference = ring.last_scored if ring.last_class is not None else None
+        for i, window in enumerate(windows):
+            if reference is not None and np.abs(window - reference).max() < self.threshold:
+                mask[i] = True
+            else:
+                reference = window
+        self.checked += len(windows)
+        self.reused += int(mask.sum())
+        return mask
+
+    def reuse(self, ring):
+        """Returns the class to reuse for the ring's current window, or None if it must be scored."""
+        if self.matches(ring, ring.view()[np.newaxis])[0]:
+            return ring.last_class
+        return None
+
+    def record(self, ring, window, predicted_class):
+        if self.enabled:
+            ring.last_scored = np.array(window, dtype=np.float32)
+            ring.last_class = predicted_class
+
+    def stats(self):
+        return {
+            'threshold': self.threshold,
+            'checked': self.checked,
+            'reused': self.reused,
+            'reuse_rate': (self.reused / self.checked) if self.checked else 0.0
+        }
@@ -0,0 +1,180 @@
+"""Puts each vehicle's samples back into Timestamp order before they reach its window.
+
+Samples wait in a per-vehicle min-heap (ReorderBuffer) until the vehicle's
+newest timestamp is `lateness` ms past theirs, or until the vehicle has sent
+nothing for `lateness` ms of wall time, and are then released oldest first.
+A sample at or behind the last released timestamp can no longer be placed: it
+is dropped as a duplicate if its timestamp was already seen, otherwise as late.
+At most `max_pending` samples wait per vehicle; beyond that the oldest one is
+released early. A released sample more than `gap` ms after its predecessor is
+flagged so the caller starts a fresh window instead of mixing samples across
+the gap. Every accepted sample costs one heap push and one pop, O(log pending).
+
+With lateness=0 nothing waits: in-order samples pass straight through and
+out-of-order ones are dropped.
+"""
+import heapq
+import itertools
+import time
+
+import numpy as np
+
+# predicted_class reported in batch_result frames for samples dropped as late or duplicate
+DROPPED = -1
+
+
+class ReorderBuffer:
+    """One vehicle's pending samples and release position."""
+
+    __slots__ = ('heap', 'pending', 'newest', 'released', 'last_arrival')
+
+    def __init__(self):
+        self.heap = []
+        self.pending = set()
+        self.newest = None
+        self.released = None  # timestamp of the last released sample
+        self.last_arrival = 0.0
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class Reorderer:
+    """Reorder policy and counters shared by every vehicle's ReorderBuffer. Times are in ms."""
+
+    def __init__(self, lateness=0.0, gap=0.0, max_pending=64, clock=time.monotonic):
+        self.lateness = lateness
+        self.gap = gap
+        self.max_pending = max(1, max_pending)
+        self._clock = clock
+        self._seq = itertools.count()  # tie-breaker so heap entries never compare their items
+        self.accepted = 0
+        self.late = 0
+        self.duplicates = 0
+        self.forced = 0
+        self.gaps = 0
+        self.discarded = 0
+        self.pending = 0
+
+    def offer(self, buffer, timestamp, item):
+        """Adds one sample; returns the (timestamp, item, gap) entries released by it, in order.
+
+        The result is empty when the sample has to wait, and None when it was
+        dropped as late or duplicate.
+        """
+        if timestamp == buffer.released or timestamp in buffer.pending:
+            self.duplicates += 1
+            return None
+        if buffer.released is not None and timestamp < buffer.released:
+            self.late += 1
+            return None
+        self.accepted += 1
+        buffer.last_arrival = self._clock()
+        if buffer.newest is None or timestamp > buffer.newest:
+            buffer.newest = timestamp
+        if self.lateness <= 0 and not buffer.heap:
+            return [self._release(buffer, timestamp, item)]
+
+        heapq.heappush(buffer.heap, (timestamp, next(self._seq), item))
+        buffer.pending.add(timestamp)
+        self.pending += 1
+        watermark = buffer.newest - self.lateness
+        released = []
+        while buffer.heap and (buffer.heap[0][0] <= watermark or len(buffer.heap) > self.max_pending):
+            if buffer.heap[0][0] > watermark:
+                self.forced += 1
+            released.append(self._pop(buffer))
+        return released
+
+    def expire(self, buffer):
+        """Releases everything a vehicle that went quiet for `lateness` ms is still holding back."""
+        if not buffer.heap or (self._clock() - buffer.last_arrival) * 1000 < self.lateness:
+            return []
+        return self.flush(buffer)
+
+    def flush(self, buffer):
+        """Releases all pending samples now, in timestamp order."""
+        return [self._pop(buffer) for _ in range(len(buffer.heap))]
+
+    def discard(self, buffer):
+        """Forgets the pending samples of a vehicle whose session ends."""
+        self.discarded += len(buffer.heap)
+        self.pending -= len(buffer.heap)
+        buffer.heap.clear()
+        buffer.pending.clear()
+
+    def order_batch(self, buffers, vehicle_index, timestamps):
+        """Batch counterpart of offer() for a sensor_batch frame; `buffers[v]` belongs to vehicle index v.
+
+        Sorts every vehicle's samples by timestamp and drops late and duplicate
+        ones without holding any back (a frame is answered in full); flush() the
+        buffers first if sensor_data samples may be pending. Returns (kept, gaps):
+        frame rows grouped by vehicle in timestamp order, and a mask over them
+        marking gap starts.
+        """
+        vehicle_index = np.asarray(vehicle_index)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        order = np.lexsort((timestamps, vehicle_index))
+        vehicles, ordered = vehicle_index[order], timestamps[order]
+        # Previous timestamp of each row's vehicle: the row before it, or the vehicle's last released one
+        none = np.iinfo(np.int64).min
+        released = np.array([none if b is None or b.released is None else b.released for b in buffers],
+                            dtype=np.int64)
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = vehicles[1:] != vehicles[:-1]
+        previous = np.empty_like(ordered)
+        previous[1:] = ordered[:-1]
+        previous[first] = released[vehicles[first]]
+        duplicate = ordered == previous
+        late = ordered < released[vehicles]
+        keep = ~(duplicate | late)
+        self.duplicates += int(duplicate.sum())
+        self.late += int((late & ~duplicate).sum())
+        kept, vehicles, ordered = order[keep], vehicles[keep], ordered[keep]
+        self.accepted += len(kept)
+
+        first = np.ones(len(kept), dtype=bool)
+        first[1:] = vehicles[1:] != vehicles[:-1]
+        gaps = np.zeros(len(kept), dtype=bool)
+        if self.gap > 0 and len(kept):
+            previous = np.empty_like(ordered)
+            previous[1:] = ordered[:-1]
+            previous[first] = released[vehicles[first]]
+            previous[previous == none] = ordered[previous == none]
+            gaps = ordered - previous > self.gap
+            self.gaps += int(gaps.sum())
+        now = self._clock()
+        last = np.append(first[1:], True) if len(kept) else first
+        for vehicle, timestamp in zip(vehicles[last].tolist(), ordered[last].tolist()):
+            buffer = buffers[vehicle]
+            buffer.released = timestamp
+            buffer.newest = timestamp if buffer.newest is None else max(buffer.newest, timestamp)
+            buffer.last_arrival = now
+        return kept, gaps
+
+    def _pop(self, buffer):
+        timestamp, _, item = heapq.heappop(buffer.heap)
+        buffer.pending.discard(timestamp)
+        self.pending -= 1
+        return self._release(buffer, timestamp, item)
+
+    def _release(self, buffer, timestamp, item):
+        gap = self.gap > 0 and buffer.released is not None and timestamp - buffer.released > self.gap
+        if gap:
+            self.gaps += 1
+        buffer.released = timestamp
+        return timestamp, item, gap
+
+    def stats(self):
+        return {
+            'lateness_ms': self.lateness,
+            'gap_ms': self.gap,
+            'max_pending': self.max_pending,
+            'accepted': self.accepted,
+            'late': self.late,
+            'duplicates': self.duplicates,
+            'forced': self.forced,
+            'gaps': self.gaps,
+            'discarded': self.discarded,
+            'pending': self.pending
+        }
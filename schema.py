@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import time
+
+# Bumped whenever a migration is appended to MIGRATIONS.
+# The applied version is stored in SQLite's PRAGMA user_version.
+SCHEMA_VERSION = 3
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _migrate_v1(conn):
+    """Session-partitioned driving_log with (session_id, timestamp) range indexes."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS driving_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp REAL,
+            acc_x REAL,
+            acc_y REAL,
+            acc_z REAL,
+            gyro_x REAL,
+            gyro_y REAL,
+            gyro_z REAL,
+            speed REAL,
+            predicted_class INTEGER,
+            risk_level TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vehicle_id TEXT,
+            driver_name TEXT,
+            started_at REAL,
+            ended_at REAL
+        )
+    ''')
+
+    columns = _columns(conn, 'driving_log')
+    if 'session_id' not in columns:
+        conn.execute('ALTER TABLE driving_log ADD COLUMN session_id INTEGER REFERENCES sessions(id)')
+    if 'vehicle_id' not in columns:
+        conn.execute('ALTER TABLE driving_log ADD COLUMN vehicle_id TEXT')
+
+    # Rows logged before sessions existed are kept together in one legacy session
+    legacy = conn.execute('SELECT MIN(timestamp), MAX(timestamp) FROM driving_log WHERE session_id IS NULL').fetchone()
+    if legacy[0] is not None:
+        cursor = conn.execute(
+            'INSERT INTO sessions (vehicle_id, driver_name, started_at, ended_at) VALUES (?, ?, ?, ?)',
+            ('legacy', None, legacy[0], legacy[1]))
+        conn.execute('UPDATE driving_log SET session_id = ? WHERE session_id IS NULL', (cursor.lastrowid,))
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_driving_log_session_ts ON driving_log (session_id, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_driving_log_vehicle_ts ON driving_log (vehicle_id, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_vehicle ON sessions (vehicle_id, started_at)')
+
+
+def _migrate_v2(conn):
+    """Checkpoint table for the running per-session report aggregates."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_stats (
+            session_id INTEGER PRIMARY KEY REFERENCES sessions(id),
+            sample_count INTEGER,
+            speed_sum REAL,
+            speed_max REAL,
+            first_ts REAL,
+            last_ts REAL,
+            dwell TEXT,
+            updated_at REAL
+        )
+    ''')
+
+
+def _migrate_v3(conn):
+    """Marks the driving_log rows that start a segment after a gap, for replaying session_stats."""
+    if 'gap' not in _columns(conn, 'driving_log'):
+        conn.execute('ALTER TABLE driving_log ADD COLUMN gap INTEGER NOT NULL DEFAULT 0')
+
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+]
+
+
+def apply_migrations(conn):
+    """Applies every migration newer than the database's user_version. Returns the final version."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, migrate in MIGRATIONS:
+        if version < target:
+            with conn:
+                migrate(conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+            version = target
+    return version
+
+
+def init_db(database):
+    """Creates the database file if needed and brings its schema up to SCHEMA_VERSION."""
+    os.makedirs(os.path.dirname(database) or '.', exist_ok=True)
+    conn = sqlite3.connect(database)
+    try:
+        return apply_migrations(conn)
+    finally:
+        conn.close()
+
+
+def start_session(conn, vehicle_id=None, driver_name=None, started_at=None):
+    """Opens a new session row and returns its id."""
+    started_at = time.time() * 1000 if started_at is None else started_at
+    with conn:
+        cursor = conn.execute(
+            'INSERT INTO sessions (vehicle_id, driver_name, started_at) VALUES (?, ?, ?)',
+            (vehicle_id, driver_name, started_at))
+    return cursor.lastrowid
+
+
+def end_session(conn, session_id, ended_at=None):
+    ended_at = time.time() * 1000 if ended_at is None else ended_at
+    with conn:
+        conn.execute('UPDATE sessions SET ended_at = ? WHERE id = ? AND ended_at IS NULL', (ended_at, session_id))
+
+
+def latest_session(conn, vehicle_id):
+    """Id of the vehicle's most recently started session, or None."""
+    row = conn.execute('SELECT id FROM sessions WHERE vehicle_id = ? ORDER BY started_at DESC, id DESC LIMIT 1',
+                       (vehicle_id,)).fetchone()
+    return row[0] if row else None
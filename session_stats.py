@@ -0,0 +1,132 @@
+import json
+import time
+from datetime import datetime, timezone
+
+UPSERT_SESSION_STATS = '''
+    INSERT INTO session_stats
+        (session_id, sample_count, speed_sum, speed_max, first_ts, last_ts, dwell, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        sample_count = excluded.sample_count, speed_sum = excluded.speed_sum,
+        speed_max = excluded.speed_max, first_ts = excluded.first_ts, last_ts = excluded.last_ts,
+        dwell = excluded.dwell, updated_at = excluded.updated_at
+'''
+
+
+class SessionStats:
+    """Running aggregates for one driving session, updated once per classified sample.
+
+    Matches the original pandas report: each sample's duration is the gap to the
+    previous sample and is credited to the sample's own risk level.
+    """
+
+    __slots__ = ('session_id', 'count', 'speed_sum', 'speed_max', 'first_ts', 'last_ts', 'dwell', 'dirty')
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.count = 0
+        self.speed_sum = 0.0
+        self.speed_max = None
+        self.first_ts = None
+        self.last_ts = None
+        self.dwell = {}
+        self.dirty = False
+
+    def update(self, timestamp, speed, risk_level, gap=False):
+        """Adds one sample. `timestamp` is in milliseconds.
+
+        A sample after a gap, or one completing behind a newer sample (its
+        inference finished after a gated or still-collecting successor), is
+        credited no duration.
+        """
+        duration = 0.0
+        if self.count == 0:
+            self.first_ts = self.last_ts = timestamp
+        elif timestamp > self.last_ts:
+            if not gap:
+                duration = (timestamp - self.last_ts) / 1000
+            self.last_ts = timestamp
+        self.count += 1
+        self.speed_sum += speed
+        if self.speed_max is None or speed > self.speed_max:
+            self.speed_max = speed
+        self.dwell[risk_level] = self.dwell.get(risk_level, 0.0) + duration
+        self.dirty = True
+
+    @property
+    def total_duration(self):
+        return (self.last_ts - self.first_ts) / 1000 if self.count else 0.0
+
+    @property
+    def aggressive_time(self):
+        return self.dwell.get('Aggressive', 0.0)
+
+    @property
+    def safety_score(self):
+        total_duration = self.total_duration
+        return max(0, 100 - (self.aggressive_time / total_duration * 100)) if total_duration > 0 else 100
+
+    def render_report(self, driver_name):
+        if self.count < 2:
+            return "Not enough driving data recorded for a report."
+
+        def fmt(ts):
+            return datetime.fromtimestamp(ts / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+        report_parts = [
+            "=== DRIVING BEHAVIOR ANALYSIS REPORT ===",
+            f"\nDriver: {driver_name}",
+            f"Session Start: {fmt(self.first_ts)}",
+            f"Session End: {fmt(self.last_ts)}",
+            f"Duration: {self.total_duration:.2f} seconds",
+            f"\n--- Speed Statistics ---",
+            f"Average Speed: {self.speed_sum / self.count:.2f} km/h",
+            f"Maximum Speed: {self.speed_max:.2f} km/h",
+            f"\n--- Behavior Summary ---"
+        ]
+
+        total_behavior_time = sum(self.dwell.values())
+        for behavior, duration in sorted(self.dwell.items()):
+            percentage = (duration / total_behavior_time * 100) if total_behavior_time > 0 else 0
+            report_parts.append(
+                f"{behavior}: {duration:.2f}s ({percentage:.1f}%)"
+            )
+
+        report_parts.extend([
+            f"\n--- Safety Evaluation ---",
+            f"Safety Score: {self.safety_score:.1f}/100",
+            f"\n=== END OF REPORT ==="
+        ])
+        return "\n".join(report_parts)
+
+    # --- SQLite checkpointing ---
+    def checkpoint(self, conn):
+        """Upserts the aggregates into session_stats. The caller commits."""
+        conn.execute(UPSERT_SESSION_STATS, self.checkpoint_row())
+        self.dirty = False
+
+    def checkpoint_row(self):
+        """Parameters of UPSERT_SESSION_STATS for the current aggregates, for a writer in another process."""
+        return (self.session_id, self.count, self.speed_sum, self.speed_max, self.first_ts, self.last_ts,
+                json.dumps(self.dwell), time.time() * 1000)
+
+    @classmethod
+    def load(cls, conn, session_id):
+        """Restores a session from its last checkpoint and replays any rows logged after it."""
+        stats = cls(session_id)
+        row = conn.execute('''
+            SELECT sample_count, speed_sum, speed_max, first_ts, last_ts, dwell
+            FROM session_stats WHERE session_id = ?
+        ''', (session_id,)).fetchone()
+        if row is not None:
+            stats.count, stats.speed_sum, stats.speed_max, stats.first_ts, stats.last_ts = row[:5]
+            stats.dwell = json.loads(row[5])
+
+        after = stats.last_ts if stats.count else float('-inf')
+        for timestamp, speed, risk_level, gap in conn.execute('''
+            SELECT timestamp, speed, risk_level, gap FROM driving_log
+            WHERE session_id = ? AND timestamp > ?
+            ORDER BY timestamp ASC
+        ''', (session_id, after)):
+            stats.update(timestamp, speed, risk_level, gap)
+        return stats
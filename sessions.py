@@ -0,0 +1,138 @@
+import time
+from datetime import datetime
+
+from reorder import ReorderBuffer
+from session_stats import SessionStats
+from window_store import RingWindow
+
+
+class DriverSession:
+    """Live state of one vehicle's driving session: reorder buffer, LSTM window, report aggregates and activity times."""
+
+    __slots__ = ('vehicle_id', 'session_id', 'sid', 'reorder', 'window', 'stats', 'last_result', 'started_at',
+                 'archive_name', 'last_seen')
+
+    def __init__(self, vehicle_id, session_id, sid, window, now):
+        self.vehicle_id = vehicle_id
+        self.session_id = session_id
+        self.sid = sid
+        self.reorder = ReorderBuffer()
+        self.window = window
+        self.stats = SessionStats(session_id)
+        # (predicted_class, risk_level) of the newest sample that reached the model; samples the
+        # decimator drops are stored with it
+        self.last_result = (0, "Collecting Data")
+        self.started_at = datetime.now()
+        # raw archive directory; the start time keeps apart sessions of other databases that reuse the id
+        self.archive_name = f'session_{session_id:06d}_{self.started_at:%Y%m%d-%H%M%S-%f}'
+        self.last_seen = now
+
+
+class SessionRegistry:
+    """Open driving sessions keyed by vehicle id, with SID and session-id indexes.
+
+    Clients that send no vehicle_id are keyed by their SID. Every lookup is a
+    dict access; `idle()` is the only scan and runs from the maintenance loop.
+    The registry only tracks memory: opening and closing the `sessions` rows
+    is left to the caller.
+    """
+
+    def __init__(self, length, num_features, idle_timeout=300.0, clock=time.monotonic):
+        self.length = length
+        self.num_features = num_features
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._by_vehicle = {}
+        self._by_session = {}
+        self._by_sid = {}
+        self.opened = 0
+        self.closed = 0
+
+    def get(self, vehicle_id):
+        return self._by_vehicle.get(vehicle_id)
+
+    def by_session_id(self, session_id):
+        return self._by_session.get(session_id)
+
+    def for_sid(self, sid):
+        """Sessions currently fed by `sid`, oldest first."""
+        return list(self._by_sid.get(sid, {}).values())
+
+    def touch(self, sid, vehicle_id):
+        """Returns the open session for `vehicle_id` (None if there is none), marking it active and fed by `sid`."""
+        session = self._by_vehicle.get(vehicle_id)
+        if session is not None:
+            session.last_seen = self._clock()
+            if session.sid != sid:
+                self._unbind(session)
+                self._bind(session, sid)
+        return session
+
+    def add(self, sid, vehicle_id, session_id):
+        """Registers a newly started session, replacing any open session of the same vehicle."""
+        previous = self._by_vehicle.get(vehicle_id)
+        if previous is not None:
+            self.remove(previous)
+        session = DriverSession(vehicle_id, session_id, None, RingWindow(self.length, self.num_features),
+                                self._clock())
+        self._by_vehicle[vehicle_id] = session
+        self._by_session[session_id] = session
+        self._bind(session, sid)
+        self.opened += 1
+        return session
+
+    def remove(self, session):
+        if self._by_vehicle.get(session.vehicle_id) is session:
+            del self._by_vehicle[session.vehicle_id]
+            self._by_session.pop(session.session_id, None)
+            self._unbind(session)
+            self.closed += 1
+
+    def find(self, sid, vehicle_id=None):
+        """Session a request refers to: the named vehicle's, else the newest one `sid` feeds, else the most recently active."""
+        if vehicle_id:
+            return self._by_vehicle.get(vehicle_id)
+        owned = self._by_sid.get(sid)
+        if owned:
+            return next(reversed(owned.values()))
+        return max(self._by_vehicle.values(), key=lambda s: s.last_seen, default=None)
+
+    def idle(self):
+        """Sessions that have not received a sample for `idle_timeout` seconds."""
+        cutoff = self._clock() - self.idle_timeout
+        return [session for session in self._by_vehicle.values() if session.last_seen < cutoff]
+
+    def detach(self, sid):
+        """Forgets a disconnected SID; returns the sessions it was feeding, which stay open until idle."""
+        owned = self._by_sid.pop(sid, {})
+        for session in owned.values():
+            session.sid = None
+        return list(owned.values())
+
+    def _bind(self, session, sid):
+        session.sid = sid
+        if sid is not None:
+            self._by_sid.setdefault(sid, {})[session.vehicle_id] = session
+
+    def _unbind(self, session):
+        owned = self._by_sid.get(session.sid)
+        if owned is not None:
+            owned.pop(session.vehicle_id, None)
+            if not owned:
+                del self._by_sid[session.sid]
+        session.sid = None
+
+    def __len__(self):
+        return len(self._by_vehicle)
+
+    def __iter__(self):
+        return iter(list(self._by_vehicle.values()))
+
+    def stats(self):
+        return {
+            'open': len(self._by_vehicle),
+            'clients': len(self._by_sid),
+            'opened': self.opened,
+            'closed': self.closed,
+            'idle_timeout_s': self.idle_timeout
+        }
@@ -0,0 +1,138 @@
+import numpy as np
+
+# --- Simulator Constants ---
+CANVAS_WIDTH = 1000
+CANVAS_HEIGHT = 700
+CAR_WIDTH = 60
+CAR_HEIGHT = 100
+GAME_LOOP_INTERVAL_MS = 50  # ~20 FPS
+
+# --- Physics Parameters ---
+MAX_SPEED_KPH = 160  # Maximum speed in km/h
+MAX_SPEED = (MAX_SPEED_KPH / 3.6) * (GAME_LOOP_INTERVAL_MS / 1000)  # Convert to pixels/frame
+ACCELERATION_RATE = 0.15  # pixels/frame²
+BRAKING_RATE = 0.5  # pixels/frame²
+FRICTION = 0.97  # velocity multiplier per frame
+STEER_RATE = 2.0  # degrees/frame
+MAX_STEER_ANGLE = 30.0  # degrees
+MIN_SPEED = -10.0  # Reverse speed limit
+
+# --- Road Parameters ---
+ROAD_WIDTH = 600
+LANE_WIDTH = ROAD_WIDTH / 3
+ROAD_CENTER_X = CANVAS_WIDTH / 2
+DASH_LENGTH = 20
+DASH_GAP = 40
+STRIPE_WIDTH = 3
+
+# --- Sensor Parameters (Mobile Phone in Car) ---
+PHONE_MOUNT_ANGLE = 15  # degrees tilt from vertical
+ACCEL_TO_SENSOR_SCALE = 1.5  # Convert physics to G-forces
+GYRO_TO_SENSOR_SCALE = 0.15  # Convert physics to deg/s
+
+SENSOR_FIELDS = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ']
+
+
+class FleetPhysics:
+    """The simulator's game_loop physics and calculate_sensor_data, vectorized over N cars.
+
+    Each call to `step()` advances every car by one GAME_LOOP_INTERVAL_MS frame.
+    `sensors` is an (N, 6) array in SENSOR_FIELDS order; `oversample()` gives
+    several readings per frame for sensor rates above the frame rate.
+    """
+
+    def __init__(self, num_cars, rng=None):
+        self.num_cars = num_cars
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.x = np.full(num_cars, CANVAS_WIDTH / 2)
+        self.y = np.full(num_cars, CANVAS_HEIGHT - 100.0)
+        self.velocity = np.zeros(num_cars)
+        self.angle_deg = np.zeros(num_cars)
+        self.steer_deg = np.zeros(num_cars)
+        self.prev_vx = np.zeros(num_cars)
+        self.prev_vy = np.zeros(num_cars)
+        self.sensors = np.zeros((num_cars, 6))
+        self.signal = np.zeros((num_cars, 6))
+        self.signal[:, 2] = 1.0
+        self.prev_signal = self.signal
+        self.vibrating = np.zeros(num_cars, dtype=bool)
+
+    @property
+    def speed_kmh(self):
+        return np.abs(self.velocity) * (1000 / GAME_LOOP_INTERVAL_MS) * 3.6
+
+    def step(self, up, down, left, right, sim_time):
+        """Advances one frame. Controls are boolean arrays; `sim_time` (s) drives the road vibration."""
+        v = self.velocity
+        v = np.where(up, np.minimum(v + ACCELERATION_RATE, MAX_SPEED), v)
+        v = np.where(down, np.maximum(v - BRAKING_RATE, MIN_SPEED), v)
+        v = v * FRICTION
+        v[np.abs(v) < 0.1] = 0
+        self.velocity = v
+
+        steer_step = STEER_RATE * (1 - v / MAX_SPEED * 0.7)
+        self.steer_deg = np.where(
+            left, np.minimum(MAX_STEER_ANGLE, self.steer_deg + steer_step),
+            np.where(right, np.maximum(-MAX_STEER_ANGLE, self.steer_deg - steer_step), self.steer_deg * 0.7))
+
+        turning = np.abs(v) > 0.5
+        turn_factor = 1.0 - (0.7 * np.abs(v) / MAX_SPEED)
+        self.angle_deg = self.angle_deg + np.where(turning, self.steer_deg * v * 0.03 * turn_factor, 0.0)
+
+        angle_rad = np.radians(self.angle_deg)
+        self.x = np.clip(self.x + v * np.cos(angle_rad),
+                         ROAD_CENTER_X - ROAD_WIDTH / 2 + CAR_WIDTH / 2,
+                         ROAD_CENTER_X + ROAD_WIDTH / 2 - CAR_WIDTH / 2)
+        self.y = np.clip(self.y + v * np.sin(angle_rad), CAR_HEIGHT / 2, CANVAS_HEIGHT - CAR_HEIGHT / 2)
+
+        self._calculate_sensor_data(angle_rad, sim_time)
+        return self.sensors
+
+    def _calculate_sensor_data(self, angle_rad, sim_time):
+        v = self.velocity
+        vx = v * np.cos(angle_rad)
+        vy = v * np.sin(angle_rad)
+        delta_vx = vx - self.prev_vx
+        delta_vy = vy - self.prev_vy
+
+        mount_rad = np.radians(self.angle_deg + PHONE_MOUNT_ANGLE)
+        cos_rot = np.cos(mount_rad)
+        sin_rot = np.sin(mount_rad)
+
+        acc_long = (delta_vx * sin_rot - delta_vy * cos_rot) * ACCEL_TO_SENSOR_SCALE
+        acc_lat = (delta_vx * cos_rot + delta_vy * sin_rot) * ACCEL_TO_SENSOR_SCALE
+        gyro_z = -(self.steer_deg * v / MAX_SPEED) * GYRO_TO_SENSOR_SCALE
+
+        # Noise- and vibration-free signal of this frame, kept for oversample()
+        self.prev_signal = self.signal
+        self.signal = np.stack([acc_lat, acc_long, np.ones(len(v)), -acc_lat * 0.5, acc_long * 0.5, gyro_z], axis=1)
+        self.vibrating = (np.abs(self.steer_deg) > 5) & (v > 5)
+        self.sensors[:] = self._measure(self.signal, sim_time, self.rng.normal(0.0, 1.0, size=(self.num_cars, 7)))
+        self.prev_vx, self.prev_vy = vx, vy
+
+    def _measure(self, signal, sim_time, noise):
+        """What the phone reads at `sim_time` (s): the signal plus road vibration and sensor noise."""
+        vibrating = self.vibrating
+        sensors = signal.copy()
+        sensors[..., 0] += np.where(vibrating, 0.2 * np.sin(sim_time * 10), 0.0)
+        sensors[..., 0] += noise[..., 1] * 0.02
+        sensors[..., 1] += noise[..., 2] * 0.02
+        sensors[..., 2] += noise[..., 0] * 0.02
+        sensors[..., 2] += np.where(vibrating, 0.05 * np.sin(sim_time * 15), 0.0)
+        sensors[..., 2] += noise[..., 3] * 0.01
+        sensors[..., 3] += noise[..., 4] * 0.005
+        sensors[..., 4] += noise[..., 5] * 0.005
+        sensors[..., 5] += noise[..., 6] * 0.01
+        return sensors
+
+    def oversample(self, count, sim_time):
+        """Readings at `count` evenly spaced instants of the last frame, ending at `sim_time` (s).
+
+        For IMU rates above the frame rate: the signal is interpolated between
+        the previous and the current frame, while vibration and noise are taken
+        at each instant. Returns a (count, N, 6) array.
+        """
+        fraction = np.arange(1, count + 1) / count
+        signal = self.prev_signal + (self.signal - self.prev_signal) * fraction[:, None, None]
+        times = sim_time - (1 - fraction[:, None]) * GAME_LOOP_INTERVAL_MS / 1000
+        return self._measure(signal, times, self.rng.normal(0.0, 1.0, size=(count, self.num_cars, 7)))
@@ -3,58 +3,71 @@ from tkinter import font
 import time
 import socketio
 import numpy as np
-import math
+import queue
 from PIL import Image, ImageTk
 import os
+import platform
 import threading
+from collections import deque
 from datetime import datetime
 
+from inference import RISK_LEVELS
+from metrics import Histogram
+# Simulator, physics, road and sensor constants, shared with headless_sim.py
+from sim_physics import (
+    CANVAS_WIDTH, CANVAS_HEIGHT, CAR_WIDTH, CAR_HEIGHT, GAME_LOOP_INTERVAL_MS,
+    ROAD_WIDTH, LANE_WIDTH, ROAD_CENTER_X, DASH_LENGTH, DASH_GAP, STRIPE_WIDTH,
+    FleetPhysics
+)
+from spool import SampleSpool
+import wire
+
 # --- Socket.IO Client Setup ---
 sio = socketio.Client(reconnection_delay_max=5)
 FLASK_SERVER_URL = 'http://localhost:5000'
-
-# --- Simulator Constants ---
-CANVAS_WIDTH = 1000
-CANVAS_HEIGHT = 700
-CAR_WIDTH = 60
-CAR_HEIGHT = 100
-GAME_LOOP_INTERVAL_MS = 50  # ~20 FPS
+# Stable across restarts so reconnects continue the same server-side session
+VEHICLE_ID = os.environ.get('VEHICLE_ID') or f"sim-{platform.node()}"
+
+# Sensor sampling rate. Phone IMUs deliver 50-200 Hz; above the 20 Hz physics rate every physics
+# step is oversampled (a whole number of samples per step) and its samples are sent as one
+# sensor_batch frame instead of sensor_data events.
+SAMPLE_RATE_HZ = float(os.environ.get('SIM_SAMPLE_RATE_HZ', 10))
+
+# Round trip from a sample's Timestamp to its 'update' coming back, with the server's stage times
+round_trip = Histogram()
+
+# Samples that cannot be sent while the socket is down are spooled to disk and replayed after
+# reconnecting as sensor_batch frames of SPOOL_BATCH_SIZE, at most SPOOL_DRAIN_RATE samples/s.
+SPOOL_PATH = os.environ.get('SIM_SPOOL_PATH', os.path.join('data', f'spool-{VEHICLE_ID}.bin'))
+SPOOL_CAPACITY = int(os.environ.get('SIM_SPOOL_CAPACITY', round(3600 * SAMPLE_RATE_HZ)))  # one hour
+SPOOL_BATCH_SIZE = int(os.environ.get('SIM_SPOOL_BATCH_SIZE', 500))
+SPOOL_DRAIN_RATE = float(os.environ.get('SIM_SPOOL_DRAIN_RATE', 2000))
+spool = SampleSpool(SPOOL_PATH, SPOOL_CAPACITY)
+# (first, last) timestamps of recently answered sensor_batch frames, so a replayed batch is only
+# popped for its own batch_result and not for one answering a live frame
+confirmed_batches = deque(maxlen=64)
+batch_confirmed = threading.Event()
 
 # --- Car State & Physics ---
-car_x, car_y = CANVAS_WIDTH / 2, CANVAS_HEIGHT - 100
-car_velocity = 0.0  # pixels per frame
-car_angle_deg = 0.0  # 0 = right, 90 = up
-steer_angle_deg = 0.0  # steering wheel angle
-
-# --- Physics Parameters ---
-MAX_SPEED_KPH = 160  # Maximum speed in km/h
-MAX_SPEED = (MAX_SPEED_KPH / 3.6) * (GAME_LOOP_INTERVAL_MS / 1000)  # Convert to pixels/frame
-ACCELERATION_RATE = 0.15  # pixels/frame²
-BRAKING_RATE = 0.5  # pixels/frame²
-FRICTION = 0.97  # velocity multiplier per frame
-STEER_RATE = 2.0  # degrees/frame
-MAX_STEER_ANGLE = 30.0  # degrees
-MIN_SPEED = -10.0  # Reverse speed limit
-
-# --- Road Parameters ---
-ROAD_WIDTH = 600
-LANE_WIDTH = ROAD_WIDTH / 3
-ROAD_CENTER_X = CANVAS_WIDTH / 2
-DASH_LENGTH = 20
-DASH_GAP = 40
-STRIPE_WIDTH = 3
-
-# --- Sensor Parameters (Mobile Phone in Car) ---
-PHONE_MOUNT_ANGLE = 15  # degrees tilt from vertical
-ACCEL_TO_SENSOR_SCALE = 1.5  # Convert physics to G-forces
-GYRO_TO_SENSOR_SCALE = 0.15  # Convert physics to deg/s
-
-# --- Sensor Data & State Variables ---
-acc_x, acc_y, acc_z = 0.0, 0.0, 0.0
-gyro_x, gyro_y, gyro_z = 0.0, 0.0, 0.0
-prev_car_velocity_x, prev_car_velocity_y = 0.0, 0.0
-last_update_time = 0
-update_interval = 100  # ms
+# The single car is one FleetPhysics car, stepped at a fixed GAME_LOOP_INTERVAL_MS timestep by the
+# wall clock; rendering runs on its own timer at SIM_RENDER_FPS and sending on its own thread.
+physics = FleetPhysics(1)
+MAX_CATCH_UP_STEPS = 5  # after a longer stall simulated time skips ahead instead of replaying it all
+update_interval = 1000 / SAMPLE_RATE_HZ  # ms between samples sent to the server
+STEPS_PER_SAMPLE = max(1, round(update_interval / GAME_LOOP_INTERVAL_MS))
+SAMPLES_PER_STEP = max(1, round(GAME_LOOP_INTERVAL_MS / update_interval))
+RENDER_FPS = float(os.environ.get('SIM_RENDER_FPS', 20))
+physics_started = None  # wall-clock time (s) of physics step 0
+physics_steps = 0
+skipped_steps = 0
+
+# (timestamps, values) groups from the physics loop to the sender thread, so a slow emit never stalls
+# the Tk thread
+outbox = queue.Queue(maxsize=1000)
+
+# Time spent per render frame and per physics tick in the Tk thread
+frame_time = Histogram()
+physics_time = Histogram()
 
 # --- Tkinter Setup ---
 root = tk.Tk()
@@ -84,6 +97,12 @@ behavior_status_text = canvas.create_text(
 speed_text = canvas.create_text(
     CANVAS_WIDTH - 10, 30, text="Speed: 0 km/h", anchor="ne", fill="white", font=bold_font
 )
+latency_text = canvas.create_text(
+    CANVAS_WIDTH - 10, 50, text="RTT: -", anchor="ne", fill="#AAAAAA", font=mono_font
+)
+loop_stats_text = canvas.create_text(
+    CANVAS_WIDTH - 10, 70, text="", anchor="ne", fill="#AAAAAA", font=mono_font
+)
 
 # Aggressive driving alert
 aggressive_alert = canvas.create_text(
@@ -102,11 +121,12 @@ for i, feature in enumerate(features_to_display):
 
 # --- Drawing Functions ---
 def draw_road():
+    """Draws the static road once; it is lowered below the car and the status texts."""
     # Road surface
     canvas.create_rectangle(
         ROAD_CENTER_X - ROAD_WIDTH/2, 0,
         ROAD_CENTER_X + ROAD_WIDTH/2, CANVAS_HEIGHT,
-        fill="#333333", outline=""
+        fill="#333333", outline="", tags="road"
     )
     
     # Lane markings
@@ -114,34 +134,37 @@ def draw_road():
         canvas.create_line(
             ROAD_CENTER_X, y,
             ROAD_CENTER_X, y + DASH_LENGTH,
-            fill="yellow", width=STRIPE_WIDTH
+            fill="yellow", width=STRIPE_WIDTH, tags="road"
         )
         canvas.create_line(
             ROAD_CENTER_X - ROAD_WIDTH/2 + LANE_WIDTH, y,
             ROAD_CENTER_X - ROAD_WIDTH/2 + LANE_WIDTH, y + DASH_LENGTH,
-            fill="white", width=STRIPE_WIDTH
+            fill="white", width=STRIPE_WIDTH, tags="road"
         )
         canvas.create_line(
             ROAD_CENTER_X + ROAD_WIDTH/2 - LANE_WIDTH, y,
             ROAD_CENTER_X + ROAD_WIDTH/2 - LANE_WIDTH, y + DASH_LENGTH,
-            fill="white", width=STRIPE_WIDTH
+            fill="white", width=STRIPE_WIDTH, tags="road"
         )
     
     # Road edges
     canvas.create_line(
         ROAD_CENTER_X - ROAD_WIDTH/2, 0,
         ROAD_CENTER_X - ROAD_WIDTH/2, CANVAS_HEIGHT,
-        fill="white", width=5
+        fill="white", width=5, tags="road"
     )
     canvas.create_line(
         ROAD_CENTER_X + ROAD_WIDTH/2, 0,
         ROAD_CENTER_X + ROAD_WIDTH/2, CANVAS_HEIGHT,
-        fill="white", width=5
+        fill="white", width=5, tags="road"
     )
+    canvas.tag_lower("road")
 
 car_image_id = None
 def draw_car():
+    """Moves the car item to the car's position (it is created on the first call)."""
     global car_image_id
+    car_x, car_y = physics.x[0], physics.y[0]
     if car_img_tk:
         if car_image_id:
             canvas.coords(car_image_id, car_x - CAR_WIDTH/2, car_y - CAR_HEIGHT/2)
@@ -172,115 +195,128 @@ keys = {'Up': False, 'Down': False, 'Left': False, 'Right': False}
 def on_key_press(event):
     if event.keysym in keys: 
         keys[event.keysym] = True
-        # Immediate response to key press
-        if event.keysym in ['Left', 'Right']:
-            game_loop()
 def on_key_release(event):
     if event.keysym in keys: keys[event.keysym] = False
 
 root.bind('<KeyPress>', on_key_press)
 root.bind('<KeyRelease>', on_key_release)
 
-# --- Physics Calculations ---
-def calculate_sensor_data():
-    global acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z, prev_car_velocity_x, prev_car_velocity_y
-    
-    angle_rad = math.radians(car_angle_deg)
-    current_velocity_x = car_velocity * math.cos(angle_rad)
-    current_velocity_y = car_velocity * math.sin(angle_rad)
-    
-    delta_vx = current_velocity_x - prev_car_velocity_x
-    delta_vy = current_velocity_y - prev_car_velocity_y
-    
-    cos_rot = math.cos(math.radians(car_angle_deg + PHONE_MOUNT_ANGLE))
-    sin_rot = math.sin(math.radians(car_angle_deg + PHONE_MOUNT_ANGLE))
-    
-    acc_long = (delta_vx * sin_rot - delta_vy * cos_rot) * ACCEL_TO_SENSOR_SCALE
-    acc_lat = (delta_vx * cos_rot + delta_vy * sin_rot) * ACCEL_TO_SENSOR_SCALE
-    
-    acc_x = acc_lat
-    acc_y = acc_long
-    acc_z = 1.0 + np.random.normal(0, 0.02)
-    
-    if abs(steer_angle_deg) > 5 and car_velocity > 5:
-        acc_x += 0.2 * math.sin(time.time() * 10)
-        acc_z += 0.05 * math.sin(time.time() * 15)
-    
-    gyro_z = -(steer_angle_deg * car_velocity / MAX_SPEED) * GYRO_TO_SENSOR_SCALE
-    gyro_y = acc_long * 0.5
-    gyro_x = -acc_lat * 0.5
-    
-    acc_x += np.random.normal(0, 0.02)
-    acc_y += np.random.normal(0, 0.02)
-    acc_z += np.random.normal(0, 0.01)
-    gyro_x += np.random.normal(0, 0.005)
-    gyro_y += np.random.normal(0, 0.005)
-    gyro_z += np.random.normal(0, 0.01)
-    
-    prev_car_velocity_x, prev_car_velocity_y = current_velocity_x, current_velocity_y
-
-# --- Main Game Loop ---
-def game_loop():
-    global car_x, car_y, car_velocity, car_angle_deg, steer_angle_deg, last_update_time
-    
-    # Physics Update
-    if keys['Up']:
-        car_velocity = min(car_velocity + ACCELERATION_RATE, MAX_SPEED)
-    if keys['Down']:
-        car_velocity = max(car_velocity - BRAKING_RATE, MIN_SPEED)
-    
-    car_velocity *= FRICTION
-    if abs(car_velocity) < 0.1: car_velocity = 0
-
-    if keys['Left']:
-        steer_angle_deg = min(MAX_STEER_ANGLE, steer_angle_deg + STEER_RATE * (1 - car_velocity/MAX_SPEED*0.7))
-    elif keys['Right']:
-        steer_angle_deg = max(-MAX_STEER_ANGLE, steer_angle_deg - STEER_RATE * (1 - car_velocity/MAX_SPEED*0.7))
-    else:
-        steer_angle_deg *= 0.7
-
-    if abs(car_velocity) > 0.5:
-        turn_factor = 1.0 - (0.7 * abs(car_velocity) / MAX_SPEED)
-        car_angle_deg += steer_angle_deg * car_velocity * 0.03 * turn_factor
-
-    angle_rad = math.radians(car_angle_deg)
-    car_x += car_velocity * math.cos(angle_rad)
-    car_y += car_velocity * math.sin(angle_rad)
-
-    road_left = ROAD_CENTER_X - ROAD_WIDTH/2 + CAR_WIDTH/2
-    road_right = ROAD_CENTER_X + ROAD_WIDTH/2 - CAR_WIDTH/2
-    car_x = max(road_left, min(car_x, road_right))
-    car_y = max(CAR_HEIGHT/2, min(car_y, CANVAS_HEIGHT - CAR_HEIGHT/2))
-
-    calculate_sensor_data()
-    
-    speed_kmh = abs(car_velocity) * (1000/GAME_LOOP_INTERVAL_MS) * 3.6
-    
-    # Update UI
-    canvas.itemconfig(speed_text, text=f"Speed: {speed_kmh:.1f} km/h")
-    draw_road()
+# --- Fixed-Timestep Physics ---
+def physics_loop():
+    """Runs every physics step due by the wall clock, so the step rate does not depend on timer or render jitter."""
+    global physics_started, physics_steps, skipped_steps
+    started = time.perf_counter()
+    now = time.time()
+    if physics_started is None:
+        physics_started = now
+    due = int((now - physics_started) * 1000 / GAME_LOOP_INTERVAL_MS) - physics_steps
+    if due > MAX_CATCH_UP_STEPS:
+        skipped_steps += due - MAX_CATCH_UP_STEPS
+        physics_steps += due - MAX_CATCH_UP_STEPS
+        due = MAX_CATCH_UP_STEPS
+
+    controls = [np.array([keys[key]]) for key in ('Up', 'Down', 'Left', 'Right')]
+    for _ in range(due):
+        sim_time = physics_steps * GAME_LOOP_INTERVAL_MS / 1000
+        physics.step(*controls, sim_time)
+        physics_steps += 1
+        if physics_steps % STEPS_PER_SAMPLE == 0 and (any(keys.values()) or abs(physics.velocity[0]) > 0.1):
+            # Stamped with the step's own time, so samples stay evenly spaced even when steps catch up
+            step_ms = int(physics_started * 1000) + physics_steps * GAME_LOOP_INTERVAL_MS
+            offsets = np.arange(SAMPLES_PER_STEP - 1, -1, -1) * GAME_LOOP_INTERVAL_MS / SAMPLES_PER_STEP
+            timestamps = step_ms - np.rint(offsets).astype(np.int64)
+            values = np.empty((SAMPLES_PER_STEP, wire.NUM_VALUES))
+            if SAMPLES_PER_STEP > 1:
+                values[:, :6] = physics.oversample(SAMPLES_PER_STEP, sim_time)[:, 0]
+            else:
+                values[:, :6] = physics.sensors
+            values[:, 6] = physics.speed_kmh[0]
+            try:
+                outbox.put_nowait((timestamps, values))
+            except queue.Full:
+                spool.extend(timestamps, values)
+    physics_time.observe(time.perf_counter() - started)
+    root.after(GAME_LOOP_INTERVAL_MS // 2, physics_loop)
+
+# --- Rendering ---
+rendered_frames = 0
+canvas_items = 0
+
+def render_loop():
+    """Moves the car and refreshes the texts; nothing is created per frame, so the canvas item count stays flat."""
+    global rendered_frames, canvas_items
+    started = time.perf_counter()
     draw_car()
-    
-    sensor_values = {
-        'AccX': acc_x, 'AccY': acc_y, 'AccZ': acc_z,
-        'GyroX': gyro_x, 'GyroY': gyro_y, 'GyroZ': gyro_z
-    }
-    for f in features_to_display:
-        canvas.itemconfig(sensor_labels[f], text=f"{sensor_values[f]:.3f}")
-
-    # Send data to server at controlled intervals
-    current_time = int(time.time() * 1000)
-    if current_time - last_update_time >= update_interval:
-        last_update_time = current_time
-        if any(keys.values()) or abs(car_velocity) > 0.1:
-            sio.emit('sensor_data', {
-                'Timestamp': current_time,
-                'AccX': acc_x, 'AccY': acc_y, 'AccZ': acc_z,
-                'GyroX': gyro_x, 'GyroY': gyro_y, 'GyroZ': gyro_z,
-                'speed': speed_kmh
-            })
-
-    root.after(GAME_LOOP_INTERVAL_MS, game_loop)
+    canvas.itemconfig(speed_text, text=f"Speed: {physics.speed_kmh[0]:.1f} km/h")
+    for feature, value in zip(features_to_display, physics.sensors[0].tolist()):
+        canvas.itemconfig(sensor_labels[feature], text=f"{value:.3f}")
+    if len(spool):
+        state = "Catching up" if sio.connected else "Offline"
+        canvas.itemconfig(connection_status_text, text=f"{state}: {len(spool)} samples spooled", fill="orange")
+
+    rendered_frames += 1
+    if rendered_frames % max(1, round(RENDER_FPS)) == 0:
+        canvas_items = len(canvas.find_all())
+        canvas.itemconfig(loop_stats_text, text=loop_stats())
+    frame_time.observe(time.perf_counter() - started)
+    root.after(max(1, round(1000 / RENDER_FPS)), render_loop)
+
+def loop_stats():
+    frames = frame_time.summary()
+    ticks = physics_time.summary()
+    elapsed = time.time() - physics_started if physics_started else 0
+    rate = physics_steps / elapsed if elapsed > 0 else 0.0
+    return (f"frame p95 {frames['p95_ms']:.1f} ms, tick p95 {ticks['p95_ms']:.1f} ms, "
+            f"physics {rate:.1f} Hz ({skipped_steps} skipped), "
+            f"items {canvas_items}, outbox {outbox.qsize()}")
+
+# --- Sending and Spooling ---
+def send_loop():
+    """Sends the physics loop's samples from a thread of its own, off the Tk thread."""
+    while True:
+        timestamps, values = outbox.get()
+        send_samples(timestamps, values)
+
+def send_samples(timestamps, values):
+    """Emits one physics step's samples live, or spools them while disconnected or while older samples
+    are still being replayed. A single sample goes out as sensor_data, several as a sensor_batch frame."""
+    if sio.connected and not len(spool):
+        try:
+            if len(timestamps) == 1:
+                sio.emit('sensor_data', dict(zip(wire.VALUE_FIELDS, values[0].tolist()),
+                                             Timestamp=int(timestamps[0]), vehicle_id=VEHICLE_ID))
+            else:
+                frame = wire.encode_samples([VEHICLE_ID], np.zeros(len(timestamps), dtype=np.uint16),
+                                            timestamps, values)
+                sio.emit('sensor_batch', {'frame': frame})
+            return
+        except socketio.exceptions.SocketIOError:
+            pass
+    spool.extend(timestamps, values)
+
+def drain_spool():
+    """Replays spooled samples once connected; a batch leaves the spool only after its batch_result."""
+    while True:
+        if not sio.connected or not len(spool):
+            time.sleep(0.2)
+            continue
+        timestamps, values = spool.peek(SPOOL_BATCH_SIZE)
+        frame = wire.encode_samples([VEHICLE_ID], np.zeros(len(timestamps), dtype=np.uint16), timestamps, values)
+        started = time.monotonic()
+        span = (int(timestamps[0]), int(timestamps[-1]))
+        try:
+            sio.emit('sensor_batch', {'frame': frame})
+        except socketio.exceptions.SocketIOError:
+            continue
+        deadline = started + 10
+        while span not in confirmed_batches and batch_confirmed.wait(max(0.0, deadline - time.monotonic())):
+            batch_confirmed.clear()
+        if span not in confirmed_batches:
+            continue  # resent after reconnecting; the server drops samples it already has as duplicates
+        spool.pop_through(span[1])
+        if not len(spool):
+            canvas.after(0, lambda: canvas.itemconfig(connection_status_text, text="Connected", fill="lime"))
+        time.sleep(max(0.0, len(timestamps) / SPOOL_DRAIN_RATE - (time.monotonic() - started)))
 
 # --- Socket.IO Event Handlers ---
 @sio.event
@@ -299,9 +335,39 @@ def disconnect(reason=None):
 def connect_error(data):
     canvas.itemconfig(connection_status_text, text="Connection Failed", fill="red")
 
+@sio.on('update')
+def handle_update(data):
+    show_round_trip(data.get('timestamp', 0), data.get('timing'))
+
+def show_round_trip(timestamp, timing):
+    rtt_ms = time.time() * 1000 - timestamp
+    if not 0 <= rtt_ms < 60000:
+        return
+    round_trip.observe(rtt_ms / 1000)
+    timing = timing or {}
+    server_ms = sum(ms for stage, ms in timing.items() if stage != 'receive')
+    summary = round_trip.summary()
+    text = f"RTT {rtt_ms:.0f} ms (p50 {summary['p50_ms']:.0f} / p95 {summary['p95_ms']:.0f}), server {server_ms:.1f} ms"
+    canvas.after(0, lambda: canvas.itemconfig(latency_text, text=text))
+
+@sio.on('batch_result')
+def handle_batch_result(data):
+    _, _, timestamps, predicted = wire.decode_results(data['frame'])
+    if not len(timestamps):
+        return
+    confirmed_batches.append((int(timestamps[0]), int(timestamps[-1])))
+    batch_confirmed.set()
+    # Live high-rate frames are answered here instead of with update/risk_alert events
+    show_round_trip(int(timestamps[-1]), data.get('timing'))
+    classified = predicted[predicted > 0]
+    if len(classified):
+        show_risk(RISK_LEVELS.get(int(classified[-1]), 'N/A'))
+
 @sio.on('risk_alert')
 def handle_risk_alert(data):
-    risk_level = data.get('risk_level', 'N/A')
+    show_risk(data.get('risk_level', 'N/A'))
+
+def show_risk(risk_level):
     colors = {
         'Aggressive': 'red',
         'Normal': 'lime',
@@ -324,22 +390,37 @@ def handle_risk_alert(data):
 # --- Main Execution ---
 if __name__ == '__main__':
     def connect_thread():
-        try:
-            sio.connect(FLASK_SERVER_URL, transports=['websocket', 'polling'])
-        except Exception as e:
-            print(f"Connection error: {e}")
-            canvas.after(0, lambda: canvas.itemconfig(connection_status_text, text="Connection Failed", fill="red"))
+        # Keep trying: samples are spooled until the server is reachable (afterwards sio reconnects itself)
+        while not sio.connected:
+            try:
+                sio.connect(FLASK_SERVER_URL, transports=['websocket', 'polling'])
+            except Exception as e:
+                print(f"Connection error: {e}")
+                canvas.after(0, lambda: canvas.itemconfig(connection_status_text, text="Connection Failed", fill="red"))
+                time.sleep(5)
 
     threading.Thread(target=connect_thread, daemon=True).start()
+    threading.Thread(target=send_loop, daemon=True).start()
+    threading.Thread(target=drain_spool, daemon=True).start()
 
     draw_road()
-    draw_car()
-    game_loop()
+    physics_loop()
+    render_loop()
     
     try:
         root.mainloop()
     finally:
         if sio.connected:
             sio.disconnect()
+        while not outbox.empty():
+            spool.extend(*outbox.get_nowait())
+        spool.flush()
+        if len(spool):
+            print(f"{len(spool)} unsent samples stay spooled in {SPOOL_PATH} for the next run.")
+        if round_trip.count:
+            summary = round_trip.summary()
+            print(f"Round trip over {summary['count']} samples: p50 {summary['p50_ms']:.1f} ms, "
+                  f"p95 {summary['p95_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms")
+        print(f"Render loop: {loop_stats()}")
         print("Simulator closed.")
         
\ No newline at end of file
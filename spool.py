@@ -0,0 +1,100 @@
+"""Bounded on-disk spool of sensor samples a client could not send.
+
+Samples are kept in a memory-mapped ring file: a 16-byte header (head, count)
+followed by `capacity` fixed-size records of timestamp (int64 ms) and the
+wire.VALUE_FIELDS values (float32). Appending and draining touch only the
+records involved, and the spool survives a restart of the client. When it is
+full the oldest sample is overwritten and counted in `dropped`.
+
+Readers peek() a batch, send it, and pop_through() its last timestamp only once
+the server has confirmed it, so a connection lost mid-drain loses nothing.
+"""
+import os
+import threading
+
+import numpy as np
+
+import wire
+
+RECORD = np.dtype([('timestamp', '<i8'), ('values', '<f4', (wire.NUM_VALUES,))])
+HEADER_BYTES = 16
+
+
+class SampleSpool:
+    def __init__(self, path, capacity=36000):
+        self.path = path
+        self.dropped = 0
+        self._lock = threading.Lock()
+        size = HEADER_BYTES + capacity * RECORD.itemsize
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            # New, or written with another capacity: start empty
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.truncate(size)
+        self._header = np.memmap(path, dtype='<i8', mode='r+', shape=(2,))
+        self._records = np.memmap(path, dtype=RECORD, mode='r+', offset=HEADER_BYTES, shape=(capacity,))
+        self.capacity = capacity
+
+    def __len__(self):
+        return int(self._header[1])
+
+    def append(self, timestamp, values):
+        with self._lock:
+            head, count = int(self._header[0]), int(self._header[1])
+            if count == self.capacity:
+                head = (head + 1) % self.capacity
+                count -= 1
+                self.dropped += 1
+            record = self._records[(head + count) % self.capacity]
+            record['timestamp'] = timestamp
+            record['values'] = values
+            self._header[:] = (head, count + 1)
+
+    def extend(self, timestamps, values):
+        """Appends n samples at once; values is (n, wire.NUM_VALUES)."""
+        excess = max(0, len(timestamps) - self.capacity)
+        timestamps = np.asarray(timestamps)[excess:]
+        values = np.asarray(values)[excess:]
+        with self._lock:
+            head, count = int(self._header[0]), int(self._header[1])
+            overflow = max(0, count + len(timestamps) - self.capacity)
+            head, count = (head + overflow) % self.capacity, count - overflow
+            self.dropped += excess + overflow
+            rows = (head + count + np.arange(len(timestamps))) % self.capacity
+            self._records['timestamp'][rows] = timestamps
+            self._records['values'][rows] = values
+            self._header[:] = (head, count + len(timestamps))
+
+    def peek(self, limit):
+        """Returns copies of (timestamps, values) of the oldest `limit` samples."""
+        with self._lock:
+            head, count = int(self._header[0]), int(self._header[1])
+            rows = (head + np.arange(min(limit, count))) % self.capacity
+            records = self._records[rows]
+        return records['timestamp'].copy(), records['values'].copy()
+
+    def pop(self, count):
+        """Forgets the oldest `count` samples, e.g. once the server has confirmed them."""
+        with self._lock:
+            head, stored = int(self._header[0]), int(self._header[1])
+            count = min(count, stored)
+            self._header[:] = ((head + count) % self.capacity, stored - count)
+
+    def pop_through(self, timestamp):
+        """Forgets the oldest samples up to and including `timestamp`, e.g. the last one the server confirmed.
+
+        Unlike pop(), this stays correct if the oldest samples were overwritten while a batch was in flight.
+        """
+        with self._lock:
+            head, stored = int(self._header[0]), int(self._header[1])
+            timestamps = self._records['timestamp'][(head + np.arange(stored)) % self.capacity]
+            later = np.flatnonzero(timestamps > timestamp)
+            count = int(later[0]) if len(later) else stored
+            self._header[:] = ((head + count) % self.capacity, stored - count)
+
+    def flush(self):
+        self._records.flush()
+        self._header.flush()
+
+    def stats(self):
+        return {'pending': len(self), 'capacity': self.capacity, 'dropped': self.dropped}
@@ -0,0 +1,391 @@
+"""Columnar, chunked telemetry archive that can be read with memory maps.
+
+Each session is stored as a directory with a manifest and one sub-directory per
+chunk holding one .npy file per column:
+
+    archive/session_000042/manifest.json
+    archive/session_000042/chunk_000000/timestamp.npy
+    archive/session_000042/chunk_000000/acc_x.npy ...
+
+Plain .npy chunks are memory-mapped on read, so a range inside one chunk is a
+zero-copy view. With `compress=True` each chunk is a single deflated .npz
+instead, which is smaller on disk but is decompressed when read. Writers
+refuse a directory that already holds an archive rather than overwrite it.
+
+app.py also records the raw samples of live sessions (LiveArchive), which at
+high sensor rates are far more than the model-rate rows kept in driving_log.
+Those directories are named after the session id and its start time, e.g.
+archive/raw/session_000042_20240501-081500-123456, since a session id is
+only unique within one database.
+
+Usage:
+    python telemetry_archive.py export --session 42
+    python telemetry_archive.py export --all --compress
+    python telemetry_archive.py import-csv data/train_motion_data.csv train
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ARCHIVE_ROOT = 'archive'
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Column name -> on-disk dtype, in driving_log order
+COLUMNS = {
+    'timestamp': np.int64,
+    'acc_x': np.float32,
+    'acc_y': np.float32,
+    'acc_z': np.float32,
+    'gyro_x': np.float32,
+    'gyro_y': np.float32,
+    'gyro_z': np.float32,
+    'speed': np.float32,
+    'predicted_class': np.int8,
+}
+
+# Motion CSV headers -> archive columns
+CSV_COLUMNS = {
+    'Timestamp': 'timestamp',
+    'AccX': 'acc_x', 'AccY': 'acc_y', 'AccZ': 'acc_z',
+    'GyroX': 'gyro_x', 'GyroY': 'gyro_y', 'GyroZ': 'gyro_z',
+}
+CSV_CLASSES = {'AGGRESSIVE': 1, 'NORMAL': 2, 'SLOW': 3}
+
+
+def session_dir(root, name):
+    return os.path.join(root, name if isinstance(name, str) else f'session_{name:06d}')
+
+
+class ArchiveWriter:
+    """Appends column chunks for one session and writes the manifest on close.
+
+    An existing archive of the same name is never overwritten: it raises
+    FileExistsError, or with `append=True` new chunks are numbered after the
+    ones in its manifest.
+    """
+
+    def __init__(self, root, name, compress=False, append=False):
+        self.path = session_dir(root, name)
+        self.compress = compress
+        self.chunks = []
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        if os.path.exists(manifest_path):
+            if not append:
+                raise FileExistsError(f"{self.path} already holds an archive")
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['compressed'] != compress:
+                raise ValueError(f"{self.path} is {'' if manifest['compressed'] else 'not '}compressed")
+            self.chunks = manifest['chunks']
+        os.makedirs(self.path, exist_ok=True)
+
+    def write_chunk(self, columns):
+        """Writes one chunk from a dict of equally long column arrays; returns its size in bytes."""
+        rows = len(columns['timestamp'])
+        if rows == 0:
+            return 0
+        arrays = {name: np.ascontiguousarray(columns.get(name, np.zeros(rows)), dtype=dtype)
+                  for name, dtype in COLUMNS.items()}
+        chunk_name = f'chunk_{len(self.chunks):06d}'
+        if self.compress:
+            np.savez_compressed(os.path.join(self.path, chunk_name + '.npz'), **arrays)
+            size = os.path.getsize(os.path.join(self.path, chunk_name + '.npz'))
+        else:
+            chunk_path = os.path.join(self.path, chunk_name)
+            os.makedirs(chunk_path, exist_ok=True)
+            size = 0
+            for name, array in arrays.items():
+                np.save(os.path.join(chunk_path, name + '.npy'), array)
+                size += os.path.getsize(os.path.join(chunk_path, name + '.npy'))
+        timestamps = arrays['timestamp']
+        self.chunks.append({
+            'name': chunk_name,
+            'rows': rows,
+            'ts_min': int(timestamps[0]),
+            'ts_max': int(timestamps[-1]),
+        })
+        return size
+
+    def close(self):
+        """Writes the manifest; may be called again after further chunks."""
+        manifest = {
+            'format': 1,
+            'compressed': self.compress,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            'rows': sum(chunk['rows'] for chunk in self.chunks),
+            'chunks': self.chunks,
+        }
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+class ArchiveReader:
+    """Reads an archived session. Chunks must be in timestamp order, as the exporters write them."""
+
+    def __init__(self, root, name):
+        self.path = session_dir(root, name)
+        with open(os.path.join(self.path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.chunks = self.manifest['chunks']
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def chunk(self, index, columns=None):
+        """Returns {column: array} for one chunk; memory-mapped unless the archive is compressed."""
+        columns = list(COLUMNS) if columns is None else columns
+        name = self.chunks[index]['name']
+        if self.manifest['compressed']:
+            with np.load(os.path.join(self.path, name + '.npz')) as data:
+                return {column: data[column] for column in columns}
+        return {column: np.load(os.path.join(self.path, name, column + '.npy'), mmap_mode='r')
+                for column in columns}
+
+    def iter_chunks(self, columns=None):
+        for index in range(len(self.chunks)):
+            yield self.chunk(index, columns)
+
+    def read_range(self, start_ts=None, end_ts=None, columns=None):
+        """Returns {column: array} for start_ts <= timestamp <= end_ts.
+
+        A range that falls inside one chunk is returned as views into the memory
+        map; ranges spanning chunks are concatenated.
+        """
+        columns = list(COLUMNS) if columns is None else list(columns)
+        wanted = columns if 'timestamp' in columns else ['timestamp'] + columns
+        parts = []
+        for index, meta in enumerate(self.chunks):
+            if (start_ts is not None and meta['ts_max'] < start_ts) or \
+                    (end_ts is not None and meta['ts_min'] > end_ts):
+                continue
+            data = self.chunk(index, wanted)
+            timestamps = data['timestamp']
+            lo = 0 if start_ts is None else int(np.searchsorted(timestamps, start_ts, side='left'))
+            hi = len(timestamps) if end_ts is None else int(np.searchsorted(timestamps, end_ts, side='right'))
+            parts.append({column: data[column][lo:hi] for column in columns})
+
+        if not parts:
+            return {column: np.empty(0, dtype=COLUMNS[column]) for column in columns}
+        if len(parts) == 1:
+            return parts[0]
+        return {column: np.concatenate([part[column] for part in parts]) for column in columns}
+
+    def to_frame(self, start_ts=None, end_ts=None, columns=None):
+        """Drop-in for the pd.read_sql_query / pd.read_csv callers."""
+        return pd.DataFrame(self.read_range(start_ts, end_ts, columns), copy=False)
+
+
+class LiveArchive:
+    """Raw samples of live sessions, buffered per session and written as archive chunks.
+
+    Sessions are keyed by their archive directory name. A session's buffer
+    becomes a chunk once it holds `chunk_rows` rows, once flush_idle() finds it
+    older than `flush_interval` seconds, or when the session is closed; so a
+    session holds at most min(chunk_rows, rate * flush_interval) rows in memory.
+    The manifest is rewritten after every chunk, so a session can be read while
+    it is still being recorded. Samples must be appended in timestamp order per
+    session. A directory that already holds an archive is never written to; its
+    samples are counted in `write_errors` instead.
+
+    With `max_bytes`, flush_idle() also deletes the least recently written
+    closed sessions under `root` until the archive fits in it again. The
+    directories are only walked once, on construction; after that the size of
+    every session is kept up to date as chunks are written and sessions deleted.
+    """
+
+    def __init__(self, root, chunk_rows=100_000, flush_interval=60.0, compress=False, max_bytes=0,
+                 clock=time.monotonic):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._writers = {}
+        self._buffers = {}  # name -> (buffered since, [(timestamps, values, predicted_class)], rows)
+        self.rows_archived = 0
+        self.chunks_written = 0
+        self.write_errors = 0
+        self.sessions_pruned = 0
+        self._sizes = {}  # name -> [last written (epoch s), bytes]
+        self._total = 0
+        if max_bytes:
+            self._scan()
+
+    def _scan(self):
+        """Measures the sessions already under `root`."""
+        if not os.path.isdir(self.root):
+            return
+        try:
+            for entry in os.scandir(self.root):
+                if entry.is_dir():
+                    size = sum(os.path.getsize(os.path.join(path, file))
+                               for path, _, files in os.walk(entry.path) for file in files)
+                    self._sizes[entry.name] = [entry.stat().st_mtime, size]
+                    self._total += size
+        except OSError as e:
+            print(f"ERROR: Failed to measure the raw archive {self.root}: {e}")
+
+    def append(self, name, timestamps, values, predicted_class):
+        """Buffers n samples: timestamps (n,), values (n, 7) as AccX..GyroZ, speed, predicted_class (n,)."""
+        since, parts, rows = self._buffers.get(name) or (self._clock(), [], 0)
+        parts.append((timestamps, values, predicted_class))
+        rows += len(timestamps)
+        self._buffers[name] = (since, parts, rows)
+        if rows >= self.chunk_rows:
+            self._write(name)
+
+    def flush_idle(self):
+        """Writes the buffers that have waited longer than `flush_interval`, then applies `max_bytes`."""
+        now = self._clock()
+        for name in [name for name, (since, _, _) in self._buffers.items() if now - since >= self.flush_interval]:
+            self._write(name)
+        if self.max_bytes:
+            self.prune()
+
+    def prune(self):
+        """Deletes the least recently written closed sessions while the archive exceeds `max_bytes`."""
+        if self._total <= self.max_bytes:
+            return
+        open_names = self._writers.keys() | self._buffers.keys()
+        closed = sorted((written, name) for name, (written, _) in self._sizes.items() if name not in open_names)
+        for _, name in closed:
+            if self._total <= self.max_bytes:
+                break
+            try:
+                shutil.rmtree(session_dir(self.root, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"ERROR: Failed to prune {name} from the raw archive {self.root}: {e}")
+                continue
+            self._total -= self._sizes.pop(name)[1]
+            self.sessions_pruned += 1
+
+    def close_session(self, name):
+        self._write(name)
+        self._writers.pop(name, None)
+
+    def close(self):
+        for name in list(self._buffers):
+            self.close_session(name)
+
+    def _write(self, name):
+        buffered = self._buffers.pop(name, None)
+        if buffered is None:
+            return
+        parts = buffered[1]
+        values = np.concatenate([np.asarray(part[1], dtype=np.float32).reshape(-1, 7) for part in parts])
+        columns = {column: values[:, i] for i, column in enumerate(list(COLUMNS)[1:8])}
+        columns['timestamp'] = np.concatenate([np.asarray(part[0], dtype=np.int64).reshape(-1) for part in parts])
+        columns['predicted_class'] = np.concatenate([np.asarray(part[2]).reshape(-1) for part in parts])
+        try:
+            writer = self._writers.get(name)
+            if writer is None:
+                writer = self._writers[name] = ArchiveWriter(self.root, name, self.compress)
+            size = writer.write_chunk(columns)
+            writer.close()
+            if self.max_bytes:
+                entry = self._sizes.setdefault(name, [0.0, 0])
+                entry[0] = time.time()
+                entry[1] += size
+                self._total += size
+            self.rows_archived += len(values)
+            self.chunks_written += 1
+        except Exception as e:
+            self.write_errors += 1
+            print(f"ERROR: Failed to archive {len(values)} raw samples of {name}: {e}")
+
+    def stats(self):
+        return {
+            'root': self.root,
+            'sessions': len(self._writers),
+            'buffered_rows': sum(rows for _, _, rows in self._buffers.values()),
+            'rows_archived': self.rows_archived,
+            'chunks_written': self.chunks_written,
+            'write_errors': self.write_errors,
+            'sessions_pruned': self.sessions_pruned,
+            'bytes': self._total if self.max_bytes else None
+        }
+
+
+def export_session(database, session_id, root=ARCHIVE_ROOT, chunk_rows=DEFAULT_CHUNK_ROWS, compress=False):
+    """Copies one session of driving_log into the archive, streaming chunk_rows rows at a time."""
+    writer = ArchiveWriter(root, session_id, compress)
+    conn = sqlite3.connect(database)
+    try:
+        cursor = conn.execute(f'''
+            SELECT {', '.join(f'COALESCE({name}, 0)' for name in COLUMNS)} FROM driving_log
+            WHERE session_id = ? ORDER BY timestamp ASC
+        ''', (session_id,))
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            values = np.array(rows, dtype=np.float64)
+            writer.write_chunk({name: values[:, i] for i, name in enumerate(COLUMNS)})
+    finally:
+        conn.close()
+    return writer.close()
+
+
+def import_csv(csv_path, name, root=ARCHIVE_ROOT, chunk_rows=DEFAULT_CHUNK_ROWS, compress=False):
+    """Archives a train/test_motion_data.csv-format file under `name`."""
+    writer = ArchiveWriter(root, name, compress)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        columns = {column: chunk[header].to_numpy() for header, column in CSV_COLUMNS.items()}
+        if 'Class' in chunk:
+            columns['predicted_class'] = chunk['Class'].map(CSV_CLASSES).fillna(0).to_numpy()
+        writer.write_chunk(columns)
+    return writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar telemetry archive tools.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help="archive sessions from driving_log")
+    export.add_argument('--db', default='instance/driving_behavior.db')
+    export.add_argument('--root', default=ARCHIVE_ROOT)
+    group = export.add_mutually_exclusive_group(required=True)
+    group.add_argument('--session', type=int, action='append')
+    group.add_argument('--all', action='store_true')
+    export.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    export.add_argument('--compress', action='store_true')
+
+    imp = sub.add_parser('import-csv', help="archive a motion CSV file")
+    imp.add_argument('csv')
+    imp.add_argument('name')
+    imp.add_argument('--root', default=ARCHIVE_ROOT)
+    imp.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    imp.add_argument('--compress', action='store_true')
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'export':
+            sessions = args.session
+            if args.all:
+                conn = sqlite3.connect(args.db)
+                sessions = [row[0] for row in conn.execute('SELECT id FROM sessions ORDER BY id')]
+                conn.close()
+            for session_id in sessions:
+                manifest = export_session(args.db, session_id, args.root, args.chunk_rows, args.compress)
+                print(f"INFO: Archived session {session_id}: {manifest['rows']} rows in {len(manifest['chunks'])} chunks.")
+        else:
+            manifest = import_csv(args.csv, args.name, args.root, args.chunk_rows, args.compress)
+            print(f"INFO: Archived {args.csv} as '{args.name}': {manifest['rows']} rows.")
+    except FileExistsError as e:
+        print(f"ERROR: {e}; remove it or choose another --root.")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""Trains the LSTM and the random-forest baseline from the motion CSVs.
+
+Sliding windows are built with the same feature code the server uses
+(features.py) and cached under --cache-dir as .npy files, keyed by the source
+file, window length, stride and feature set; reruns memory-map the cache
+instead of preprocessing again. Each run writes its artifacts and a
+metrics.json (accuracy, per-class scores, stage wall-clock times, arguments)
+to models/runs/<version>/, and --promote copies them to the paths app.py and
+batch_score.py load.
+
+Usage:
+    python train.py                                   # LSTM + RF on the raw sensor axes
+    python train.py --features all --epochs 50        # every streaming feature
+    python train.py --models rf --workers 8
+    python train.py --promote                         # also replace models/lstm_model.h5
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '0')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from features import RAW_FEATURES, feature_names, extract, parse_windows
+from inference import RISK_LEVELS
+from window_store import sliding_windows
+
+CLASS_NAMES = ['AGGRESSIVE', 'NORMAL', 'SLOW']  # model output k is RISK_LEVELS[k + 1]
+CACHE_VERSION = 1
+MODELS = ('lstm', 'rf')
+
+
+class StageTimer:
+    """Records the wall-clock time of each named stage."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def __call__(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = round(self.seconds.get(name, 0.0) + time.perf_counter() - started, 3)
+            print(f"INFO: {name}: {self.seconds[name]:.2f}s")
+
+
+# --- Windowed datasets ---
+def cache_key(path, length, stride, names, feature_windows):
+    stat = os.stat(path)
+    spec = {
+        'version': CACHE_VERSION,
+        'file': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'length': length,
+        'stride': stride,
+        'features': names,
+        'feature_windows': list(feature_windows)
+    }
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16], spec
+
+
+def build_windows(path, length, stride, names, feature_windows):
+    """Returns (windows, labels): (n, length, features) float32 and 0-based class ids of each window's last row."""
+    data = pd.read_csv(path)
+    if 'Timestamp' in data:
+        data = data.sort_values('Timestamp', kind='stable')
+    matrix = extract(data[list(RAW_FEATURES)].to_numpy(dtype=np.float64), feature_windows)
+    matrix = matrix[:, [feature_names(feature_windows).index(name) for name in names]]
+    labels = data['Class'].map({name: i for i, name in enumerate(CLASS_NAMES)}).to_numpy()
+    if np.isnan(labels.astype(float)).any():
+        raise ValueError(f"{path}: unknown Class values {sorted(set(data['Class']) - set(CLASS_NAMES))}")
+    windows = sliding_windows(matrix, length)[::stride]
+    return np.ascontiguousarray(windows, dtype=np.float32), labels[length - 1::stride].astype(np.int64)
+
+
+def load_windows(path, length, stride, names, feature_windows, cache_dir):
+    """Memory-mapped windows from the cache, building and storing them first on a miss."""
+    key, spec = cache_key(path, length, stride, names, feature_windows)
+    directory = os.path.join(cache_dir, key)
+    if not os.path.exists(os.path.join(directory, 'spec.json')):
+        windows, labels = build_windows(path, length, stride, names, feature_windows)
+        tmp = directory + '.tmp'
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, 'windows.npy'), windows)
+        np.save(os.path.join(tmp, 'labels.npy'), labels)
+        with open(os.path.join(tmp, 'spec.json'), 'w') as f:
+            json.dump(spec, f, indent=2)
+        os.replace(tmp, directory)
+        print(f"INFO: Cached {len(windows)} windows of {os.path.basename(path)} in {directory}.")
+    else:
+        print(f"INFO: Using cached windows of {os.path.basename(path)} from {directory}.")
+    return (np.load(os.path.join(directory, 'windows.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'labels.npy'), mmap_mode='r'), key)
+
+
+# --- Models ---
+def window_batches(windows, labels, batch_size, workers, shuffle, seed):
+    """keras.utils.PyDataset reading shuffled batches from the memory-mapped cache on `workers` threads."""
+    import keras
+
+    class WindowBatches(keras.utils.PyDataset):
+        def __init__(self):
+            super().__init__(workers=workers, max_queue_size=4 * workers)
+            self.order = np.arange(len(windows))
+            self.rng = np.random.default_rng(seed)
+            self.on_epoch_end()
+
+        def __len__(self):
+            return (len(windows) + batch_size - 1) // batch_size
+
+        def __getitem__(self, index):
+            rows = np.sort(self.order[index * batch_size:(index + 1) * batch_size])
+            return np.asarray(windows[rows]), np.asarray(labels[rows])
+
+        def on_epoch_end(self):
+            if shuffle:
+                self.rng.shuffle(self.order)
+
+    return WindowBatches()
+
+
+def build_lstm(length, num_features, units=64):
+    """Same architecture as the shipped models/lstm_model.h5."""
+    import keras
+
+    model = keras.Sequential([
+        keras.Input(shape=(length, num_features)),
+        keras.layers.LSTM(units),
+        keras.layers.Dense(len(CLASS_NAMES), activation='softmax')
+    ])
+    model.compile(optimizer=keras.optimizers.Adam(1e-3), loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+    return model
+
+
+def train_lstm(train, args):
+    import keras
+
+    keras.utils.set_random_seed(args.seed)
+    windows, labels = train
+    model = build_lstm(windows.shape[1], windows.shape[2], args.units)
+    history = model.fit(window_batches(windows, labels, args.batch_size, args.workers, True, args.seed),
+                        epochs=args.epochs, verbose=2)
+    return model, {'loss': history.history['loss'], 'accuracy': history.history['accuracy']}
+
+
+def train_rf(train, args):
+    from sklearn.ensemble import RandomForestClassifier
+
+    windows, labels = train
+    model = RandomForestClassifier(n_estimators=args.trees, n_jobs=args.workers, random_state=args.seed)
+    model.fit(np.asarray(windows).reshape(len(windows), -1), np.asarray(labels))
+    return model
+
+
+def predict_lstm(model, windows, batch_size=4096):
+    return np.concatenate([np.argmax(model.predict_on_batch(np.asarray(windows[i:i + batch_size])), axis=1)
+                           for i in range(0, len(windows), batch_size)])
+
+
+def predict_rf(model, windows):
+    return model.predict(np.asarray(windows).reshape(len(windows), -1))
+
+
+def score(labels, predicted):
+    from sklearn.metrics import accuracy_score, confusion_matrix, precision_recall_fscore_support
+
+    labels = np.asarray(labels)
+    precision, recall, f1, support = precision_recall_fscore_support(
+        labels, predicted, labels=range(len(CLASS_NAMES)), zero_division=0)
+    return {
+        'accuracy': float(accuracy_score(labels, predicted)),
+        'macro_f1': float(f1.mean()),
+        'per_class': {
+            RISK_LEVELS[i + 1]: {'precision': float(precision[i]), 'recall': float(recall[i]),
+                                 'f1': float(f1[i]), 'support': int(support[i])}
+            for i in range(len(CLASS_NAMES))
+        },
+        'confusion_matrix': confusion_matrix(labels, predicted, labels=range(len(CLASS_NAMES))).tolist()
+    }
+
+
+def versions():
+    found = {'python': platform.python_version(), 'numpy': np.__version__}
+    for name in ('sklearn', 'keras', 'tensorflow'):
+        try:
+            found[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return found
+
+
+def promote(run_dir, trained, names, feature_windows, window):
+    """Copies a run's artifacts to the fixed paths the server and batch scorer load.
+
+    The LSTM's feature list and window length go next to it
+    (models/lstm_model.features.json), from where app.py, batch_score.py and
+    evaluate.py take their MODEL_FEATURES and SEQUENCE_LENGTH.
+    """
+    from model_backend import export_weights, save_features
+
+    if 'lstm' in trained:
+        shutil.copyfile(os.path.join(run_dir, 'lstm_model.h5'), os.path.join('models', 'lstm_model.h5'))
+        export_weights(os.path.join('models', 'lstm_model.h5'))
+        save_features(os.path.join('models', 'lstm_model.h5'), names, feature_windows, window)
+    if 'rf' in trained:
+        shutil.copyfile(os.path.join(run_dir, 'rf_model.pkl'), os.path.join('models', 'rf_model.pkl'))
+    print(f"INFO: Promoted {', '.join(trained)} from {run_dir}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the LSTM and RF driving-behaviour classifiers.")
+    parser.add_argument('--train-csv', default='data/train_motion_data.csv')
+    parser.add_argument('--test-csv', default='data/test_motion_data.csv')
+    parser.add_argument('--models', default='lstm,rf', help="comma-separated subset of: " + ', '.join(MODELS))
+    parser.add_argument('--window', type=int, default=5,
+                        help="samples per window (recorded for the server on --promote)")
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--features', default=','.join(RAW_FEATURES),
+                        help="comma-separated feature names, or 'all' (see features.feature_names)")
+    parser.add_argument('--feature-windows', type=parse_windows, default=parse_windows('10,50'))
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--units', type=int, default=64)
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="threads loading LSTM batches / fitting RF trees")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--out', default='models/runs')
+    parser.add_argument('--promote', action='store_true', help="copy the artifacts to models/ for serving")
+    args = parser.parse_args(argv)
+
+    trained = [name for name in args.models.split(',') if name]
+    unknown = set(trained) - set(MODELS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+    available = feature_names(args.feature_windows)
+    names = available if args.features == 'all' else args.features.split(',')
+    missing = [name for name in names if name not in available]
+    if missing:
+        parser.error(f"unknown feature(s): {', '.join(missing)}")
+
+    timer = StageTimer()
+    np.random.seed(args.seed)
+    with timer('load_train_windows'):
+        train_windows, train_labels, train_key = load_windows(
+            args.train_csv, args.window, args.stride, names, args.feature_windows, args.cache_dir)
+    with timer('load_test_windows'):
+        test_windows, test_labels, test_key = load_windows(
+            args.test_csv, args.window, 1, names, args.feature_windows, args.cache_dir)
+
+    version = datetime.now().strftime('%Y%m%d-%H%M%S')
+    run_dir = os.path.join(args.out, version)
+    os.makedirs(run_dir, exist_ok=True)
+    metrics = {
+        'version': version,
+        'args': vars(args),
+        'features': names,
+        'window': args.window,
+        'dataset': {'train_cache': train_key, 'test_cache': test_key,
+                    'train_windows': len(train_windows), 'test_windows': len(test_windows)},
+        'versions': versions(),
+        'models': {}
+    }
+
+    if 'lstm' in trained:
+        with timer('train_lstm'):
+            model, history = train_lstm((train_windows, train_labels), args)
+        with timer('evaluate_lstm'):
+            metrics['models']['lstm'] = dict(score(test_labels, predict_lstm(model, test_windows)), history=history)
+        with timer('save_lstm'):
+            model.save(os.path.join(run_dir, 'lstm_model.h5'))
+    if 'rf' in trained:
+        import joblib
+
+        with timer('train_rf'):
+            model = train_rf((train_windows, train_labels), args)
+        with timer('evaluate_rf'):
+            metrics['models']['rf'] = score(test_labels, predict_rf(model, test_windows))
+        with timer('save_rf'):
+            joblib.dump(model, os.path.join(run_dir, 'rf_model.pkl'))
+
+    metrics['stage_seconds'] = timer.seconds
+    with open(os.path.join(run_dir, 'metrics.json'), 'w') as f:
+        json.dump(metrics, f, indent=2)
+    for name, result in metrics['models'].items():
+        print(f"INFO: {name}: test accuracy {result['accuracy']:.3f}, macro F1 {result['macro_f1']:.3f}")
+    print(f"INFO: Artifacts and metrics written to {run_dir}.")
+    if args.promote:
+        promote(run_dir, trained, names, args.feature_windows, args.window)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def sliding_windows(values, length):
+    """Returns a (n - length + 1, length, features) view of `values` without copying."""
+    return np.lib.stride_tricks.sliding_window_view(values, length, axis=0).transpose(0, 2, 1)
+
+
+class RingWindow:
+    """Fixed-size float32 sliding window over the most recent samples.
+
+    Every sample is written twice, at `head` and `head + length`, so the last
+    `length` samples are always one contiguous slice and `view()` never copies.
+    """
+
+    __slots__ = ('length', 'count', 'head', '_data', 'last_scored', 'last_class')
+
+    def __init__(self, length, num_features):
+        self.length = length
+        self.count = 0
+        self.head = 0
+        self._data = np.zeros((2 * length, num_features), dtype=np.float32)
+        # Last window that went through the model and its class, kept for prediction_cache.ChangeGate
+        self.last_scored = None
+        self.last_class = None
+
+    def append(self, sample):
+        self._data[self.head] = sample
+        self._data[self.head + self.length] = sample
+        self.head = (self.head + 1) % self.length
+        if self.count < self.length:
+            self.count += 1
+
+    def is_full(self):
+        return self.count == self.length
+
+    def view(self):
+        """Returns the window in arrival order as a read-only view, oldest sample first."""
+        window = self._data[self.head:self.head + self.length]
+        window.flags.writeable = False
+        return window
+
+    def history(self):
+        """Returns the `count` most recent samples as a view (fewer than `length` while filling)."""
+        end = self.head + self.length
+        return self._data[end - self.count:end]
+
+    def extend(self, samples):
+        for sample in samples[-self.length:]:
+            self.append(sample)
+
+    def clear(self):
+        self.count = 0
+        self.head = 0
+        self.last_scored = None
+        self.last_class = None
+
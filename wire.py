@@ -0,0 +1,132 @@
+"""Compact binary frames for the batched `sensor_batch` / `batch_result` Socket.IO events.
+
+A frame is sent as a binary attachment, e.g. ``sio.emit('sensor_batch', {'frame': frame})``.
+All integers are little-endian and every array starts on an 8-byte boundary so
+the receiver can wrap it with np.frombuffer without copying.
+
+Sample frame (client -> server):
+    header        '<4sBBHII'  magic b'SDB1', version, flags, n_vehicles, n_samples, ids_len
+    vehicle ids   ids_len bytes of UTF-8, '\\n'-separated, padded to 8 bytes
+    vehicle_index uint16[n_samples], padded to 8 bytes
+    timestamp     int64[n_samples]   (ms)
+    values        float32[n_samples, 7]  AccX, AccY, AccZ, GyroX, GyroY, GyroZ, speed
+
+Result frame (server -> client) has the same layout with magic b'SRB1' and a
+single int8[n_samples] predicted_class array in place of the values.
+"""
+import struct
+
+import numpy as np
+
+SAMPLE_MAGIC = b'SDB1'
+RESULT_MAGIC = b'SRB1'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHII')
+VALUE_FIELDS = ['AccX', 'AccY', 'AccZ', 'GyroX', 'GyroY', 'GyroZ', 'speed']
+NUM_VALUES = len(VALUE_FIELDS)
+
+
+class FrameError(ValueError):
+    pass
+
+
+class SampleBatch:
+    """Decoded sample frame. The arrays are read-only views into the received bytes."""
+
+    __slots__ = ('vehicle_ids', 'vehicle_index', 'timestamps', 'values')
+
+    def __init__(self, vehicle_ids, vehicle_index, timestamps, values):
+        self.vehicle_ids = vehicle_ids
+        self.vehicle_index = vehicle_index
+        self.timestamps = timestamps
+        self.values = values
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def features(self):
+        return self.values[:, :6]
+
+    @property
+    def speed(self):
+        return self.values[:, 6]
+
+
+def _pad(length):
+    return -length % 8
+
+
+def _encode(magic, vehicle_ids, vehicle_index, timestamps, tail):
+    ids = '\n'.join(vehicle_ids).encode('utf-8')
+    index = np.ascontiguousarray(vehicle_index, dtype='<u2')
+    n = len(index)
+    parts = [
+        HEADER.pack(magic, VERSION, 0, len(vehicle_ids), n, len(ids)),
+        ids, b'\0' * _pad(len(ids)),
+        index.tobytes(), b'\0' * _pad(index.nbytes),
+        np.ascontiguousarray(timestamps, dtype='<i8').tobytes(),
+        tail.tobytes(),
+    ]
+    return b''.join(parts)
+
+
+def _decode(frame, magic):
+    buf = memoryview(frame)
+    if len(buf) < HEADER.size:
+        raise FrameError("frame shorter than header")
+    got_magic, version, _flags, n_vehicles, n, ids_len = HEADER.unpack_from(buf)
+    if got_magic != magic:
+        raise FrameError(f"bad magic {got_magic!r}")
+    if version != VERSION:
+        raise FrameError(f"unsupported frame version {version}")
+
+    offset = HEADER.size
+    ids = bytes(buf[offset:offset + ids_len]).decode('utf-8')
+    vehicle_ids = ids.split('\n') if n_vehicles else []
+    if len(vehicle_ids) != n_vehicles:
+        raise FrameError("vehicle id table does not match header")
+    offset += ids_len + _pad(ids_len)
+
+    try:
+        vehicle_index = np.frombuffer(buf, dtype='<u2', count=n, offset=offset)
+        offset += 2 * n + _pad(2 * n)
+        timestamps = np.frombuffer(buf, dtype='<i8', count=n, offset=offset)
+        offset += 8 * n
+    except ValueError as e:
+        raise FrameError(f"truncated frame: {e}")
+    if n and vehicle_index.max() >= n_vehicles:
+        raise FrameError("vehicle index out of range")
+    return vehicle_ids, vehicle_index, timestamps, buf, offset, n
+
+
+def encode_samples(vehicle_ids, vehicle_index, timestamps, values):
+    """Packs n samples; `values` is (n, 7) in VALUE_FIELDS order."""
+    values = np.ascontiguousarray(values, dtype='<f4')
+    if values.shape != (len(timestamps), NUM_VALUES):
+        raise FrameError(f"values must have shape (n, {NUM_VALUES})")
+    return _encode(SAMPLE_MAGIC, vehicle_ids, vehicle_index, timestamps, values)
+
+
+def decode_samples(frame):
+    vehicle_ids, vehicle_index, timestamps, buf, offset, n = _decode(frame, SAMPLE_MAGIC)
+    try:
+        values = np.frombuffer(buf, dtype='<f4', count=n * NUM_VALUES, offset=offset).reshape(n, NUM_VALUES)
+    except ValueError as e:
+        raise FrameError(f"truncated sample values: {e}")
+    return SampleBatch(vehicle_ids, vehicle_index, timestamps, values)
+
+
+def encode_results(vehicle_ids, vehicle_index, timestamps, predicted_class):
+    return _encode(RESULT_MAGIC, vehicle_ids, vehicle_index, timestamps,
+                   np.ascontiguousarray(predicted_class, dtype='i1'))
+
+
+def decode_results(frame):
+    """Returns (vehicle_ids, vehicle_index, timestamps, predicted_class)."""
+    vehicle_ids, vehicle_index, timestamps, buf, offset, n = _decode(frame, RESULT_MAGIC)
+    try:
+        predicted_class = np.frombuffer(buf, dtype='i1', count=n, offset=offset)
+    except ValueError as e:
+        raise FrameError(f"truncated results: {e}")
+    return vehicle_ids, vehicle_index, timestamps, predicted_class